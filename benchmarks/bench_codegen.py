@@ -0,0 +1,48 @@
+'''
+Benchmark comparing the interpreted simulator against the straight-line
+code generated by compbuilder.codegen on a gate-level RAM8.  With CPython
+3.11 the compiled simulator measures about 18-19x faster (roughly 5600 vs
+290 us/cycle).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codegen
+'''
+import time
+from random import randint, seed
+
+from compbuilder import Signal
+import compbuilder.codegen
+from test.test_ram import RAM8
+
+def make_stimulus(cycles):
+    seed(0)
+    return [dict(In=Signal(randint(0,65535),16),
+                 address=Signal(randint(0,7),3),
+                 load=Signal(randint(0,1)))
+            for _ in range(cycles)]
+
+def run(comp, stimulus):
+    start = time.perf_counter()
+    outputs = [comp.eval(**inputs)['out'].value for inputs in stimulus]
+    return time.perf_counter() - start, outputs
+
+def main(cycles=2000):
+    stimulus = make_stimulus(cycles)
+
+    interpreted = RAM8()
+    interpreted.eval(**stimulus[0])   # elaborate outside the timed region
+    compiled = RAM8()
+    compiled.compile_simulator()
+    compiled.eval(**stimulus[0])
+
+    t_interp, out_interp = run(interpreted, stimulus)
+    t_comp, out_comp = run(compiled, stimulus)
+    assert out_interp == out_comp
+
+    print(f'interpreted: {t_interp*1e6/cycles:9.1f} us/cycle')
+    print(f'   compiled: {t_comp*1e6/cycles:9.1f} us/cycle')
+    print(f'    speedup: {t_interp/t_comp:.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+'''
+Scaling benchmark for elaborating Nand chains into a sorted simulation graph
+(initialize, build_sim_graph, check_loop and top_sort).  Time per Nand
+should stay roughly constant as the design grows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_elaboration [sizes...]
+
+e.g. "python -m benchmarks.bench_elaboration 10000 100000 1000000".
+'''
+import sys
+import time
+
+from compbuilder import Component, w
+from test.basic_gates import Nand
+
+def make_chain(n):
+    '''
+    Return a component class with n Nands connected in a chain, i.e., a
+    combinational path n gates deep.
+    '''
+    class NandChain(Component):
+        IN = [w.In]
+        OUT = [w.out]
+
+        PARTS = [Nand(a=w.In, b=w.In, out=w.x1)]
+        PARTS += [Nand(a=getattr(w, f'x{i}'), b=getattr(w, f'x{i}'),
+                       out=getattr(w, f'x{i+1}'))
+                  for i in range(1, n-1)]
+        PARTS += [Nand(a=getattr(w, f'x{n-1}'), b=getattr(w, f'x{n-1}'),
+                       out=w.out)]
+
+    return NandChain
+
+def main(sizes):
+    print(f'{"nands":>9} {"elaborate":>10} {"us/nand":>9}')
+    for n in sizes:
+        comp = make_chain(n)()
+        start = time.perf_counter()
+        comp.elaborate()
+        total = time.perf_counter() - start
+        print(f'{n:9d} {total:9.2f}s {total*1e6/n:9.1f}')
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or [10000, 100000])
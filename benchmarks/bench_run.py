@@ -0,0 +1,49 @@
+'''
+Benchmark comparing a testbench loop of eval() calls against the columnar
+Component.run() API on a gate-level RAM8.
+
+Both evaluate the same run schedule, so the per-cycle cost is about the
+same (with CPython 3.11, roughly 2300 us/cycle each); run() only saves the
+per-call plumbing, which is small next to evaluating some 2000 primitives.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_run
+'''
+import time
+from random import randint, seed
+
+from compbuilder import Signal
+from test.test_ram import RAM8
+
+def make_stimulus(cycles):
+    seed(0)
+    return {'In': [randint(0,65535) for _ in range(cycles)],
+            'address': [randint(0,7) for _ in range(cycles)],
+            'load': [randint(0,1) for _ in range(cycles)]}
+
+def main(cycles=1000):
+    stimulus = make_stimulus(cycles)
+
+    looped = RAM8()
+    looped.elaborate()
+    start = time.perf_counter()
+    expected = [looped.eval(In=Signal(stimulus['In'][t],16),
+                            address=Signal(stimulus['address'][t],3),
+                            load=Signal(stimulus['load'][t]))['out'].value
+                for t in range(cycles)]
+    t_eval = time.perf_counter() - start
+
+    batched = RAM8()
+    batched.elaborate()
+    start = time.perf_counter()
+    outputs = batched.run(stimulus)
+    t_run = time.perf_counter() - start
+    assert list(outputs['out']) == expected
+
+    print(f'eval loop: {t_eval*1e6/cycles:9.1f} us/cycle')
+    print(f'      run: {t_run*1e6/cycles:9.1f} us/cycle')
+    print(f' eval/run: {t_eval/t_run:.2f}')
+
+if __name__ == '__main__':
+    main()
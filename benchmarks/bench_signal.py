@@ -0,0 +1,58 @@
+'''
+Micro-benchmark comparing integer mask/shift Signal slicing against the
+previous string-based implementation on 16-bit buses.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_signal
+'''
+import timeit
+
+from compbuilder import Signal
+
+class StringSignal:
+    '''Reference copy of the former string-based slicing implementation.'''
+    def __init__(self, value, width=1):
+        self.value = value
+        self.width = width
+
+    def __str__(self):
+        fmt = '{:0%db}' % (self.width,)
+        return fmt.format(self.value)
+
+    @staticmethod
+    def from_string(s):
+        return StringSignal(int(s,2), len(s))
+
+    def slice(self, s):
+        rev = str(self)[::-1]
+        return StringSignal.from_string((rev[s])[::-1])
+
+    def set_slice(self, s, value):
+        slen = s.stop - s.start
+        fmt = '{:0%db}' % (slen)
+        vstr = fmt.format(value.value)
+        rev_str = list(str(self)[::-1])
+        rev_str[s] = list(vstr[::-1])
+        self.value = int(''.join(rev_str[::-1]),2)
+
+def run_bus(cls):
+    '''Split a 16-bit bus into bits and reassemble it, as the simulator does'''
+    bus = cls(0xA5C3, 16)
+    out = cls(0, 16)
+    for i in range(16):
+        bit = bus.slice(slice(i,i+1))
+        out.set_slice(slice(i,i+1), bit)
+    out.set_slice(slice(4,12), bus.slice(slice(0,8)))
+    return out
+
+def main(number=20000):
+    results = {}
+    for name,cls in [('string',StringSignal), ('integer',Signal)]:
+        results[name] = min(timeit.repeat(lambda: run_bus(cls),
+                                          number=number, repeat=5))
+        print(f'{name:>8}: {results[name]*1e6/number:8.2f} us per 16-bit bus round trip')
+    print(f' speedup: {results["string"]/results["integer"]:.1f}x')
+
+if __name__ == '__main__':
+    main()
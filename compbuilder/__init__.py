@@ -1,4 +1,14 @@
+import gc
+import heapq
+from array import array
+from collections import deque, namedtuple
+from collections.abc import Mapping
+from contextlib import contextmanager
+from copy import copy
+from itertools import repeat
+
 from .exceptions import ComponentError, WireError
+from .netlist import compile_formula
 
 class Signal:
     """
@@ -24,6 +34,8 @@ class Signal:
     >>> str(s)
     '010011'
     """
+    __slots__ = ('value', 'width')
+
     def __init__(self, value, width=1):
         self.value = value
         self.width = width
@@ -35,17 +47,16 @@ class Signal:
         return Signal(self.value, new_width)
 
     def __eq__(self, other):
-        if other == None:
+        if other is None:
             return False
-        if type(other) == int:
+        if type(other) is int:
             return self.value == other
         else:
             return ((self.width == other.width) and
                     (self.value == other.value))
 
     def __str__(self):
-        fmt = '{:0%db}' % (self.width,)
-        return fmt.format(self.value)
+        return format(self.value, '0%db' % self.width)
 
     def __repr__(self):
         return str(self)
@@ -60,36 +71,77 @@ class Signal:
     def from_string(s):
         return Signal(int(s,2), len(s))
 
+    def _slice_bounds(self, s):
+        # slow path for open-ended, negative or out-of-range slices
+        start, stop, _ = s.indices(self.width)
+        return start, stop
+
     def slice(self, s):
-        rev = str(self)[::-1]
-        return Signal.from_string((rev[s])[::-1])
+        start, stop = s.start, s.stop
+        if (start is None or stop is None or start < 0 or stop > self.width
+                or s.step is not None):
+            start, stop = self._slice_bounds(s)
+        width = stop - start
+        return Signal((self.value >> start) & ((1 << width) - 1), width)
 
     def set_slice(self, s, value):
-        slen = s.stop - s.start
-        fmt = '{:0%db}' % (slen)
-        vstr = fmt.format(value.value)
-        rev_str = list(str(self)[::-1])
-        rev_str[s] = list(vstr[::-1])
-        self.value = int(''.join(rev_str[::-1]),2)
+        """
+        Overwrite bits in the slice with the lower bits of `value`, which may
+        be either a Signal or an int.  Bits of `value` beyond the slice
+        width are discarded.
+        """
+        start, stop = s.start, s.stop
+        if (start is None or stop is None or start < 0 or stop > self.width
+                or s.step is not None):
+            start, stop = self._slice_bounds(s)
+        if type(value) is not int:
+            value = value.value
+        mask = ((1 << (stop - start)) - 1) << start
+        self.value = (self.value & ~mask) | ((value << start) & mask)
 
     def __getitem__(self,key):
-        if type(key) == slice:
-            return self.slice(key)
+        if type(key) is int:
+            # single-bit fast path; no slice object needed
+            return Signal((self.value >> key) & 1, 1)
         else:
-            return self.slice(slice(key,key+1))
+            return self.slice(key)
 
 Signal.F = Signal(0)
 Signal.T = Signal(1)
 
+# globals of the bitwise formulas evaluated by evaluate_schedule()
+_formula_globals = {'__builtins__': {}}
+
+@contextmanager
+def _paused_gc():
+    # Elaboration allocates millions of long-lived objects, which makes the
+    # cyclic garbage collector rescan an ever growing heap; pausing it keeps
+    # elaboration time linear in design size.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+# A component port resolved to the simulation graph edge it is attached to:
+# edge_key is (cid, wire key) of the edge, offset the bit position of the
+# port within the edge and width the port width.
+MappedWire = namedtuple('MappedWire',
+                        ['edge_key', 'offset', 'width', 'is_constant', 'constant_value'])
+
 class SimulationMixin:
+    sim_graph_cache = None
+
     class SimNode:
         def __init__(self, id, component):
             self.id = id
             self.component = component
             self.in_keys = component.get_in_keys()
             self.out_keys = component.get_out_keys()
-            self.in_mapped_wires = [component.wire_map[k][0] for k in component.get_in_keys()]
-            self.out_mapped_wires = [component.wire_map[k][0] for k in component.get_out_keys()]
+            self.in_mapped_wires = [component.wire_map[k] for k in self.in_keys]
+            self.out_mapped_wires = [component.wire_map[k] for k in self.out_keys]
             self.in_edge_keys = []
             self.out_edge_keys = []
             self.indegree = 0
@@ -134,49 +186,45 @@ class SimulationMixin:
         extract_base_components(self)
         return (base_components, all_components)
 
-    def trace_wire(self):
-        #print('Trace', self.cid, self)
-        wire_map = {}
-        terminated = {}
-        for k in self.get_in_keys() + self.get_out_keys():
-            wire_map[k] = [{'cid':self.cid,
-                            'key':k,
-                            'component_width': k[1],
-                            'offset':0,
-                            'is_constant': False,
-                            'actual_wire': None}]
-            terminated[k] = False
+    def resolve_wire_maps(self, all_components):
+        """
+        Map the ports of every component to the edge they are attached to in
+        the simulation graph, as a wire_map of MappedWire tuples keyed by
+        port key.  Components are visited top-down, so a port connected to
+        one of its parent's ports is resolved by a single lookup into the
+        parent's already resolved wire_map, which acts as the alias table.
+        """
+        for c in all_components:
+            parent = c.parent_component
+            wire_map = {}
+            if parent is None:
+                for k in c.get_in_keys() + c.get_out_keys():
+                    wire_map[k] = MappedWire((c.cid, k), 0, k[1], False, None)
+                c.wire_map = wire_map
+                continue
 
-        component = self
-        while component.parent_component:
-            in_out_keys = component.parent_component.get_in_keys() + component.parent_component.get_out_keys()
-            #print('IN OUT:', component, in_out_keys)
-            for w in wire_map:
-                if not terminated[w]:
-                    cw = wire_map[w][0]['key']
-                    #print('current', cw, component)
-                    if cw[0] in component.wire_assignments:
-                        new_w = component.wire_assignments[cw[0]]
-                        new_key = new_w.get_key()
-                        new_offset = wire_map[w][0]['offset']
-                        if new_w.slice:
-                            new_offset += new_w.slice.start
-                    else:
-                        raise Exception('wire disappeared')
-                    #print('in', component, wire_map[w], new_w, new_key)
-                    #print('new', cw, component.parent_component.cid, new_key) 
-                    wire_map[w].insert(0,{'cid':component.parent_component.cid,
-                                          'key':new_key,
-                                          'component_width':wire_map[w][0]['component_width'],
-                                          'offset': new_offset,
-                                          'is_constant': new_w.is_constant,
-                                          'actual_wire': new_w})
-                    if new_key not in in_out_keys:
-                        terminated[w] = True
-                        #print('Final', w, wire_map[w][0])
-            component = component.parent_component
-
-        return wire_map
+            aliases = parent.wire_map if parent.parent_component else {}
+            for k in c.get_in_keys() + c.get_out_keys():
+                actual_wire = c.wire_assignments.get(k[0])
+                if actual_wire is None:
+                    raise ComponentError(message=f'Wire {k[0]} disappeared from {c}')
+                actual_key = actual_wire.get_key()
+                offset = actual_wire.slice.start if actual_wire.slice else 0
+                outer = aliases.get(actual_key)
+                if outer is not None:
+                    # the wire continues through the parent's port
+                    wire_map[k] = MappedWire(outer.edge_key,
+                                             outer.offset + offset,
+                                             k[1],
+                                             outer.is_constant,
+                                             outer.constant_value)
+                else:
+                    wire_map[k] = MappedWire((parent.cid, actual_key),
+                                             offset,
+                                             k[1],
+                                             actual_wire.is_constant,
+                                             actual_wire.constant_value)
+            c.wire_map = wire_map
 
     def sum_wire_width(self, wires):
         return sum([w.width for w in wires])
@@ -204,8 +252,7 @@ class SimulationMixin:
 
         ncount = 0
 
-        for c in all_components:
-            c.wire_map = c.trace_wire()
+        self.resolve_wire_maps(all_components)
 
         for c in base_components:
             if c.is_clocked_component:
@@ -241,16 +288,14 @@ class SimulationMixin:
                 in_node = node
                 out_node = node
 
-            for k in c.get_in_keys():
-                wmap = c.wire_map[k][0]
-                ek = (wmap['cid'], wmap['key'])
+            for wmap in in_node.in_mapped_wires:
+                ek = wmap.edge_key
                 e = get_or_create_edge(ek)
-                e['dest'].append((in_node.id, wmap['component_width']))
+                e['dest'].append((in_node.id, wmap.width))
                 in_node.in_edge_keys.append(ek)
 
-            for k in c.get_out_keys():
-                wmap = c.wire_map[k][0]
-                ek = (wmap['cid'], wmap['key'])
+            for wmap in out_node.out_mapped_wires:
+                ek = wmap.edge_key
                 e = get_or_create_edge(ek)
                 e['src'].append(out_node.id)
                 out_node.out_edge_keys.append(ek)
@@ -265,55 +310,100 @@ class SimulationMixin:
 
 
     def check_loop(self):
-        def dfs(u):
-            u.is_visisted = True
-
+        """
+        Detect combinational loops with an iterative version of Tarjan's
+        strongly connected component algorithm, so that deep designs do not
+        hit Python's recursion limit.  A loop inside the first non-trivial
+        component found is reported as a ComponentError.
+        """
+        nodes = self.sim_nodes
+        edges = self.sim_edges
+
+        def successors(u):
             for ek in u.out_edge_keys:
-                e = self.sim_edges[ek]
-                for vid, edge_wire_width in e['dest']:
-                    v = self.sim_nodes[vid]
-                    if v.is_visisted:
-                        if not v.is_returned:
-                            # LOOP!
-                            messages = ['Loop found:']
-                            loop_components = [(u, u.component, u.parent_edge_key)]
-                            current = u
-                            while current != v:
-                                current = current.dfs_parent
-                                loop_components.append((current, current.component, current.parent_edge_key))
-
-                            loop_components.reverse()
-                            messages = ['Loop found:']
-                            for u, c, ek in loop_components:
-                                if not u.is_pair_node:
-                                    messages.append(f' - {c} inside {u.get_top_level_components(self.sim_loop_report_levels)} - {ek}')
-                                else:
-                                    if u.is_input_node:
-                                        messages.append(f' - {c} [IN] inside {u.get_top_level_components(self.sim_loop_report_levels)} - {ek}')
-                                    else:
-                                        messages.append(f' - {c} [OUT] inside {u.get_top_level_components(self.sim_loop_report_levels)} - {ek}')
-
-                            raise ComponentError(message='\n'.join(messages))
-                    else:
-                        v.dfs_parent = u
-                        v.parent_edge_key = ek
-                        dfs(v)
-
-            u.is_returned = True
-
-        for uid in self.sim_nodes:
-            u = self.sim_nodes[uid]
-            u.is_visisted = False
-            u.is_returned = False
+                for vid, edge_wire_width in edges[ek]['dest']:
+                    yield ek, nodes[vid]
 
-        for uid in self.sim_nodes:
-            u = self.sim_nodes[uid]
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        counter = 0
 
-            if not u.is_visisted:
-                u.dfs_parent = None
-                u.parent_edge_key = None
-                dfs(u)
+        for root in nodes.values():
+            if root.id in index:
+                continue
+            index[root.id] = lowlink[root.id] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root.id)
+            work = [(root, successors(root))]
+            while work:
+                u, it = work[-1]
+                advanced = False
+                for ek, v in it:
+                    if v.id not in index:
+                        index[v.id] = lowlink[v.id] = counter
+                        counter += 1
+                        stack.append(v)
+                        on_stack.add(v.id)
+                        work.append((v, successors(v)))
+                        advanced = True
+                        break
+                    elif v.id in on_stack:
+                        lowlink[u.id] = min(lowlink[u.id], index[v.id])
+                        if v is u:
+                            self.report_loop([u])
+                if advanced:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent.id] = min(lowlink[parent.id], lowlink[u.id])
+                if lowlink[u.id] == index[u.id]:
+                    scc = []
+                    while True:
+                        v = stack.pop()
+                        on_stack.discard(v.id)
+                        scc.append(v)
+                        if v is u:
+                            break
+                    if len(scc) > 1:
+                        self.report_loop(scc)
+
+    def report_loop(self, scc):
+        """
+        Raise a ComponentError describing one cycle through the given strongly
+        connected set of simulation nodes.
+        """
+        members = {u.id for u in scc}
+        current = scc[0]
+        entered_by = {}
+        path = []
+        while current.id not in entered_by:
+            entered_by[current.id] = len(path)
+            for ek in current.out_edge_keys:
+                nexts = [vid for vid, _ in self.sim_edges[ek]['dest'] if vid in members]
+                if nexts:
+                    path.append((current, ek))
+                    current = self.sim_nodes[nexts[0]]
+                    break
+        path = path[entered_by[current.id]:]
+
+        messages = ['Loop found:']
+        for i, (u, _) in enumerate(path):
+            ek = path[i-1][1]   # edge through which the loop enters u
+            c = u.component
+            parents = u.get_top_level_components(self.sim_loop_report_levels)
+            if not u.is_pair_node:
+                messages.append(f' - {c} inside {parents} - {ek}')
+            elif u.is_input_node:
+                messages.append(f' - {c} [IN] inside {parents} - {ek}')
+            else:
+                messages.append(f' - {c} [OUT] inside {parents} - {ek}')
 
+        raise ComponentError(message='\n'.join(messages))
 
     def top_sort(self):
         self.check_loop()
@@ -326,8 +416,8 @@ class SimulationMixin:
             if u.is_output_node:
                 continue
             for m_wire in u.in_mapped_wires:
-                if m_wire['is_constant']:
-                    u.current_indegree -= m_wire['component_width']
+                if m_wire.is_constant:
+                    u.current_indegree -= m_wire.width
 
                     if u.current_indegree < 0:
                         raise ComponentError(messages=f'Implementation Error (negative indegree) {u.is_output_node} {u.current_indegree} {u.component} {m_wire}')
@@ -345,7 +435,7 @@ class SimulationMixin:
             for vid, wire_width in e['dest']:
                 self.sim_nodes[vid].current_indegree -= wire_width
 
-        src_list = []
+        src_list = deque()
         added_set = set()
 
         for uid in self.sim_nodes:
@@ -355,10 +445,9 @@ class SimulationMixin:
                 added_set.add(u.id)
 
         ncount = 0
-        while len(src_list)!=0:
+        while src_list:
             ncount += 1
-            u = src_list[0]
-            src_list = src_list[1:]
+            u = src_list.popleft()
 
             #print('Added:', u.component, u.get_top_level_components(2))
 
@@ -390,12 +479,12 @@ class SimulationMixin:
                     component_parents = tuple(u.get_top_level_components(self.sim_loop_report_levels))
                     if err_count < self.sim_loop_max_num_report_primitives:
                         if not u.is_pair_node:
-                            messages.append(f'- {u.id}: {u.component} (wait: {u.current_indegree}) (inside {component_parents}) in-wires: {[w["key"] for w in u.in_mapped_wires]}')
+                            messages.append(f'- {u.id}: {u.component} (wait: {u.current_indegree}) (inside {component_parents}) in-wires: {[w.edge_key[1] for w in u.in_mapped_wires]}')
                         else:
                             if u.is_input_node:
-                                messages.append(f'- {u.id}: {u.component} [IN] (wait: {u.current_indegree}) (inside {component_parents}) in-wires: {[w["key"] for w in u.in_mapped_wires]}')
+                                messages.append(f'- {u.id}: {u.component} [IN] (wait: {u.current_indegree}) (inside {component_parents}) in-wires: {[w.edge_key[1] for w in u.in_mapped_wires]}')
                             else:
-                                messages.append(f'- {u.id}: {u.component} [OUT] (wait: {u.current_indegree}) (inside {component_parents}) in-wires: {[w["key"] for w in u.in_mapped_wires]}')
+                                messages.append(f'- {u.id}: {u.component} [OUT] (wait: {u.current_indegree}) (inside {component_parents}) in-wires: {[w.edge_key[1] for w in u.in_mapped_wires]}')
 
                     elif err_count == self.sim_loop_max_num_report_primitives:
                         messages.append('.... too many ....')
@@ -416,16 +505,16 @@ class SimulationMixin:
             raise ComponentError(message='\n'.join(messages))
 
     def get_signal_from_mapped_wire(self, signal, component_wire, mapped_wire):
-        offset = mapped_wire['offset']
+        offset = mapped_wire.offset
         if signal != None:
             signal_value = signal.value
-        elif mapped_wire['is_constant']:
-            signal_value = mapped_wire['actual_wire'].constant_value
+        elif mapped_wire.is_constant:
+            signal_value = mapped_wire.constant_value
         else:
             raise ComponentError(message='Required input signal not found')
         v = (signal_value) >> offset
         mask = (1 << component_wire.width) - 1
-        return Signal(v & mask, 1)
+        return Signal(v & mask, component_wire.width)
 
     def extract_component_trace(self, component):
         component.trace_input_signals = self.get_component_input(component)
@@ -438,9 +527,8 @@ class SimulationMixin:
 
     def get_component_wire_signal(self, component, wire):
         key = wire.get_key()
-        mapped_wire = component.wire_map[key][0]
-        edge_key = (mapped_wire['cid'], mapped_wire['key'])
-        return self.get_signal_from_mapped_wire(self.edge_values.get(edge_key, None),
+        mapped_wire = component.wire_map[key]
+        return self.get_signal_from_mapped_wire(self.edge_values.get(mapped_wire.edge_key, None),
                                                 wire,
                                                 mapped_wire)
 
@@ -455,48 +543,520 @@ class SimulationMixin:
     def set_component_output(self, component, output):
         for component_wire in component.OUT:
             key = component_wire.get_key()
-            mapped_wire = component.wire_map[key][0]
-            edge_key = (mapped_wire['cid'], mapped_wire['key'])
+            mapped_wire = component.wire_map[key]
+            edge_key = mapped_wire.edge_key
             if edge_key not in self.edge_values:
-                self.edge_values[edge_key] = Signal(0, mapped_wire['key'][1])
+                self.edge_values[edge_key] = Signal(0, edge_key[1][1])
             signal = self.edge_values[edge_key]
-            signal.set_slice(slice(mapped_wire['offset'], mapped_wire['offset']+1),
+            offset = mapped_wire.offset
+            signal.set_slice(slice(offset, offset+component_wire.width),
                              output[component_wire.name])
 
-    def init_simulator(self):
-        if not getattr(self, 'sim_topo_ordering', None):
+    def elaborate(self):
+        if getattr(self, 'sim_topo_ordering', None):
+            return
+        with _paused_gc():
+            # on-disk cache of sorted graphs (see compbuilder.graphcache)
+            cache = self.sim_graph_cache
+            if cache is not None and cache.load(self):
+                return
             self.build_sim_graph()
             self.top_sort()
-        self.edge_values = {}
+            if cache is not None:
+                cache.save(self)
 
-    def init_component_input_edge_value(self, kwargs):
-        for wire in self.IN:
-            key = wire.get_key()
-            ek = (self.cid, key)
-            self.edge_values[ek] = kwargs[wire.name]
+    def init_simulator(self):
+        self.elaborate()
+        self.edge_values = {}
+        self.sim_incremental_ready = False
+        self.sim_cycle_ready = False
 
     def simulate(self, **kwargs):
+        if self.sim_compiled is not None:
+            # straight-line code generated by compbuilder.codegen
+            return self.simulate_compiled(**kwargs)
+
+        if self.sim_incremental:
+            return self.simulate_incremental(**kwargs)
+
         self.init_simulator()
-        self.init_component_input_edge_value(kwargs)
+        schedule = self.get_run_schedule()
+        values = [0] * len(self.sim_edge_keys)
+        for wire, eid in zip(self.IN, self.sim_input_ids):
+            values[eid] = kwargs[wire.name].value
+        self.edge_values = EdgeValues(self, values)
 
-        for u in self.sim_topo_ordering:
+        self.evaluate_schedule(schedule, values)
+
+        return {wire.name:Signal(values[eid], wire.width)
+                for wire, eid in zip(self.OUT, self.get_output_ids())}
+
+    def init_incremental_simulator(self):
+        self.init_simulator()
+        order = self.sim_topo_ordering
+        position = {u.id: i for i, u in enumerate(order)}
+
+        # topological positions of the nodes reading each edge
+        self.sim_edge_readers = {}
+        for ek, e in self.sim_edges.items():
+            self.sim_edge_readers[ek] = sorted({position[vid] for vid, _ in e['dest']})
+
+        # clocked outputs are re-evaluated on every call
+        self.sim_clocked_positions = [i for i, u in enumerate(order)
+                                      if u.is_pair_node and u.is_output_node]
+        self.sim_incremental_ready = True
+
+    def simulate_incremental(self, **kwargs):
+        """
+        Event-driven variant of simulate().  Edge values are kept between
+        calls and only nodes in the fan-out cone of changed input edges and
+        clocked outputs are evaluated.  Counts of evaluated and skipped nodes
+        of the last call are stored in sim_stats.
+
+        The direct readers of a clocked output are always evaluated, even if
+        the output value did not change, because clocked parts such as fast
+        RAMs pass state to their readers through shared buffers behind a
+        constant link wire.
+        """
+        order = self.sim_topo_ordering if self.sim_incremental_ready else None
+        if order is None:
+            self.init_incremental_simulator()
+            order = self.sim_topo_ordering
+            dirty = list(range(len(order)))
+        else:
+            dirty = list(self.sim_clocked_positions)
+            for wire in self.IN:
+                ek = (self.cid, wire.get_key())
+                old = self.edge_values[ek]
+                if old.value != kwargs[wire.name].value:
+                    dirty.extend(self.sim_edge_readers[ek])
+
+        for wire in self.IN:
+            signal = kwargs[wire.name]
+            self.edge_values[(self.cid, wire.get_key())] = Signal(signal.value, signal.width)
+
+        heapq.heapify(dirty)
+        queued = bytearray(len(order))
+        for i in dirty:
+            queued[i] = 1
+
+        edge_values = self.edge_values
+        evaluated = 0
+        while dirty:
+            i = heapq.heappop(dirty)
+            u = order[i]
             component = u.component
+            evaluated += 1
+
             if (not u.is_pair_node) or (u.is_input_node):
                 input_kwargs = self.get_component_input(component)
             else:
                 input_kwargs = {}
 
             if (not u.is_pair_node) or (u.is_output_node):
+                old = [edge_values[ek].value if ek in edge_values else None
+                       for ek in u.out_edge_keys]
                 output = component.process(**input_kwargs)
                 self.set_component_output(component, output)
+                for ek, old_value in zip(u.out_edge_keys, old):
+                    if ek not in edge_values:
+                        continue   # in-out-pair edge
+                    if u.is_pair_node or edge_values[ek].value != old_value:
+                        for j in self.sim_edge_readers[ek]:
+                            if not queued[j]:
+                                queued[j] = 1
+                                heapq.heappush(dirty, j)
             else:
                 component.prepare_process(**input_kwargs)
 
+        self.sim_stats = {
+            'evaluated': evaluated,
+            'skipped': len(order) - evaluated,
+        }
+
+        try:
+            return {wire.name:Signal(self.edge_values[(self.cid, wire.get_key())].value, wire.width)
+                    for wire in self.OUT}
+        except KeyError as e:
+            raise ComponentError(errors=e) from e
+
+    def init_cycle_scheduler(self):
+        self.init_simulator()
+        order = self.sim_topo_ordering
+        position = {u.id: i for i, u in enumerate(order)}
+
+        # topological positions of the nodes reading each edge; the
+        # in-out-pair edges are replaced by the clocked pairs below
+        self.sim_cycle_readers = {}
+        for ek, e in self.sim_edges.items():
+            if ek[1][0] == 'in-out-pair':
+                continue
+            self.sim_cycle_readers[ek] = sorted({position[vid] for vid, _ in e['dest']})
+
+        # position of the output half of every clocked component by the
+        # position of its input half
+        outputs = {id(u.component): i for i, u in enumerate(order)
+                   if u.is_pair_node and u.is_output_node}
+        self.sim_cycle_clocked = {i: outputs[id(u.component)] for i, u in enumerate(order)
+                                  if u.is_pair_node and u.is_input_node}
+        self.sim_cycle_armed = []
+        self.sim_cycle_ready = True
+
+    def step(self, n=1, **inputs):
+        """
+        Cycle-based simulation: advance n clock cycles with the given inputs
+        held constant and return the output signals after the last cycle.
+        Inputs are Signals or ints; inputs not given keep their values from
+        the previous call.
+
+        Every cycle is a rising clock edge followed by the settling of the
+        combinational logic, as in one eval().  A clocked component is only
+        clocked again when its input half was re-evaluated since its last
+        edge, and a combinational node only when one of its input edges
+        changed or is driven by a component clocked in this cycle.  (Readers
+        of clocked components are re-evaluated even if the output value did
+        not change, as in simulate_incremental().)  Counts of evaluated and
+        skipped nodes over the n cycles are stored in sim_stats.  The
+        simulation hooks are called after every cycle.
+        """
+        self.elaborate()
+        first = not self.sim_cycle_ready
+        if first:
+            # inputs not given are held from the previous evaluation, if any
+            held = getattr(self, 'edge_values', {})
+            self.init_cycle_scheduler()
+            for wire in self.IN:
+                ek = (self.cid, wire.get_key())
+                if ek in held:
+                    self.edge_values[ek] = held[ek]
+        order = self.sim_topo_ordering
+        readers = self.sim_cycle_readers
+        clocked = self.sim_cycle_clocked
+        edge_values = self.edge_values
+
+        dirty = []
+        for wire in self.IN:
+            ek = (self.cid, wire.get_key())
+            if wire.name not in inputs:
+                if ek not in edge_values:
+                    raise ComponentError(message=f'Missing input {wire.name}')
+                continue
+            value = inputs[wire.name]
+            if isinstance(value, Signal):
+                value = value.value
+            value = int(value) & ((1 << wire.width) - 1)
+            old = edge_values.get(ek)
+            if old is None or old.value != value:
+                edge_values[ek] = Signal(value, wire.width)
+                dirty.extend(readers.get(ek, ()))
+
+        hooks = list(self.simulation_hooks.values())
+
+        # output halves of the clocked components to clock at the next edge
+        armed = self.sim_cycle_armed
+        evaluated = 0
+        for cycle in range(n):
+            if first:
+                dirty = list(range(len(order)))
+                first = False
+            dirty.extend(armed)
+            armed = []
+            heapq.heapify(dirty)
+            queued = bytearray(len(order))
+            for i in dirty:
+                queued[i] = 1
+
+            while dirty:
+                i = heapq.heappop(dirty)
+                u = order[i]
+                component = u.component
+                evaluated += 1
+
+                if u.is_pair_node and u.is_input_node:
+                    component.prepare_process(**self.get_component_input(component))
+                    armed.append(clocked[i])
+                    continue
+
+                if u.is_pair_node:
+                    self.set_component_output(component, component.process())
+                    changed = u.out_edge_keys[1:]
+                else:
+                    old = [edge_values[ek].value if ek in edge_values else None
+                           for ek in u.out_edge_keys]
+                    output = component.process(**self.get_component_input(component))
+                    self.set_component_output(component, output)
+                    changed = [ek for ek, old_value in zip(u.out_edge_keys, old)
+                               if edge_values[ek].value != old_value]
+                for ek in changed:
+                    for j in readers[ek]:
+                        if not queued[j]:
+                            queued[j] = 1
+                            heapq.heappush(dirty, j)
+
+            for f in hooks:
+                f(self)
+
+        self.sim_cycle_armed = armed
+        self.sim_stats = {
+            'evaluated': evaluated,
+            'skipped': len(order) * n - evaluated,
+        }
+
         try:
-            return {wire.name:self.edge_values[(self.cid, wire.get_key())] for wire in self.OUT}
+            return {wire.name:Signal(edge_values[(self.cid, wire.get_key())].value, wire.width)
+                    for wire in self.OUT}
         except KeyError as e:
             raise ComponentError(errors=e) from e
 
+    def get_edge_ids(self):
+        """
+        Assign dense integer ids to the edges of the sorted simulation graph
+        (in-out-pair edges excluded), so that the simulator state is a flat
+        list of ints indexed by edge id.  Return the edge id dict.
+        """
+        if getattr(self, 'sim_edge_ids', None) is not None:
+            return self.sim_edge_ids
+
+        self.sim_edge_keys = [ek for ek in self.sim_edges if ek[1][0] != 'in-out-pair']
+        self.sim_edge_ids = {ek: i for i, ek in enumerate(self.sim_edge_keys)}
+        self.sim_input_ids = [self.sim_edge_ids[(self.cid, wire.get_key())] for wire in self.IN]
+
+        # edges ever holding a value: driven ones and the top-level inputs
+        self.sim_edge_present = bytearray(len(self.sim_edge_keys))
+        for i, ek in enumerate(self.sim_edge_keys):
+            if self.sim_edges[ek]['src']:
+                self.sim_edge_present[i] = 1
+        for i in self.sim_input_ids:
+            self.sim_edge_present[i] = 1
+        return self.sim_edge_ids
+
+    def get_output_ids(self):
+        ids = self.get_edge_ids()
+        try:
+            output_ids = [ids[(self.cid, wire.get_key())] for wire in self.OUT]
+        except KeyError as e:
+            raise ComponentError(errors=e) from e
+        for wire, eid in zip(self.OUT, output_ids):
+            if not self.sim_edge_present[eid]:
+                raise ComponentError(errors=KeyError((self.cid, wire.get_key())))
+        return output_ids
+
+    def get_run_schedule(self):
+        """
+        Return the sorted simulation graph as a list of (component, reads,
+        writes) entries with every pin already resolved to its edge id.
+        reads is None for the output half of a clocked component, whose
+        process() takes no arguments, and writes is None for its input half,
+        which only calls prepare_process().  The edge id of a read is None
+        when the edge never holds a value, i.e., for constant wires.  Writes
+        of primitives declaring process.bitwise formulas (see
+        compbuilder.codegen) carry the compiled formula of their pin.
+        """
+        if getattr(self, 'sim_run_schedule', None) is not None:
+            return self.sim_run_schedule
+
+        ids = self.get_edge_ids()
+        present = self.sim_edge_present
+        schedule = []
+        for u in self.sim_topo_ordering:
+            component = u.component
+            reads = writes = None
+            if (not u.is_pair_node) or (u.is_input_node):
+                reads = []
+                for wire, m in zip(component.IN, u.in_mapped_wires):
+                    eid = ids.get(m.edge_key)
+                    if eid is not None and not present[eid]:
+                        eid = None
+                    reads.append((wire.name,
+                                  eid,
+                                  m.offset,
+                                  (1 << wire.width) - 1,
+                                  wire.width,
+                                  m.constant_value if m.is_constant else None))
+            if (not u.is_pair_node) or (u.is_output_node):
+                formula = None
+                if not u.is_pair_node:
+                    formula = getattr(component.process, 'bitwise', None)
+                writes = [(wire.name,
+                           ids[m.edge_key],
+                           m.offset,
+                           (1 << wire.width) - 1,
+                           ~(((1 << wire.width) - 1) << m.offset),
+                           compile_formula(formula[wire.name]) if formula else None)
+                          for wire, m in zip(component.OUT, u.out_mapped_wires)]
+            schedule.append((component, reads, writes))
+        self.sim_run_schedule = schedule
+        return schedule
+
+    def evaluate_schedule(self, schedule, values):
+        """
+        Evaluate the run schedule once over values, the list of edge values
+        by edge id.  Primitives declaring bitwise formulas are evaluated on
+        the ints directly, without Signals or a process() call, unless
+        process() is overridden on the instance (e.g. by a profiler).
+        """
+        for component, reads, writes in schedule:
+            bitwise = (writes and writes[0][5] is not None
+                       and 'process' not in component.__dict__)
+            input_kwargs = {}
+            if reads is not None:
+                for name, eid, offset, mask, width, constant_value in reads:
+                    if eid is not None:
+                        value = values[eid]
+                    elif constant_value is not None:
+                        value = constant_value
+                    else:
+                        raise ComponentError(message='Required input signal not found')
+                    value = (value >> offset) & mask
+                    input_kwargs[name] = value if bitwise else Signal(value, width)
+
+            if writes is None:
+                component.prepare_process(**input_kwargs)
+                continue
+
+            if bitwise:
+                for name, eid, offset, mask, keep, formula in writes:
+                    value = eval(formula, _formula_globals, input_kwargs)
+                    values[eid] = (values[eid] & keep) | ((value & mask) << offset)
+                continue
+
+            output = component.process(**input_kwargs)
+            for name, eid, offset, mask, keep, _ in writes:
+                value = output[name]
+                if isinstance(value, Signal):
+                    value = value.value
+                values[eid] = (values[eid] & keep) | ((value & mask) << offset)
+
+    def prepare_stimulus(self, stimulus, cycles):
+        """
+        Turn the stimulus columns into one iterator per input wire and work
+        out the number of cycles to run, which defaults to the length of the
+        shortest column.
+        """
+        feeds = []
+        lengths = []
+        for wire in self.IN:
+            if wire.name not in stimulus:
+                raise ComponentError(message=f'Missing stimulus for {wire.name}')
+            column = stimulus[wire.name]
+            if isinstance(column, Signal):
+                column = repeat(column.value)
+            elif isinstance(column, int):
+                column = repeat(column)
+            elif hasattr(column, '__len__'):
+                lengths.append(len(column))
+            feeds.append((wire, iter(column)))
+
+        if cycles is None:
+            if not lengths:
+                raise ComponentError(message='Number of cycles required when no stimulus column has a length')
+            cycles = min(lengths)
+        return feeds, cycles
+
+    def run(self, stimulus=None, cycles=None, out=None):
+        """
+        Simulate the component for a number of cycles, i.e., consecutive
+        evaluations.  run() evaluates the same schedule as eval() and only
+        saves the per-call plumbing (input Signals, output dicts, edge
+        value views), so on designs of more than a few gates it costs about
+        as much per cycle as a loop of eval() calls; its benefit is the
+        columnar stimulus and output handling.
+
+        stimulus maps each input wire name to a column of values, one per
+        cycle: a list, array, NumPy array or generator of ints (or Signals),
+        or a single int or Signal held for all cycles.  Output values are
+        written into out, a dict of preallocated columns (such as NumPy
+        arrays) by output wire name; missing columns are allocated as
+        array('Q') (or lists for outputs wider than 64 bits).  Return the
+        dict of output columns.
+        """
+        self.elaborate()
+        feeds, cycles = self.prepare_stimulus(stimulus or {}, cycles)
+
+        outputs = {} if out is None else out
+        for wire in self.OUT:
+            if wire.name not in outputs:
+                if wire.width <= 64:
+                    outputs[wire.name] = array('Q', bytes(8 * cycles))
+                else:
+                    outputs[wire.name] = [0] * cycles
+
+        hooks = list(self.simulation_hooks.values())
+
+        if self.sim_compiled is not None or self.sim_incremental:
+            # input signals are updated in place on every cycle
+            signals = {wire.name: Signal(0, wire.width) for wire in self.IN}
+
+            def feed(t):
+                for wire, column in feeds:
+                    signals[wire.name].value = self.next_stimulus(column, t, wire)
+
+            for t in range(cycles):
+                feed(t)
+                result = self.simulate(**signals)
+                for wire in self.OUT:
+                    outputs[wire.name][t] = result[wire.name].value
+                for f in hooks:
+                    f(self)
+            return outputs
+
+        self.init_simulator()
+        schedule = self.get_run_schedule()
+        values = [0] * len(self.sim_edge_keys)
+        self.edge_values = EdgeValues(self, values)
+        ids = dict(zip([wire.name for wire in self.IN], self.sim_input_ids))
+        inputs = [(ids[wire.name], wire, column) for wire, column in feeds]
+        columns = list(zip(self.get_output_ids(), [outputs[wire.name] for wire in self.OUT]))
+        evaluate_schedule = self.evaluate_schedule
+        next_stimulus = self.next_stimulus
+
+        for t in range(cycles):
+            for eid, wire, column in inputs:
+                values[eid] = next_stimulus(column, t, wire)
+            evaluate_schedule(schedule, values)
+            for eid, column in columns:
+                column[t] = values[eid]
+            for f in hooks:
+                f(self)
+
+        return outputs
+
+    @staticmethod
+    def next_stimulus(column, t, wire):
+        try:
+            value = next(column)
+        except StopIteration:
+            raise ComponentError(message=f'Stimulus ended after {t} cycles') from None
+        if isinstance(value, Signal):
+            value = value.value
+        return int(value) & ((1 << wire.width) - 1)
+
+class EdgeValues(Mapping):
+    """
+    Read-only dict-like view of the dense edge value list of simulate() and
+    run(), mapping edge keys to Signals, for tracing and other tools.  The
+    Signals are created on access; changing them has no effect.
+    """
+    def __init__(self, component, values):
+        self.edge_keys = component.sim_edge_keys
+        self.edge_ids = component.sim_edge_ids
+        self.present = component.sim_edge_present
+        self.state = values
+
+    def __getitem__(self, edge_key):
+        i = self.edge_ids[edge_key]
+        if not self.present[i]:
+            raise KeyError(edge_key)
+        return Signal(self.state[i], edge_key[1][1])
+
+    def __iter__(self):
+        for edge_key, present in zip(self.edge_keys, self.present):
+            if present:
+                yield edge_key
+
+    def __len__(self):
+        return sum(self.present)
+
 class Component(SimulationMixin):
     class Node:
         def __init__(self, id, component):
@@ -515,6 +1075,33 @@ class Component(SimulationMixin):
             self.is_input_node = False
             self.is_output_node = False
 
+    # behavioral models substituted for the gate-level PARTS of component
+    # classes, see compbuilder.behavioral
+    fast_models = {}
+    fast_models_enabled = True
+
+    # names of attributes holding simulation state other than the saved
+    # signals of clocked components, e.g., memory buffers; each holds an int
+    # or a list of ints (see compbuilder.checkpoint)
+    STATE_ATTRIBUTES = ()
+
+    class ElaborationTemplate:
+        """
+        Wiring of an elaborated component, shared by all instances with the
+        same elaboration signature: normalized ports, the internal edges and
+        one node prototype per part (with no component attached).
+        """
+        def __init__(self, component, signature):
+            self.signature = signature
+            self.IN = component.IN
+            self.OUT = component.OUT
+            self.edges = component.edges
+            self.nodes = []
+            for node in component.nodes.values():
+                proto = copy(node)
+                proto.component = None
+                self.nodes.append(proto)
+
     def init_parts(self):
         pass
 
@@ -529,6 +1116,8 @@ class Component(SimulationMixin):
 
         self.preprocessing_hooks = {}
         self.postprocessing_hooks = {}
+        # called with the component after every evaluation by eval()/run()
+        self.simulation_hooks = {}
 
         self.is_clocked_component = False
         self.clocked_components = []
@@ -541,6 +1130,13 @@ class Component(SimulationMixin):
         self.sim_loop_report_levels = 2
         self.sim_loop_max_num_report_primitives = 50
 
+        self.sim_compiled = None
+        self.sim_incremental = False
+        self.sim_incremental_ready = False
+        self.sim_cycle_ready = False
+
+        self.fast_model = None
+
     def shallow_clone(self):
         return type(self)(**self.wire_assignments)
 
@@ -549,16 +1145,19 @@ class Component(SimulationMixin):
         self.add_clk_wire()
 
     def add_clk_wire(self):
+        # port lists, wire assignments and node wiring may be shared with
+        # other instances through an elaboration template; replace rather
+        # than modify them
         if self.is_clocked_component:
             if 'clk' not in [w.name for w in self.IN]:
                 self.is_clk_wire_added = True
-                self.IN.append(w.clk)
+                self.IN = self.IN + [w.clk]
 
-                self.wire_assignments['clk'] = w.clk
+                self.wire_assignments = {**self.wire_assignments, 'clk': w.clk}
 
                 for node in self.nodes.values():
                     if node.component.is_clocked_component:
-                        node.in_wires['clk'] = w.clk
+                        node.in_wires = {**node.in_wires, 'clk': w.clk}
 
                 for c in self.internal_components:
                     c.add_clk_wire()
@@ -567,11 +1166,13 @@ class Component(SimulationMixin):
         if self.is_clk_wire_added:
             self.IN = [w for w in self.IN if w.name != 'clk']
 
-            del self.wire_assignments['clk']
+            self.wire_assignments = {k:v for k,v in self.wire_assignments.items()
+                                     if k != 'clk'}
 
             for node in self.nodes.values():
                 if node.component.is_clocked_component:
-                    del node.in_wires['clk']
+                    node.in_wires = {k:v for k,v in node.in_wires.items()
+                                     if k != 'clk'}
 
             for c in self.internal_components:
                 c.restore_clk_wire()
@@ -656,6 +1257,7 @@ class Component(SimulationMixin):
 
         self.nodes = {}
         self.edges = {}
+        restored = self.internal_components
         self.internal_components = []
         self.n = len(self.PARTS)
         self.clocked_n = 0
@@ -666,7 +1268,7 @@ class Component(SimulationMixin):
             nid = ncount
 
             p.validate_config()
-            component = p.shallow_clone()
+            component = self.instantiate_part(restored, nid-1)
             component.initialize()
 
             if component.is_clocked_component:
@@ -728,14 +1330,114 @@ class Component(SimulationMixin):
             if self.wire_assignments[name].get_actual_wire_width() != wire.width:
                 raise ComponentError(message=f'Wire width mismatch in {name}: required {wire.width}, actual {self.wire_assignments[name].get_actual_wire_width()} at component {self}')
 
+    def get_elaboration_signature(self):
+        """
+        Return the key identifying the internal structure of this component,
+        which depends only on its class's ports and PARTS, or None if the
+        component has PARTS of its own (e.g. fast RAM) and must be elaborated
+        individually.
+        """
+        if 'PARTS' in vars(self):
+            return None
+        cls = type(self)
+        return (tuple(w.get_key() for w in cls.IN),
+                tuple(w.get_key() for w in cls.OUT),
+                id(getattr(cls, 'PARTS', None)))
+
+    def save_elaboration_template(self, signature):
+        if signature is None:
+            return
+        # the template is stored on the class itself so that subclasses do
+        # not pick it up
+        type(self)._elaboration_template = self.ElaborationTemplate(self, signature)
+
+    def load_elaboration_template(self, signature):
+        if signature is None:
+            return False
+        template = vars(type(self)).get('_elaboration_template')
+        if template is None or template.signature != signature:
+            return False
+
+        self.IN = template.IN
+        self.OUT = template.OUT
+        if not getattr(self, 'PARTS', None):
+            self.PARTS = []
+        self.nodes = {}
+        self.edges = template.edges
+        restored = self.internal_components
+        self.internal_components = []
+        self.n = len(self.PARTS)
+        self.clocked_n = 0
+
+        for i, (p, proto) in enumerate(zip(self.PARTS, template.nodes)):
+            component = self.instantiate_part(restored, i)
+            # the part's wire assignments were normalized in place when the
+            # template was built; share them instead of the clone's copy
+            component.wire_assignments = p.wire_assignments
+            component.initialize()
+
+            if component.is_clocked_component:
+                self.is_clocked_component = True
+                self.clocked_components.append(component)
+                self.clocked_n += 1
+
+            self.internal_components.append(component)
+
+            node = copy(proto)
+            node.component = component
+            component.node = node
+            component.parent_component = self
+
+            self.nodes[node.id] = node
+
+        self.graph = {
+            'nodes': self.nodes,
+            'edges': self.edges,
+        }
+        return True
+
+    def get_fast_model(self):
+        if self.fast_models_enabled:
+            return self.fast_models.get(type(self))
+        return None
+
+    def apply_fast_model(self):
+        """
+        Replace the PARTS of this component with those of the fast model
+        registered for its class, if any.
+        """
+        if self.fast_model is not None:
+            return
+        model_class = self.get_fast_model()
+        if model_class is not None:
+            self.fast_model = model_class(self)
+            self.PARTS = self.fast_model.create_parts()
+
+    def instantiate_part(self, restored, index):
+        """
+        Return a new instance of PARTS[index], or the one in restored, the
+        parts instantiated before initialization by a simulation graph cache
+        hit (see compbuilder.graphcache), which the restored graph refers to.
+        """
+        if restored and index < len(restored):
+            return restored[index]
+        return self.PARTS[index].shallow_clone()
+
     def initialize(self):
         if self.is_initialized:
             return
 
-        self.normalize_component_wire_widths()
-        self.build_graph()
+        self.apply_fast_model()
 
-        self.set_constants()
+        # identical sub-components share the wiring of a single elaboration;
+        # only the component instances themselves are created per instance
+        signature = self.get_elaboration_signature()
+        if not self.load_elaboration_template(signature):
+            self.normalize_component_wire_widths()
+            self.build_graph()
+
+            self.set_constants()
+            self.save_elaboration_template(signature)
 
         self.is_initialized = True
 
@@ -862,7 +1564,10 @@ class Component(SimulationMixin):
         return output
 
     def eval(self, **kwargs):
-        return self.simulate(**kwargs)
+        output = self.simulate(**kwargs)
+        for f in self.simulation_hooks.values():
+            f(self)
+        return output
 
         self._process_deffered(**kwargs)
         print(self,'DEFFERED')
@@ -883,6 +1588,9 @@ class Component(SimulationMixin):
     def add_postprocessing_hook(self, key, f):
         self.postprocessing_hooks[key] = f
 
+    def add_simulation_hook(self, key, f):
+        self.simulation_hooks[key] = f
+
     def __getitem__(self, key):
         self.initialize()
         index_items = key.split('-')
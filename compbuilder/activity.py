@@ -0,0 +1,264 @@
+'''
+Net toggle counting for switching-activity (power) and hotspot estimates.
+
+ToggleCounter counts, for every net, the number of bits flipped between
+consecutive evaluations (the popcount of old XOR new) together with the
+number of evaluations, and aggregates the counts per hierarchical
+component.  It works on both simulators:
+
+  * the SimulationMixin graph (eval()/simulate()/run()), by comparing the
+    edge_values of the component after every evaluation through a
+    simulation hook; the compiled simulator only refreshes edge_values when
+    compiled with compile_simulator(keep_edge_values=True)
+  * the flattened netlist (update()/update_full()), by collecting the nets
+    reported as changed by the primitives' trigger() and comparing only
+    those, plus the input nets, after every update
+
+Counting is off unless a counter is enabled, and the simulators carry no
+counting code.  When enabled, it costs about 10% of a run() cycle on a
+gate-level RAM8 (see benchmarks/bench_activity.py).
+
+    with ToggleCounter(comp) as counter:
+        comp.run(stimulus)
+    counter.report()['nets'][:10]         # busiest nets first
+    counter.write_json('activity.json')
+'''
+import json
+from itertools import compress
+from operator import ne
+
+from compbuilder.exceptions import ComponentError
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # python < 3.10
+    def _popcount(x):
+        return bin(x).count('1')
+
+##############################################
+def _component_names(top):
+    '''
+    Return {id(component): (name, ancestor names from the top down)} for the
+    component tree rooted at top.  Names follow compbuilder.flatten, i.e.,
+    the gate name followed by the node id path from the top component.
+    '''
+    names = {}
+
+    def walk(c, path, ancestors):
+        name = getattr(c, 'name', None) or f'{c.get_gate_name()}{path}'
+        names[id(c)] = (name, ancestors)
+        for inner in c.internal_components or []:
+            walk(inner, path + f'-{inner.node.id}', ancestors + (name,))
+
+    walk(top, '', ())
+    return names
+
+##############################################
+class ToggleCounter:
+    '''
+    Toggle counter of the nets of one top-level component.
+
+    Attributes:
+      toggles  -- {net key: number of bit toggles}, keyed by edge key for
+                  the simulation graph and by flatten.Net for the netlist
+      cycles   -- number of evaluations counted
+    '''
+    HOOK = 'toggle-counter'
+
+    def __init__(self, component):
+        self.component = component
+        self.toggles = {}
+        self.cycles = 0
+        self.last = {}
+        self.edges = None
+        self.installed = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    ################
+    def enable(self):
+        if self.installed:
+            return
+        comp = self.component
+        comp.elaborate()
+        # start counting from the current values so that enabling the
+        # counter does not count the settling of the initial state
+        self.last.update((ek, s.value) for ek, s in getattr(comp, 'edge_values', {}).items())
+        self.edges = None
+        if hasattr(comp, 'netlist'):
+            wrapped = [c for c in [comp, *comp.primitives]
+                       if {'trigger', 'update', 'update_full'} & c.__dict__.keys()]
+            if wrapped:
+                raise ComponentError(message=f'{wrapped[0]} is already wrapped; disable the other tool first')
+        comp.add_simulation_hook(self.HOOK, self.sample_edges)
+        self.installed.append((comp, None, None))
+
+        if hasattr(comp, 'netlist'):
+            self.last.update((net, net.signal.value) for net in comp.netlist)
+            touched = self.touched = set()
+            for p in comp.primitives:
+                original = p.trigger
+
+                def counted_trigger(_original=original):
+                    affected = _original()
+                    touched.update(affected)
+                    return affected
+
+                p.trigger = counted_trigger
+                self.installed.append((p, 'trigger', counted_trigger))
+            for name in ('update', 'update_full'):
+                original = getattr(comp, name)
+
+                def counted_update(_original=original, **inputs):
+                    outputs = _original(**inputs)
+                    self.sample_nets(inputs)
+                    return outputs
+
+                setattr(comp, name, counted_update)
+                self.installed.append((comp, name, counted_update))
+
+    def disable(self):
+        for component, name, wrapper in self.installed:
+            if name is None:
+                component.simulation_hooks.pop(self.HOOK, None)
+            elif component.__dict__.get(name) is wrapper:
+                del component.__dict__[name]
+        self.installed = []
+
+    def reset(self):
+        self.toggles.clear()
+        self.cycles = 0
+
+    ################
+    def sample_edges(self, component):
+        '''
+        Simulation hook counting the toggles of the edge values of the
+        component since the previous call.
+        '''
+        edge_values = component.edge_values
+        edges = self.edges
+        state = getattr(edge_values, 'state', None)
+        if state is not None:
+            # dense view of simulate()/run(): compare the edge value list
+            if edges is None or edges[1] is not edge_values.edge_keys:
+                keys = edge_values.edge_keys
+                present = edge_values.present
+                last = self.last
+                edges = self.edges = (
+                    range(len(keys)), keys,
+                    [last.get(keys[i], 0) if p else 0 for i, p in enumerate(present)])
+            positions, keys, old_values = edges
+            values = state[:]
+            if values != old_values:
+                # edges without a value stay at 0 and never show up here
+                last = self.last
+                toggles = self.toggles
+                for i in compress(positions, map(ne, values, old_values)):
+                    v = values[i]
+                    ek = keys[i]
+                    toggles[ek] = toggles.get(ek, 0) + _popcount(v ^ old_values[i])
+                    last[ek] = v
+                self.edges = (positions, keys, values)
+            self.cycles += 1
+            return
+
+        if edges is None or edges[0] is not edge_values or len(edges[1]) != len(edge_values):
+            # simulate_incremental() and step() keep their edge_values dict
+            # across calls, replacing or updating its signals; the compiled
+            # simulator builds a new dict on every call, which is re-keyed
+            last = self.last
+            keys = list(edge_values)
+            edges = self.edges = (edge_values, keys, [last.get(ek, 0) for ek in keys])
+        _, keys, old_values = edges
+
+        values = [s.value for s in edge_values.values()]
+        if values != old_values:
+            last = self.last
+            toggles = self.toggles
+            for i, (v, old) in enumerate(zip(values, old_values)):
+                if v != old:
+                    ek = keys[i]
+                    toggles[ek] = toggles.get(ek, 0) + _popcount(v ^ old)
+                    last[ek] = v
+            self.edges = (edge_values, keys, values)
+        self.cycles += 1
+
+    def sample_nets(self, inputs):
+        comp = self.component
+        touched = self.touched
+        for w in comp.IN:
+            if w.name in inputs:
+                touched.add(comp.wiring[w.get_key()][0])
+        last = self.last
+        toggles = self.toggles
+        for net in touched:
+            v = net.signal.value
+            old = last.get(net, 0)
+            if v != old:
+                toggles[net] = toggles.get(net, 0) + _popcount(v ^ old)
+                last[net] = v
+        touched.clear()
+        self.cycles += 1
+
+    ################
+    def owners(self):
+        '''
+        Return {net key: (net name, width, owner name, ancestor names)} for
+        the nets counted so far.
+        '''
+        comp = self.component
+        names = _component_names(comp)
+        by_cid = {c.cid: c for c in comp.sim_all_components + [comp]}
+        by_name = {name: ancestors for name, ancestors in names.values()}
+        owners = {}
+        for key in self.toggles:
+            if isinstance(key, tuple):
+                cid, (wire, width) = key
+                owner, ancestors = names[id(by_cid[cid])]
+                owners[key] = (f'{owner}:{wire}', width, owner, ancestors)
+            else:
+                owner = key.name.rsplit(':', 1)[0]
+                if owner not in by_name:
+                    raise ComponentError(message=f'Net {key.name} has no owner component')
+                owners[key] = (key.name, key.width, owner, by_name[owner])
+        return owners
+
+    def report(self):
+        '''
+        Return a dict with the number of 'cycles' counted, the 'nets' with
+        their toggles, toggle rate per cycle and activity factor per bit per
+        cycle, and the 'components' with the toggles of all nets inside
+        them, both sorted by decreasing toggles.
+        '''
+        cycles = self.cycles or 1
+        nets = []
+        components = {}
+        for key, (name, width, owner, ancestors) in self.owners().items():
+            toggles = self.toggles[key]
+            nets.append({'name': name,
+                         'width': width,
+                         'toggles': toggles,
+                         'rate': toggles / cycles,
+                         'activity': toggles / (cycles * width)})
+            for path in ancestors + (owner,):
+                components[path] = components.get(path, 0) + toggles
+        nets.sort(key=lambda n: (-n['toggles'], n['name']))
+        return {
+            'cycles': self.cycles,
+            'nets': nets,
+            'components': [{'path': path, 'toggles': toggles, 'rate': toggles / cycles}
+                           for path, toggles in sorted(components.items(),
+                                                       key=lambda item: (-item[1], item[0]))],
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.report(), **kwargs)
+
+    def write_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=1)
@@ -0,0 +1,215 @@
+'''
+Fast behavioral models substituted for gate-level component subtrees.
+
+A model is registered for a component class; whenever a component of that
+class is elaborated, its PARTS are replaced by two generated primitives
+driven by the model, in the same way as the hand-written fast RAM in
+test/test_ram.py:
+
+  - an output primitive computing the outputs from the inputs and the model
+    state (FastModel.evaluate), and
+  - for clocked models, a clocked primitive that saves the inputs at the end
+    of every evaluation and applies them to the model state at the start of
+    the next one (FastModel.clock), just like a DFF.
+
+Models work on plain ints.  For example, a behavioral RAM8:
+
+    class RAM8Model(FastModel):
+        clocked = True
+
+        def reset(self):
+            self.memory = [0] * 8
+
+        def evaluate(self, In, address, load):
+            return {'out': self.memory[address]}
+
+        def clock(self, In, address, load):
+            if load:
+                self.memory[address] = In
+
+    register_fast_model(RAM8, RAM8Model, verify=500)
+
+When verify is given, the model is first co-simulated against the gate-level
+implementation on random inputs and rejected on the first mismatch.
+'''
+from collections import namedtuple
+from contextlib import contextmanager
+from random import Random
+
+from compbuilder import Component, Signal, Wire
+from compbuilder.exceptions import ComponentError
+
+MODEL_LINK = Wire('model_link')
+
+##############################################
+class FastModel:
+    '''
+    Base class of behavioral models.  One model instance is created for each
+    substituted component and receives that component.
+    '''
+    clocked = False
+    # names of the attributes holding the model state, ints or lists of
+    # ints, captured by compbuilder.checkpoint
+    STATE_ATTRIBUTES = ()
+
+    def __init__(self, component):
+        self.component = component
+        self.reset()
+
+    def reset(self):
+        pass
+
+    def evaluate(self, **inputs):
+        '''
+        Return a dict mapping each output wire name to its int value for the
+        given int input values and the current state.
+        '''
+        raise NotImplementedError
+
+    def clock(self, **inputs):
+        '''
+        Update the state from the input values of the previous evaluation.
+        Only called for clocked models.
+        '''
+        pass
+
+    def create_parts(self):
+        output_class, state_class = _model_part_classes(self.component, self.clocked)
+        ports = {wire.name: Wire(wire.name, wire.width)
+                 for wire in self.component.IN + self.component.OUT}
+        inputs = {wire.name: ports[wire.name] for wire in self.component.IN}
+        if not self.clocked:
+            return [output_class(self, **ports)]
+        return [
+            output_class(self, model_link=MODEL_LINK, **ports),
+            state_class(self, model_link=MODEL_LINK, **inputs),
+        ]
+
+##############################################
+_part_classes = {}
+
+def _model_part_classes(component, clocked):
+    '''
+    Return the (output, state) primitive classes for the ports of the given
+    component, creating them on first use.
+    '''
+    in_keys = tuple(component.get_in_keys())
+    out_keys = tuple(component.get_out_keys())
+    key = (type(component), in_keys, out_keys, clocked)
+    if key in _part_classes:
+        return _part_classes[key]
+
+    class FastModelOutput(Component):
+        IN = [Wire(*k) for k in in_keys] + ([MODEL_LINK] if clocked else [])
+        OUT = [Wire(*k) for k in out_keys]
+
+        PARTS = []
+
+        def __init__(self, model, **kwargs):
+            super(FastModelOutput, self).__init__(**kwargs)
+            self.model = model
+
+        def shallow_clone(self):
+            return type(self)(self.model, **self.wire_assignments)
+
+        def process(self, model_link=None, **kwargs):
+            outputs = self.model.evaluate(**{name: signal.value
+                                             for name, signal in kwargs.items()})
+            return {wire.name: Signal(outputs[wire.name], wire.width)
+                    for wire in self.OUT}
+
+    class FastModelState(Component):
+        IN = [Wire(*k) for k in in_keys]
+        OUT = [MODEL_LINK]
+
+        PARTS = []
+
+        def __init__(self, model, **kwargs):
+            super(FastModelState, self).__init__(**kwargs)
+            self.model = model
+            self.is_clocked_component = True
+            self.saved_input_kwargs = None
+
+        def shallow_clone(self):
+            return type(self)(self.model, **self.wire_assignments)
+
+        def process(self):
+            if self.saved_input_kwargs is not None:
+                self.model.clock(**self.saved_input_kwargs)
+            return {'model_link': Signal(0)}
+
+        def prepare_process(self, **kwargs):
+            self.saved_input_kwargs = {name: signal.value
+                                       for name, signal in kwargs.items()}
+
+    gate_name = type(component).__name__
+    FastModelOutput.__name__ = FastModelOutput.__qualname__ = f'{gate_name}FastModelOutput'
+    FastModelState.__name__ = FastModelState.__qualname__ = f'{gate_name}FastModelState'
+
+    _part_classes[key] = (FastModelOutput, FastModelState)
+    return _part_classes[key]
+
+##############################################
+def register_fast_model(component_class, model_class, verify=0, seed=None):
+    '''
+    Substitute model_class for the gate-level implementation of
+    component_class in all subsequent elaborations.  If verify is non-zero,
+    co-simulate the model against the gate-level implementation for that
+    many cycles first and raise ComponentError on the first mismatch.
+    '''
+    Component.fast_models[component_class] = model_class
+    if verify:
+        mismatch = verify_fast_model(component_class, cycles=verify, seed=seed)
+        if mismatch is not None:
+            del Component.fast_models[component_class]
+            raise ComponentError(message=f'Fast model {model_class.__name__} does not match '
+                                         f'{component_class.__name__}: {mismatch}')
+
+##############################################
+def unregister_fast_model(component_class):
+    Component.fast_models.pop(component_class, None)
+
+##############################################
+@contextmanager
+def gate_level():
+    '''
+    Elaborate components with their gate-level PARTS inside this context,
+    ignoring registered fast models.
+    '''
+    enabled = Component.fast_models_enabled
+    Component.fast_models_enabled = False
+    try:
+        yield
+    finally:
+        Component.fast_models_enabled = enabled
+
+##############################################
+Mismatch = namedtuple('Mismatch', ['cycle', 'inputs', 'expected', 'actual'])
+
+def verify_fast_model(component_class, cycles=100, seed=None):
+    '''
+    Co-simulate a component class with and without its registered fast
+    model on random inputs.  Return a Mismatch (cycle, inputs, gate-level
+    outputs, model outputs) describing the first differing evaluation, or
+    None if all cycles agree.
+    '''
+    if component_class not in Component.fast_models:
+        raise ComponentError(message=f'No fast model registered for {component_class.__name__}')
+
+    with gate_level():
+        reference = component_class()
+        reference.elaborate()
+    model = component_class()
+    model.elaborate()
+
+    rng = Random(seed)
+    for cycle in range(cycles):
+        inputs = {wire.name: Signal(rng.getrandbits(wire.width), wire.width)
+                  for wire in reference.IN}
+        expected = {name: signal.value for name, signal in reference.eval(**inputs).items()}
+        actual = {name: signal.value for name, signal in model.eval(**inputs).items()}
+        if expected != actual:
+            return Mismatch(cycle,
+                            {name: signal.value for name, signal in inputs.items()},
+                            expected, actual)
+    return None
@@ -0,0 +1,227 @@
+'''
+Bit-parallel evaluation of many independent input vectors over the
+flattened primitive netlist.
+
+Every bit of every net is held in one Python int whose bit j is the value of
+that net bit under input vector j, so a single pass over the netlist
+evaluates all vectors at once.  Primitives take part through the bitwise
+formulas declared on their process method (see compbuilder.codegen), e.g.
+
+    process.bitwise = {
+        'out': '~(a & b)',
+    }
+
+Formulas must only use bitwise operators so that they hold for every packed
+vector bit independently.  Only combinational designs are supported; a
+primitive without a formula, such as a clocked DFF, is rejected.  As for
+flatten(), the design and all its parts must derive from VisualMixin:
+
+    class Mux8Way16(VisualMixin, Component):
+        ...
+
+    comp = Mux8Way16()
+    results = comp.eval_batch(a=[...], b=[...], ..., sel=[...])
+    results['out']   # list of ints, one per input vector
+'''
+from compbuilder import Component, Signal
+from compbuilder.exceptions import ComponentError
+from compbuilder.codegen import get_local_formula, pin_local
+from compbuilder import flatten
+
+##############################################
+def primitive_order(comp):
+    '''
+    Return the primitives of a flattened component in an order in which every
+    primitive comes after all the primitives driving its input nets.  Raise
+    ComponentError if a loop prevents such an ordering.
+    '''
+    primitives = comp.primitives
+    pending_sources = {}
+    for net in comp.netlist:
+        pending_sources[net] = sum(1 for s in net.sources
+                                   if s.component is not comp)
+
+    waiting = {}
+    readers = {}
+    ready = []
+    for p in primitives:
+        in_nets = {p.wiring[w.get_key()][0] for w in p.IN}
+        waiting[p] = sum(1 for net in in_nets if pending_sources[net])
+        for net in in_nets:
+            readers.setdefault(net, []).append(p)
+        if not waiting[p]:
+            ready.append(p)
+
+    order = []
+    for p in ready:   # ready grows while being iterated
+        order.append(p)
+        for net in {p.wiring[w.get_key()][0] for w in p.OUT}:
+            pending_sources[net] -= 1
+            if pending_sources[net] == 0:
+                for q in readers.get(net, []):
+                    waiting[q] -= 1
+                    if waiting[q] == 0:
+                        ready.append(q)
+
+    if len(order) != len(primitives):
+        remaining = [p for p in primitives if waiting[p]]
+        raise ComponentError(message='Cannot order primitives (loop or latch):\n' +
+                             ''.join(f' - {p}\n' for p in remaining[:20]))
+    return order
+
+##############################################
+class BitParallelEngine:
+    '''
+    Straight-line evaluator of a flattened combinational component where
+    each net bit is a local int packing one bit per input vector.
+    '''
+    def __init__(self, comp):
+        comp.flatten()
+        self.comp = comp
+        self.order = primitive_order(comp)
+
+        # assign a slot (generated local variable) to each net bit
+        self.slots = {}
+        for net in comp.netlist:
+            self.slots[net] = [f'_s{len(self.slots)}_{b}' for b in range(net.width)]
+
+        self.inputs = [(w.name, self.pin_slots(comp, w)) for w in comp.IN]
+        self.outputs = [(w.name, self.pin_slots(comp, w)) for w in comp.OUT]
+        self.function = self.compile()
+
+    def pin_slots(self, part, wire):
+        net, nslice = part.wiring[wire.get_key()]
+        start, stop, _ = nslice.indices(net.width)
+        return self.slots[net][start:stop]
+
+    # parameters of the generated evaluate()
+    parameters = '_in, M'
+
+    def emit_assign(self, slot, expr, gate):
+        '''
+        Return the source line storing expr into a net-bit slot.  gate tells
+        whether expr is a gate formula, which must be masked to the vectors
+        in use, or a constant or input bit.  Subclasses may override this to
+        wrap every assignment.
+        '''
+        if gate:
+            return f'{slot} = ({expr}) & M'
+        return f'{slot} = {expr}'
+
+    def generate_source(self):
+        comp = self.comp
+        lines = [f'def evaluate({self.parameters}):']
+        emit = lambda s: lines.append('    ' + s)
+
+        # constant nets and nets without any driver
+        driven = set()
+        for name, slots in self.inputs:
+            driven.update(slots)
+        for p in self.order:
+            for w in p.OUT:
+                driven.update(self.pin_slots(p, w))
+        for net in comp.netlist:
+            value = net.signal.value if net.signal is not None else 0
+            for b, slot in enumerate(self.slots[net]):
+                if slot not in driven:
+                    emit(self.emit_assign(slot, 'M' if (value >> b) & 1 else '0', False))
+
+        for i, (name, slots) in enumerate(self.inputs):
+            for b, slot in enumerate(slots):
+                emit(self.emit_assign(slot, f'_in[{i}][{b}]', False))
+
+        for p in self.order:
+            formula = get_local_formula(p)
+            if formula is None:
+                raise ComponentError(message=f'Primitive {p.get_gate_name()} does not declare a bitwise formula')
+            widths = {w.width for w in p.IN + p.OUT}
+            if len(widths) != 1:
+                raise ComponentError(message=f'Primitive {p.get_gate_name()} mixes pin widths; cannot evaluate bitwise')
+            for b in range(widths.pop()):
+                for w in p.IN:
+                    emit(f'{pin_local(w.name)} = {self.pin_slots(p, w)[b]}')
+                for w in p.OUT:
+                    emit(self.emit_assign(self.pin_slots(p, w)[b], formula[w.name], True))
+
+        outputs = ', '.join('[' + ', '.join(slots) + ']' for _, slots in self.outputs)
+        emit(f'return ({outputs},)')
+        return '\n'.join(lines) + '\n'
+
+    def compile(self):
+        namespace = {}
+        code = compile(self.generate_source(),
+                       f'<bitparallel {self.comp.get_gate_name()}>', 'exec')
+        exec(code, namespace)
+        return namespace['evaluate']
+
+    def evaluate_packed(self, packed_inputs, count):
+        '''
+        Evaluate packed inputs, given as a list (one entry per input wire, in
+        IN order) of lists of per-bit packed ints.  Return packed outputs in
+        the same layout.
+        '''
+        return self.function(packed_inputs, (1 << count) - 1)
+
+    def run(self, **inputs):
+        comp = self.comp
+        lengths = {len(v) for v in inputs.values()}
+        if len(lengths) > 1:
+            raise ComponentError(message='Input vectors must have identical length')
+        count = lengths.pop() if lengths else 1
+
+        packed = []
+        for w in comp.IN:
+            if w.name not in inputs:
+                raise ComponentError(message=f'Missing input vectors for {w.name}')
+            packed.append(pack([v.get() if isinstance(v, Signal) else v
+                                for v in inputs[w.name]], w.width))
+
+        results = self.evaluate_packed(packed, count)
+        return {w.name: unpack(bits, count)
+                for w, bits in zip(comp.OUT, results)}
+
+##############################################
+def pack(values, width):
+    '''
+    Pack a list of integer values into a list of width ints where bit j of
+    the b-th int is bit b of values[j].
+
+    >>> pack([1, 2, 3], 2)
+    [5, 6]
+    '''
+    packed = []
+    for b in range(width):
+        bits = ''.join('1' if (v >> b) & 1 else '0' for v in reversed(values))
+        packed.append(int(bits, 2) if bits else 0)
+    return packed
+
+##############################################
+def unpack(packed, count):
+    '''
+    Inverse of pack()
+
+    >>> unpack([5, 6], 3)
+    [1, 2, 3]
+    '''
+    values = [0] * count
+    for b, bits in enumerate(packed):
+        for j in range(count):
+            if (bits >> j) & 1:
+                values[j] |= 1 << b
+    return values
+
+##############################################
+def eval_batch(self, **inputs):
+    '''
+    Evaluate this combinational component for many input vectors at once.
+    Each keyword argument is a list of ints (or Signals), one per vector, and
+    all lists must have the same length.  Return a dict mapping each output
+    wire name to a list of int results.  Raise ComponentError if a part of
+    the design does not derive from VisualMixin.
+    '''
+    if getattr(self, 'batch_engine', None) is None:
+        self.batch_engine = BitParallelEngine(self)
+    return self.batch_engine.run(**inputs)
+
+##############################################
+setattr(Component,'eval_batch',eval_batch)
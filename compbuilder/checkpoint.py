@@ -0,0 +1,267 @@
+'''
+Checkpoints of the simulation state of a component.
+
+snapshot() captures all state a simulated component carries from one
+evaluation to the next and restore() puts it back, so that a long run can
+be rewound to an earlier cycle, e.g., to step backwards while debugging or
+to bisect where two runs diverge, without re-simulating from reset.
+
+The state is laid out as one flat vector of ints:
+
+  * the edge_values of the simulation graph
+  * saved_input_kwargs and saved_output of every clocked component
+  * the attributes named by STATE_ATTRIBUTES of the components, such as the
+    buffer of a fast RAM, and of their fast models (see
+    compbuilder.behavioral); each attribute is an int or a list of ints
+  * the net signals of the flattened netlist, if any
+
+The vector is stored in pages of array('Q') (lists for wider values).  A
+page equal to the corresponding page of the previous snapshot of the same
+component is shared rather than copied, so frequent checkpoints of a large
+memory whose contents barely change cost little memory.  Snapshots can be
+written to disk and read back to resume a run in a later process.
+
+    checkpoint = comp.snapshot()
+    ...
+    comp.restore(checkpoint)
+    checkpoint.save('cycle1000.snap')
+    comp.restore(load_snapshot('cycle1000.snap'))
+'''
+import pickle
+from array import array
+
+from compbuilder import Component, Signal
+from compbuilder.exceptions import ComponentError
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+##############################################
+class Snapshot:
+    '''
+    Captured state of a component.
+
+    Attributes:
+      signature  -- lengths of the segments of the state vector, which must
+                    match the component it is restored into
+      pages      -- the state vector in pages of PAGE_SIZE ints
+    '''
+    PAGE_SIZE = 1024
+
+    def __init__(self, signature, pages):
+        self.signature = signature
+        self.pages = pages
+
+    def __len__(self):
+        return sum(len(page) for page in self.pages)
+
+    def values(self):
+        values = []
+        for page in self.pages:
+            values.extend(page)
+        return values
+
+    def shared_pages(self, other):
+        '''
+        Return the number of pages shared with another snapshot.
+        '''
+        return sum(1 for a, b in zip(self.pages, other.pages) if a is b)
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            pickle.dump((SNAPSHOT_FORMAT_VERSION, self.signature, self.pages), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+##############################################
+def load_snapshot(filename):
+    with open(filename, 'rb') as f:
+        data = pickle.load(f)
+    if data[0] != SNAPSHOT_FORMAT_VERSION:
+        raise ComponentError(message=f'{filename}: unsupported snapshot format {data[0]}')
+    return Snapshot(data[1], data[2])
+
+##############################################
+def _state_objects(component):
+    '''
+    Return (object, attribute names) of the extra state of the component
+    and of its fast model, if any.
+    '''
+    objects = [(component, component.STATE_ATTRIBUTES)]
+    model = getattr(component, 'model', None)
+    if model is not None:
+        objects.append((model, getattr(model, 'STATE_ATTRIBUTES', ())))
+    return objects
+
+##############################################
+class StateLayout:
+    '''
+    Position of every piece of state of an elaborated component in the
+    state vector.
+    '''
+    def __init__(self, comp):
+        comp.elaborate()
+        self.edge_keys = [ek for ek in comp.sim_edges if ek[1][0] != 'in-out-pair']
+        self.clocked = [c for c in comp.sim_base_components if c.is_clocked_component]
+
+        self.attributes = []
+        seen = set()
+        for c in comp.sim_base_components:
+            for obj, names in _state_objects(c):
+                if id(obj) in seen:
+                    continue
+                seen.add(id(obj))
+                for name in names:
+                    value = getattr(obj, name)
+                    if not isinstance(value, int):
+                        # buffers shared by several parts are captured once
+                        if id(value) in seen:
+                            continue
+                        seen.add(id(value))
+                    size = None if isinstance(value, int) else len(value)
+                    self.attributes.append((obj, name, size))
+
+        self.nets = list(getattr(comp, 'netlist', []))
+
+        self.signature = (
+            len(self.edge_keys),
+            sum(2 + len(c.IN) + len(c.OUT) for c in self.clocked),
+            sum(1 if size is None else size for _, _, size in self.attributes),
+            len(self.nets),
+        )
+
+    ################
+    def _saved(self, values, saved, wires):
+        # presence mask (bit 0: saved at all, bit i+1: wire i saved) and
+        # one slot per wire
+        if saved is None:
+            values.append(0)
+            values.extend(0 for _ in wires)
+            return
+        names = {w.name for w in wires}
+        if not names.issuperset(saved):
+            raise ComponentError(message=f'Cannot capture saved signals {sorted(saved)}')
+        mask = 1
+        slots = []
+        for i, w in enumerate(wires):
+            signal = saved.get(w.name)
+            if signal is not None:
+                mask |= 1 << (i + 1)
+            slots.append(0 if signal is None else
+                         signal.value if isinstance(signal, Signal) else signal)
+        values.append(mask)
+        values.extend(slots)
+
+    def capture(self, comp):
+        values = []
+        edge_values = getattr(comp, 'edge_values', {})
+        for ek in self.edge_keys:
+            signal = edge_values.get(ek)
+            # 0 stands for an edge without a value
+            values.append(0 if signal is None else signal.value + 1)
+        for c in self.clocked:
+            self._saved(values, c.saved_input_kwargs, c.IN)
+            self._saved(values, getattr(c, 'saved_output', None), c.OUT)
+        for obj, name, size in self.attributes:
+            value = getattr(obj, name)
+            if size is None:
+                values.append(value)
+            else:
+                values.extend(value)
+        values.extend(net.signal.value for net in self.nets)
+        return values
+
+    ################
+    def _restore_saved(self, values, i, wires):
+        mask = values[i]
+        if not mask & 1:
+            return None, i + 1 + len(wires)
+        saved = {}
+        for k, w in enumerate(wires):
+            if (mask >> (k + 1)) & 1:
+                saved[w.name] = Signal(values[i + 1 + k], w.width)
+        return saved, i + 1 + len(wires)
+
+    def apply(self, comp, values):
+        i = 0
+        edge_values = {}
+        for ek in self.edge_keys:
+            if values[i]:
+                edge_values[ek] = Signal(values[i] - 1, ek[1][1])
+            i += 1
+        comp.edge_values = edge_values
+        for c in self.clocked:
+            c.saved_input_kwargs, i = self._restore_saved(values, i, c.IN)
+            saved_output, i = self._restore_saved(values, i, c.OUT)
+            if saved_output is not None or hasattr(c, 'saved_output'):
+                c.saved_output = saved_output
+        for obj, name, size in self.attributes:
+            if size is None:
+                setattr(obj, name, values[i])
+                i += 1
+            else:
+                # in place, as the same buffer may be shared by several parts
+                getattr(obj, name)[:] = values[i:i+size]
+                i += size
+        for net in self.nets:
+            # fresh signals, as those of the input nets may be the caller's
+            # own (e.g., Signal.T) after update() or update_full()
+            net.signal = Signal(values[i], net.width)
+            net.transient_signal = Signal(values[i], net.width)
+            i += 1
+
+##############################################
+def _page(values):
+    try:
+        return array('Q', values)
+    except OverflowError:
+        return list(values)
+
+##############################################
+def _layout(comp):
+    layout = getattr(comp, 'sim_state_layout', None)
+    # flattening later adds the nets to the state
+    if layout is None or len(layout.nets) != len(getattr(comp, 'netlist', [])):
+        layout = comp.sim_state_layout = StateLayout(comp)
+    return layout
+
+##############################################
+def snapshot(self):
+    '''
+    Capture the simulation state of this component and return it as a
+    Snapshot.  Pages equal to those of the previous snapshot of this
+    component are shared with it.
+    '''
+    layout = _layout(self)
+    values = layout.capture(self)
+
+    previous = getattr(self, 'sim_last_snapshot', None)
+    if previous is not None and previous.signature != layout.signature:
+        previous = None
+    size = Snapshot.PAGE_SIZE
+    pages = []
+    for k, start in enumerate(range(0, len(values), size)):
+        page = _page(values[start:start+size])
+        if previous is not None and previous.pages[k] == page:
+            page = previous.pages[k]
+        pages.append(page)
+
+    self.sim_last_snapshot = Snapshot(layout.signature, pages)
+    return self.sim_last_snapshot
+
+##############################################
+def restore(self, snapshot):
+    '''
+    Restore the simulation state captured by snapshot() from this component
+    or from another instance of the same design.
+    '''
+    layout = _layout(self)
+    if snapshot.signature != layout.signature:
+        raise ComponentError(message=f'Snapshot does not match the state of {self.get_gate_name()}')
+    layout.apply(self, snapshot.values())
+
+    # the event-driven schedulers start over from the restored state
+    self.sim_incremental_ready = False
+    self.sim_cycle_ready = False
+
+##############################################
+setattr(Component,'snapshot',snapshot)
+setattr(Component,'restore',restore)
@@ -0,0 +1,243 @@
+'''
+Straight-line Python code generation for SimulationMixin.simulate.
+
+The topologically sorted simulation graph is turned into a single Python
+function in which every edge is a local integer variable.  Primitives whose
+process() declares a bitwise formula, e.g.
+
+    def process(self, a, b):
+        ...
+    process.bitwise = {
+        'out': '~(a & b)',
+    }
+
+are inlined into the generated code; all other primitives (including
+clocked ones) are called through their process()/prepare_process() methods
+with Signal arguments as usual.  A formula is a Python expression over the
+integer values of the input pins; its result is masked to the output pin
+width.  In generated code the input pins are bound to locals named by
+pin_local(), so pin names never clash with the generator's own names.
+
+Compilation is opt-in:
+
+    comp = Register16()
+    comp.compile_simulator()
+    comp.eval(In=..., load=...)   # now runs the generated function
+'''
+import io
+import tokenize
+
+from compbuilder import Component, Signal
+from compbuilder.exceptions import ComponentError
+
+# generated code objects shared between designs with identical source
+_code_cache = {}
+
+##############################################
+def get_bitwise_formula(component):
+    '''
+    Return the bitwise formula dict declared on the component's process
+    method, or None if the component does not declare one.
+    '''
+    return getattr(getattr(component, 'process', None), 'bitwise', None)
+
+##############################################
+def pin_local(name):
+    '''
+    Return the name of the generated local holding the value of a pin.
+
+    >>> pin_local('M')
+    '_p_M'
+    '''
+    return f'_p_{name}'
+
+# formulas with their pin names replaced, by (formula, pin names)
+_local_formula_cache = {}
+
+##############################################
+def get_local_formula(component):
+    '''
+    Return the bitwise formula of the component (see get_bitwise_formula())
+    with every input pin name replaced by its pin_local() name, or None if
+    the component does not declare one.
+    '''
+    formula = get_bitwise_formula(component)
+    if formula is None:
+        return None
+    pins = frozenset(w.name for w in component.IN)
+    key = (tuple(sorted(formula.items())), pins)
+    local = _local_formula_cache.get(key)
+    if local is None:
+        local = _local_formula_cache[key] = {
+            name: _rename_pins(expr, pins) for name, expr in formula.items()}
+    return local
+
+def _rename_pins(expr, pins):
+    tokens = []
+    previous = None
+    for tok in tokenize.generate_tokens(io.StringIO(expr).readline):
+        string = tok.string
+        # names after a dot are attributes, not pins
+        if tok.type == tokenize.NAME and string in pins and previous != '.':
+            string = pin_local(string)
+        tokens.append((tok.type, string))
+        previous = tok.string
+    return tokenize.untokenize(tokens).strip()
+
+##############################################
+def _mask(width):
+    return (1 << width) - 1
+
+##############################################
+def generate_simulator_source(self, keep_edge_values=False):
+    '''
+    Generate the source of a function simulate(kwargs, components) that
+    performs one evaluation of the already sorted simulation graph.  Return
+    a tuple (source, components, edge_keys) where components are referenced
+    by index from the source and edge_keys lists the edges whose values are
+    returned when keep_edge_values is set, i.e., all edges written by the
+    function.
+    '''
+    edge_names = {}
+    edge_keys = []
+    for ek in self.sim_edges:
+        if ek[1][0] == 'in-out-pair':
+            continue
+        edge_names[ek] = f'_e{len(edge_keys)}'
+        edge_keys.append(ek)
+
+    components = []
+    component_names = {}
+    def component_name(c):
+        if id(c) not in component_names:
+            component_names[id(c)] = f'_c[{len(components)}]'
+            components.append(c)
+        return component_names[id(c)]
+
+    lines = ['def simulate(kwargs, _c, Signal=Signal):']
+    emit = lambda s: lines.append('    ' + s)
+
+    input_edges = set()
+    for wire in self.IN:
+        ek = (self.cid, wire.get_key())
+        input_edges.add(ek)
+        emit(f"{edge_names[ek]} = kwargs['{wire.name}'].value")
+
+    written = set(input_edges)
+    # edges assembled from several partial writes must start from zero
+    partial = {}
+    header = len(lines)
+
+    def read_pin(component, wire):
+        mapped_wire = component.wire_map[wire.get_key()]
+        ek = mapped_wire.edge_key
+        offset = mapped_wire.offset
+        mask = _mask(wire.width)
+        if ek not in written and mapped_wire.is_constant:
+            value = mapped_wire.constant_value
+            return str((value >> offset) & mask)
+        if ek not in written:
+            raise ComponentError(message=f'Required input signal not found for {component}:{wire.name}')
+        name = edge_names[ek]
+        if offset == 0 and ek[1][1] == wire.width:
+            return name
+        if offset == 0:
+            return f'({name} & {mask})'
+        return f'(({name} >> {offset}) & {mask})'
+
+    def write_pin(component, wire, expr):
+        mapped_wire = component.wire_map[wire.get_key()]
+        ek = mapped_wire.edge_key
+        offset = mapped_wire.offset
+        mask = _mask(wire.width)
+        name = edge_names[ek]
+        written.add(ek)
+        if offset == 0 and ek[1][1] == wire.width:
+            emit(f'{name} = ({expr}) & {mask}')
+        else:
+            partial[ek] = name
+            emit(f'{name} = ({name} & {~(mask << offset)}) | '
+                 f'((({expr}) & {mask}) << {offset})')
+
+    for u in self.sim_topo_ordering:
+        c = u.component
+        formula = get_local_formula(c)
+        if not u.is_pair_node and formula is not None:
+            # inline primitive body
+            for wire in c.IN:
+                emit(f'{pin_local(wire.name)} = {read_pin(c, wire)}')
+            for wire in c.OUT:
+                write_pin(c, wire, formula[wire.name])
+            continue
+
+        if (not u.is_pair_node) or u.is_input_node:
+            args = ', '.join(f'{wire.name}=Signal({read_pin(c, wire)}, {wire.width})'
+                             for wire in c.IN)
+        else:
+            args = ''
+
+        if (not u.is_pair_node) or u.is_output_node:
+            emit(f'_o = {component_name(c)}.process({args})')
+            for wire in c.OUT:
+                write_pin(c, wire, f"_o['{wire.name}'].value")
+        else:
+            emit(f'{component_name(c)}.prepare_process({args})')
+
+    lines[header:header] = [f'    {name} = 0' for name in partial.values()]
+
+    outputs = []
+    for wire in self.OUT:
+        ek = (self.cid, wire.get_key())
+        if ek not in written:
+            raise ComponentError(errors=ek)
+        outputs.append(f"'{wire.name}': Signal({edge_names[ek]}, {wire.width})")
+    result = '{' + ', '.join(outputs) + '}'
+    if keep_edge_values:
+        # constant and undriven edges have no local
+        edge_keys = [ek for ek in edge_keys if ek in written]
+        edges = ', '.join(edge_names[ek] for ek in edge_keys)
+        emit(f'return {result}, ({edges}{"," if len(edge_keys) == 1 else ""})')
+    else:
+        emit(f'return {result}, None')
+
+    return '\n'.join(lines) + '\n', components, edge_keys
+
+##############################################
+def compile_simulator(self, keep_edge_values=False):
+    '''
+    Compile the simulation graph of this component into a straight-line
+    Python function used by subsequent simulate()/eval() calls.  When
+    keep_edge_values is set, edge_values is refreshed after every call so
+    that internal wires can still be traced, at some extra cost.
+    '''
+    self.elaborate()
+
+    source, components, edge_keys = self.generate_simulator_source(keep_edge_values)
+    code = _code_cache.get(source)
+    if code is None:
+        code = compile(source, f'<compiled {self.get_gate_name()}>', 'exec')
+        _code_cache[source] = code
+    namespace = {'Signal': Signal}
+    exec(code, namespace)
+
+    self.sim_compiled = (namespace['simulate'], components, edge_keys)
+
+##############################################
+def simulate_compiled(self, **kwargs):
+    function, components, edge_keys = self.sim_compiled
+    outputs, values = function(kwargs, components)
+    if values is None:
+        # keep top-level wires only, which is enough for tracing the outputs
+        self.edge_values = {(self.cid, wire.get_key()): kwargs[wire.name]
+                            for wire in self.IN}
+        self.edge_values.update({(self.cid, wire.get_key()): outputs[wire.name]
+                                 for wire in self.OUT})
+    else:
+        self.edge_values = {ek: Signal(v, ek[1][1])
+                            for ek, v in zip(edge_keys, values)}
+    return outputs
+
+##############################################
+setattr(Component,'generate_simulator_source',generate_simulator_source)
+setattr(Component,'compile_simulator',compile_simulator)
+setattr(Component,'simulate_compiled',simulate_compiled)
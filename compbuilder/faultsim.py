@@ -0,0 +1,158 @@
+'''
+Bit-parallel single stuck-at fault simulation over the flattened netlist.
+
+Every bit of every net may be stuck at 0 or at 1.  Faults are simulated in
+groups: bit 0 of each net-bit int carries the good machine and bits 1 to
+machines carry one faulty machine each, so that one pass over the netlist
+evaluates a test vector for the good machine and a whole group of faulty
+ones.  After every net bit is computed, the faulty machines whose fault
+sits on it have their bit forced:
+
+    slot = (value & keep[slot]) | force[slot]
+
+A fault is detected by a vector when any output bit of its machine differs
+from the good machine.  Gates are evaluated with the same bitwise formulas
+as compbuilder.bitparallel, so only combinational designs are supported.
+
+    comp = Mux8Way16()
+    report = comp.fault_coverage(a=[...], b=[...], ..., sel=[...])
+    report.coverage     # fraction of detected faults
+    report.undetected   # list of Fault(net, bit, value)
+'''
+from collections import namedtuple
+
+from compbuilder import Component, Signal
+from compbuilder.exceptions import ComponentError
+from compbuilder.bitparallel import BitParallelEngine
+
+Fault = namedtuple('Fault', ['net', 'bit', 'value'])
+
+##############################################
+class FaultReport:
+    '''
+    Result of a fault simulation run.
+
+    Attributes:
+      faults      -- all simulated faults
+      detected    -- {fault: index of the first vector detecting it}
+      undetected  -- faults not detected by any vector
+    '''
+    def __init__(self, faults, detected):
+        self.faults = faults
+        self.detected = detected
+        self.undetected = [f for f in faults if f not in detected]
+
+    @property
+    def coverage(self):
+        if not self.faults:
+            return 1.0
+        return len(self.detected) / len(self.faults)
+
+    def __repr__(self):
+        return (f'<FaultReport {len(self.detected)}/{len(self.faults)} faults detected '
+                f'({self.coverage:.1%})>')
+
+##############################################
+class FaultSimulator(BitParallelEngine):
+    '''
+    Straight-line evaluator of a flattened combinational component where
+    each net bit is a local int holding the good machine in bit 0 and one
+    faulty machine in each higher bit.
+    '''
+    def __init__(self, comp, machines=63):
+        self.machines = machines
+        super(FaultSimulator, self).__init__(comp)
+
+        self.faults = []
+        self.fault_slots = {}
+        for net in comp.netlist:
+            for b, slot in enumerate(self.slots[net]):
+                for value in (0, 1):
+                    fault = Fault(net.name, b, value)
+                    self.faults.append(fault)
+                    self.fault_slots[fault] = slot
+
+    parameters = '_in, M, _k, _f'
+
+    def emit_assign(self, slot, expr, gate):
+        # the keep masks are within M, so gate formulas need no masking
+        k = self.slot_index[slot]
+        return f'{slot} = (({expr}) & _k[{k}]) | _f[{k}]'
+
+    def generate_source(self):
+        # index of every slot in the keep/force mask lists
+        self.slot_index = index = {}
+        for net in self.comp.netlist:
+            for slot in self.slots[net]:
+                index[slot] = len(index)
+        return super(FaultSimulator, self).generate_source()
+
+    def run_faults(self, faults, vectors):
+        '''
+        Simulate the given faults (at most machines of them) for the given
+        vectors (lists of per-input int values in IN order).  Return
+        {fault: index of the first detecting vector}.
+        '''
+        count = len(faults) + 1
+        M = (1 << count) - 1
+        keep = [M] * len(self.slot_index)
+        force = [0] * len(self.slot_index)
+        for j, fault in enumerate(faults, 1):
+            k = self.slot_index[self.fault_slots[fault]]
+            if fault.value:
+                force[k] |= 1 << j
+            else:
+                keep[k] &= ~(1 << j)
+
+        widths = [w.width for w in self.comp.IN]
+        detected = {}
+        remaining = M & ~1
+        for t, values in enumerate(vectors):
+            packed = [[M if (v >> b) & 1 else 0 for b in range(width)]
+                      for v, width in zip(values, widths)]
+            diff = 0
+            for bits in self.function(packed, M, keep, force):
+                for s in bits:
+                    diff |= s ^ (M if s & 1 else 0)
+            found = diff & remaining
+            if found:
+                for j, fault in enumerate(faults, 1):
+                    if (found >> j) & 1:
+                        detected[fault] = t
+                remaining &= ~found
+                if not remaining:
+                    break
+        return detected
+
+    def run(self, **inputs):
+        comp = self.comp
+        lengths = {len(v) for v in inputs.values()}
+        if len(lengths) > 1:
+            raise ComponentError(message='Input vectors must have identical length')
+        for w in comp.IN:
+            if w.name not in inputs:
+                raise ComponentError(message=f'Missing input vectors for {w.name}')
+        columns = [[v.get() if isinstance(v, Signal) else v for v in inputs[w.name]]
+                   for w in comp.IN]
+        vectors = list(zip(*columns)) if columns else [()] * (lengths.pop() if lengths else 1)
+
+        detected = {}
+        for start in range(0, len(self.faults), self.machines):
+            group = self.faults[start:start+self.machines]
+            detected.update(self.run_faults(group, vectors))
+        return FaultReport(self.faults, detected)
+
+##############################################
+def fault_coverage(self, machines=63, **inputs):
+    '''
+    Simulate every single stuck-at fault of this combinational component
+    against the given test vectors, passed as for eval_batch(), with up to
+    machines faulty machines per pass.  Return a FaultReport.
+    '''
+    simulator = getattr(self, 'fault_simulator', None)
+    if simulator is None or simulator.machines != machines:
+        self.fault_simulator = simulator = FaultSimulator(self, machines)
+    return simulator.run(**inputs)
+
+##############################################
+setattr(Component,'fault_coverage',fault_coverage)
@@ -1,6 +1,7 @@
 from collections import deque
 from compbuilder import Component, Wire, w, Signal
 from compbuilder.tracing import trace
+from compbuilder.exceptions import ComponentError
 
 
 class NetUnreachableException(Exception):
@@ -61,6 +62,7 @@ class Net:
         self.postlist = set()  # set of nets affected by this one
         self.triggered = set() # set of parts and their process that get triggered
         self.level = None      # level in the topological sorting order
+        self.id = None         # position in the sorted netlist
 
     def add_connection(self,component,wire,dir,net_slice):
         if dir == 'in':
@@ -88,6 +90,9 @@ class Net:
 
 ##############################################
 def _create_nets(self,outer,netlist,complist,path):
+    # primitives are told apart by VisualMixin.is_js_primitive()
+    if not hasattr(self,'is_js_primitive'):
+        raise ComponentError(message=f'Cannot flatten {self.get_gate_name()}: flattening requires components derived from VisualMixin')
     self.initialize()
     self.wiring = {}   # map local pin to (net,slice)
     self.name = '{}{}'.format(self.get_gate_name(),path)
@@ -150,6 +155,7 @@ def _create_nets(self,outer,netlist,complist,path):
     else:
         # primitive component; put it in the primitive component list
         complist.append(self)
+        self.compile_trigger()
 
         # create pre-/post-requisite net list via this primitive, skip all
         # non-trigger pins
@@ -180,13 +186,18 @@ def create_nets(self):
 
 ##############################################
 def topsort_nets(self):
+    '''
+    Assign every net its level, the length of the longest path of
+    prerequisite nets leading to it.  Constant wires and inputs are at level
+    0.  Latch outputs come right after their trigger nets, or are forced
+    after whichever of them are resolved when they are part of a loop.
+    '''
     resolved = set()
-    resolving_list = []
-    resolving_set = set()
 
-    # start with constant wires, inputs, and latches
-    resolving_list.extend(net for net in self.netlist if net.signal is not None)
+    # start with constant wires and inputs
+    resolving_list = [net for net in self.netlist if net.signal is not None]
     resolving_list.extend(self.wiring[w.get_key()][0] for w in self.IN)
+    latch_list = []
     for p in self.primitives:
         trigger_list = [t.name for t in p.TRIGGER]
         out_list = [o.name for o in p.OUT]
@@ -195,34 +206,59 @@ def topsort_nets(self):
                 raise ValueError(f'{trig.name} not found in TRIGGER')
             if latch.name not in out_list:
                 raise ValueError(f'{latch.name} not found in OUT')
-            resolving_list.append(p.wiring[latch.get_key()][0])
+            latch_list.append(p.wiring[latch.get_key()][0])
 
-    resolving_set.update(resolving_list)
     # we have to use dict to preserve insertion order (python >= 3.6)
     resolving = deque(dict.fromkeys(resolving_list))
-
-    total_edges = sum(len(n.postlist) for n in self.netlist)
+    resolving_set = set(resolving)
+    # latch outputs without trigger nets start at level 0 as well
+    for net in latch_list:
+        if not net.prelist and net not in resolving_set:
+            resolving.append(net)
+            resolving_set.add(net)
+    # latch outputs waiting for their trigger nets
+    latches = {net: None for net in latch_list if net not in resolving_set}
 
     for u in resolving:
         u.level = 0
-    while resolving:
-        #print('RESOLVING:', resolving)
-        #print('RESOLVED:', resolved)
-        current = resolving.popleft()
-        resolving_set.remove(current)
-        resolved.add(current)
-        #print(f'{len(resolved)}/{len(self.netlist)} nets resolved')
-        for net in current.postlist:
-            net.level = current.level + 1
-            pre = [p for p in net.prelist if p not in resolved]
-            if not pre and net not in resolving_set:
-                resolving.append(net)
-                resolving_set.add(net)
-            #    print(net,'resolved')
-            #    if net in resolved:
-            #        raise Exception(f'Loop detected at net {net} pre={net.prelist}')
-            #else:
-            #    print(net,'<-',pre)
+    unresolved = {}  # number of unresolved prerequisites by net
+    while True:
+        while resolving:
+            current = resolving.popleft()
+            resolved.add(current)
+            for net in current.postlist:
+                if net in resolving_set or net in resolved:
+                    continue
+                count = unresolved.get(net, len(net.prelist)) - 1
+                unresolved[net] = count
+                if count == 0:
+                    net.level = max(p.level for p in net.prelist) + 1
+                    resolving.append(net)
+                    resolving_set.add(net)
+                    latches.pop(net, None)
+        if not latches:
+            break
+        # the remaining latch outputs are in loops; break the loops there
+        for net in latches:
+            net.level = max((p.level for p in net.prelist if p in resolved), default=-1) + 1
+            resolving.append(net)
+            resolving_set.add(net)
+        latches.clear()
+
+    # nets in combinational loops are never resolved; place them after their
+    # resolved prerequisites so that they can still be simulated
+    stuck = [net for net in self.netlist if net.level is None and net.prelist]
+    while stuck:
+        placed = []
+        for net in stuck:
+            levels = [p.level for p in net.prelist if p.level is not None]
+            if levels:
+                placed.append((net, max(levels) + 1))
+        if not placed:
+            break
+        for net, level in placed:
+            net.level = level
+        stuck = [net for net in stuck if net.level is None]
 
     # XXX do loop check here (or should loop have already been detected by the
     # generic component class?)
@@ -244,6 +280,32 @@ def topsort_nets(self):
         )
 
 
+##############################################
+def compile_trigger(self):
+    '''
+    Resolve the pins of this primitive part to the bits of their nets once,
+    so that trigger() needs no wiring lookups.  Must be called again when
+    the wiring changes.  Return (reads, writes), where reads holds (wire
+    name, net, shift, mask, width) for every input pin and writes holds
+    (wire name, net, shift, net bit mask, inverted net bit mask) for every
+    output pin.
+    '''
+    if not self.is_js_primitive():
+        raise Exception('This must be called by a primitive component only')
+    reads = []
+    for w in self.IN:
+        net,nslice = self.wiring[w.get_key()]
+        start,stop,_ = nslice.indices(net.width)
+        reads.append((w.name,net,start,(1<<(stop-start))-1,stop-start))
+    writes = []
+    for w in self.OUT:
+        net,nslice = self.wiring[w.get_key()]
+        start,stop,_ = nslice.indices(net.width)
+        mask = ((1<<(stop-start))-1) << start
+        writes.append((w.name,net,start,mask,~mask))
+    self.trigger_pins = (reads,writes)
+    return self.trigger_pins
+
 ##############################################
 def trigger(self):
     '''
@@ -254,20 +316,22 @@ def trigger(self):
     signals before triggering the components attached to the nets in the next
     topological level.  Return a set of affected nets.
     '''
-    if not self.is_js_primitive():
-        raise Exception('This must be called by a primitive component only')
+    try:
+        reads,writes = self.trigger_pins
+    except AttributeError:
+        reads,writes = self.compile_trigger()
     affected = set()
     inputs = {}
-    for w in self.IN:
-        net,nslice = self.wiring[w.get_key()]
-        inputs[w.name] = net.signal[nslice]
+    for name,net,shift,mask,width in reads:
+        inputs[name] = Signal((net.signal.value >> shift) & mask, width)
     outputs = self.process_interact(**inputs)
-    for k in self.OUT:
-        signal = outputs[k.name]
-        estr = k.get_key()
-        net,nslice = self.wiring[estr]
-        net.transient_signal.set_slice(nslice,signal)
-        if net.transient_signal.value != net.signal.value:
+    for name,net,shift,mask,keep in writes:
+        value = outputs[name]
+        if type(value) is not int:
+            value = value.value
+        transient = net.transient_signal
+        transient.value = (transient.value & keep) | ((value << shift) & mask)
+        if transient.value != net.signal.value:
             affected.add(net)
     return affected
 
@@ -275,7 +339,8 @@ def trigger(self):
 def update_full(self,**inputs):
     '''
     Update net signals with the specified input changes.  Return output
-    signals.
+    signals.  The numbers of primitive triggers made and of those avoided
+    by triggering each primitive once per level are stored in update_stats.
     '''
     # populate input nets
     for w in self.IN:
@@ -283,25 +348,20 @@ def update_full(self,**inputs):
             net,_ = self.wiring[w.get_key()]
             net.signal = inputs[w.name]
 
-    # populate the remaining nets by their topological ordering
-    # (netlist must have already been topologically sorted)
-    current_level = 0
-    transient_nets = set()
-    for net in self.netlist:
-        if net.level != current_level:
-            # new level -- update previous-level nets with their transient
-            # signals
-            for tnet in transient_nets:
-                tnet.signal.value = tnet.transient_signal.value
-            transient_nets.clear()
-            current_level = net.level
-        for component in [s.component for s in net.sources]:
-            if component.is_js_primitive(): # trigger primitives only
-                affected = component.trigger()
-                transient_nets.update(affected)
-    # update from the transient signals in the final level
-    for tnet in transient_nets:
-        tnet.signal.value = tnet.transient_signal.value
+    # trigger the primitives level by level, committing the outputs of a
+    # level together before the next one
+    evaluated = 0
+    for primitives in self.primitive_levels:
+        transient_nets = set()
+        for component in primitives:
+            transient_nets.update(component.trigger())
+        evaluated += len(primitives)
+        for tnet in transient_nets:
+            tnet.signal.value = tnet.transient_signal.value
+    self.update_stats = {
+        'evaluated': evaluated,
+        'avoided': self.primitive_levels_avoided,
+    }
 
     # extract outputs
     outputs = {}
@@ -311,52 +371,116 @@ def update_full(self,**inputs):
 
     return outputs
 
+##############################################
+def index_nets(self):
+    '''
+    Number the nets of the sorted netlist, allocate the per-level buckets
+    and the dirty bitmap of update(), and build the per-level primitive
+    schedule of update_full(), in which a primitive driving several nets of
+    the same level appears once.  The primitives of a level only depend on
+    nets of lower levels through their triggers, so each level can be
+    evaluated as a batch.  The schedule is a tuple of tuples and the depth
+    of the netlist, i.e., its longest path, is stored in net_depth.  Must
+    be called whenever the netlist is re-sorted.
+    '''
+    depth = 0
+    levels = {}
+    connections = 0
+    for i,net in enumerate(self.netlist):
+        net.id = i
+        if net.level is not None and net.level >= depth:
+            depth = net.level + 1
+        # primitives triggered when this net is updated
+        net.drivers = [s.component for s in net.sources
+                       if s.component.is_js_primitive()]
+        connections += len(net.drivers)
+        level = levels.setdefault(net.level,{})
+        for p in net.drivers:
+            level[p] = None
+    self.net_buckets = [[] for _ in range(depth+1)]
+    self.net_dirty = bytearray(len(self.netlist))
+    # netlist is sorted, so the levels come in order
+    self.primitive_levels = tuple(tuple(level) for level in levels.values())
+    self.net_depth = depth - 1
+    self.primitive_levels_avoided = connections - sum(len(level) for level in self.primitive_levels)
+
 ##############################################
 def update(self,**inputs):
     '''
     Optimally update net signals with the specified input changes.  Return output
-    signals.
+    signals.  Trigger counts are stored in update_stats as by update_full().
     '''
     # TODO call primitive's process immediately upon change of trigger
-    import heapq
-    dirty = []
+    buckets = self.net_buckets  # nets to update, by topological level
+    dirty = self.net_dirty      # nets already scheduled, by net id
+    scheduled = []
     transient_nets = set()
-    # populate input nets
-    for w in self.IN:
-        if w.name in inputs:
-            net,_ = self.wiring[w.get_key()]
-            net.transient_signal = inputs[w.name]
-            transient_nets.add(net)
-            for affected_net in net.postlist:
-                heapq.heappush(dirty, affected_net)
-
-    # populate the remaining nets by their topological ordering
-    # (netlist must have already been topologically sorted)
-    current_level = 0
-    seen = set()
-    while dirty:
-        net = heapq.heappop(dirty)
-        if net in seen:
-            continue
-        else:
-            seen.add(net)
-        if net.level != current_level:
-            # new level -- update previous-level nets with their transient
-            # signals
-            for tnet in transient_nets:
-                tnet.signal.value = tnet.transient_signal.value
-            transient_nets.clear()
-            current_level = net.level
-        for component in [s.component for s in net.sources]:
-            if component.is_js_primitive(): # trigger primitives only
-                changes = component.trigger()
-                transient_nets.update(changes)
-                for change in changes:
-                    for affected_net in change.postlist:
-                        heapq.heappush(dirty,affected_net)
+
+    def schedule(nets,current_level):
+        for net in nets:
+            if dirty[net.id]:
+                continue
+            dirty[net.id] = 1
+            scheduled.append(net.id)
+            level = net.level
+            if level is None or level <= current_level:
+                # never go back to a level already done
+                level = current_level + 1
+            while level >= len(buckets):
+                buckets.append([])
+            buckets[level].append(net)
+
+    try:
+        # populate input nets
+        for w in self.IN:
+            if w.name in inputs:
+                net,_ = self.wiring[w.get_key()]
+                net.transient_signal = inputs[w.name]
+                transient_nets.add(net)
+                schedule(net.postlist,0)
+
+        # populate the remaining nets level by level
+        level = 1
+        done = 0
+        evaluated = avoided = 0
+        while done < len(scheduled):
+            bucket = buckets[level]
+            if bucket:
+                # new level -- update previous-level nets with their
+                # transient signals
+                for tnet in transient_nets:
+                    tnet.signal.value = tnet.transient_signal.value
+                transient_nets.clear()
+                # trigger every primitive once per level, however many of
+                # its output nets are scheduled
+                fired = set()
+                for net in bucket:
+                    for component in net.drivers:
+                        if component in fired:
+                            avoided += 1
+                            continue
+                        fired.add(component)
+                        changes = component.trigger()
+                        transient_nets.update(changes)
+                        for change in changes:
+                            schedule(change.postlist,level)
+                evaluated += len(fired)
+                done += len(bucket)
+                bucket.clear()
+            level += 1
+    finally:
+        for i in scheduled:
+            dirty[i] = 0
+        for bucket in buckets:
+            bucket.clear()
+
     # update from the transient signals in the final level
     for tnet in transient_nets:
         tnet.signal.value = tnet.transient_signal.value
+    self.update_stats = {
+        'evaluated': evaluated,
+        'avoided': avoided,
+    }
 
     # extract outputs
     outputs = {}
@@ -381,6 +505,7 @@ def flatten(self):
     self.netlist, self.primitives = self.create_nets()
     self.topsort_nets()
     self.netlist.sort()
+    self.index_nets()
 
     # instantiate net signals to zero, except constant nets, and run update
     # once to make their logic values consistent
@@ -424,7 +549,7 @@ def report(cls_or_instance):
     for gate,count in counter.items():
         print(f'  - {count} {gate}(s)')
     print(f'Total nets: {len(comp.netlist)}')
-    print(f'Longest path length: {comp.netlist[-1].level}')
+    print(f'Longest path length: {comp.net_depth}')
 
 ##############################################
 setattr(Component,'__repr__',component_repr)
@@ -434,5 +559,7 @@ setattr(Component,'create_nets',create_nets)
 setattr(Component,'update',update)
 setattr(Component,'update_full',update_full)
 setattr(Component,'topsort_nets',topsort_nets)
+setattr(Component,'index_nets',index_nets)
 setattr(Component,'trigger',trigger)
+setattr(Component,'compile_trigger',compile_trigger)
 setattr(Wire,'__repr__',wire_repr)
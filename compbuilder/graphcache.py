@@ -0,0 +1,293 @@
+'''
+Persistent on-disk cache of elaborated simulation graphs.
+
+Elaborating a design (initialize, build_sim_graph, check_loop and top_sort)
+is deterministic given the structure of its component classes, so the
+sorted simulation graph can be stored once and reloaded by later processes.
+Entries are keyed by a structural fingerprint of the component hierarchy:
+component classes, their ports, PARTS and wire assignments, and for
+primitives whether they are clocked and the source of their process() and
+prepare_process().  On a miss the component is elaborated as usual and the
+result is stored.
+
+On a hit the component tree is re-instantiated from PARTS with
+shallow_clone(), which keeps per-instance state such as fast RAM buffers
+intact, but none of the components is initialized.  A later initialize()
+(e.g. by indexing a part or by tracing) keeps these instances, so the
+restored graph stays valid.
+
+    import compbuilder.graphcache
+    compbuilder.graphcache.enable_graph_cache('/tmp/compbuilder-cache')
+
+Entries are pickles, and unpickling runs whatever code a file asks for, so
+only point the cache at a directory that no one else can write to.  The
+cache is never enabled implicitly, and enable_graph_cache() requires an
+explicit directory unless $COMPBUILDER_CACHE_DIR is set.
+'''
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+
+from compbuilder import Component, MappedWire, SimulationMixin, Wire
+
+CACHE_FORMAT_VERSION = 3
+
+##############################################
+def _wire_signature(wire):
+    if wire.slice:
+        start, stop = wire.slice.start, wire.slice.stop
+    else:
+        start, stop = None, None
+    return (wire.name, wire.width, start, stop, wire.constant_value)
+
+##############################################
+def _class_name_of(cls):
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+def _class_name(component):
+    return _class_name_of(type(component))
+
+##############################################
+def _behavior_signature(cls):
+    '''
+    Return a digest of the source of the process() and prepare_process()
+    methods of a class, falling back to their bytecode when the source is
+    not available.
+    '''
+    h = hashlib.sha256()
+    for name in ('process', 'prepare_process'):
+        method = getattr(cls, name, None)
+        if method is None:
+            continue
+        try:
+            h.update(inspect.getsource(method).encode())
+        except (OSError, TypeError):
+            code = getattr(method, '__code__', None)
+            if code is not None:
+                h.update(code.co_code)
+    return h.hexdigest()
+
+##############################################
+def structural_fingerprint(component):
+    '''
+    Return a hex digest identifying the structure of the component's
+    hierarchy.  Parts sharing their class-level PARTS are only hashed once.
+
+    Elaboration normalizes the wire widths of class-level PARTS in place, so
+    the digest of a class is kept on the class the first time it is
+    computed; later instances, including those in forked processes, then
+    find the entry stored by the first one.
+    '''
+    memo = {}
+    models = tuple(sorted((_class_name_of(c), _class_name_of(m))
+                          for c, m in Component.fast_models.items())
+                   if Component.fast_models_enabled else ())
+
+    def fingerprint(comp):
+        model_class = comp.get_fast_model()
+        if model_class is not None:
+            # substituted by a behavioral model; the gate-level PARTS are unused
+            cls = type(comp)
+            return hashlib.sha256(repr((
+                _class_name(comp),
+                _class_name_of(model_class),
+                _behavior_signature(model_class),
+                [w.get_key() for w in cls.IN],
+                [w.get_key() for w in cls.OUT],
+            )).encode()).hexdigest()
+        parts = getattr(comp, 'PARTS', None) or []
+        # PARTS created per instance (e.g. fast RAM) must be hashed per instance
+        per_instance = 'PARTS' in vars(comp)
+        key = id(comp) if per_instance else type(comp)
+        if key in memo:
+            return memo[key]
+        cls = type(comp)
+        class_key = (id(getattr(cls, 'PARTS', None)), models)
+        stored = None if per_instance else vars(cls).get('_structural_fingerprint')
+        if stored is not None and stored[0] == class_key:
+            memo[key] = stored[1]
+            return memo[key]
+        h = hashlib.sha256()
+        h.update(repr((
+            _class_name(comp),
+            [w.get_key() for w in cls.IN],
+            [w.get_key() for w in cls.OUT],
+        )).encode())
+        if not parts:
+            # composites only become clocked once initialized; primitives
+            # are clocked from construction
+            h.update(repr((comp.is_clocked_component,
+                           _behavior_signature(cls))).encode())
+        for p in parts:
+            h.update(fingerprint(p).encode())
+            h.update(repr(sorted((name, _wire_signature(wire))
+                                 for name, wire in p.wire_assignments.items())).encode())
+        memo[key] = h.hexdigest()
+        if not per_instance:
+            cls._structural_fingerprint = (class_key, memo[key])
+        return memo[key]
+
+    h = hashlib.sha256()
+    h.update(repr((CACHE_FORMAT_VERSION, sys.version_info[:2])).encode())
+    h.update(fingerprint(component).encode())
+    return h.hexdigest()
+
+##############################################
+class SimGraphCache:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # entries already read by this process, by fingerprint
+        self.loaded = {}
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, fingerprint + '.simgraph')
+
+    ################
+    def save(self, component):
+        paths = {id(component): ()}
+        components = []
+        for c in component.sim_all_components:
+            if c is not component:
+                parent = c.parent_component
+                paths[id(c)] = paths[id(parent)] + (parent.internal_components.index(c),)
+            components.append((
+                paths[id(c)],
+                c.cid,
+                _class_name(c),
+                (c.get_in_keys(), c.get_out_keys()),
+                {k: tuple(m) for k, m in c.wire_map.items()},
+            ))
+        index = {id(c): i for i, c in enumerate(component.sim_all_components)}
+
+        nodes = [(u.id, index[id(u.component)],
+                  u.is_pair_node, u.is_input_node, u.is_output_node,
+                  u.indegree, u.outdegree,
+                  u.in_edge_keys, u.out_edge_keys)
+                 for u in component.sim_nodes.values()]
+        edges = [(ek, e['src'], e['dest']) for ek, e in component.sim_edges.items()]
+        order = [u.id for u in component.sim_topo_ordering]
+
+        data = {
+            'components': components,
+            'base': [index[id(c)] for c in component.sim_base_components],
+            'nodes': nodes,
+            'edges': edges,
+            'order': order,
+        }
+        # key by the structure seen before elaboration, which normalizes the
+        # wire widths of PARTS in place
+        fingerprint = getattr(component, 'sim_graph_fingerprint', None)
+        if fingerprint is None:
+            fingerprint = structural_fingerprint(component)
+        path = self.path(fingerprint)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.loaded[fingerprint] = data
+
+    ################
+    def load(self, component):
+        '''
+        Restore the sorted simulation graph of the component from the cache.
+        Return False on a cache miss, leaving the component untouched.
+        '''
+        fingerprint = structural_fingerprint(component)
+        component.sim_graph_fingerprint = fingerprint
+        data = self.loaded.get(fingerprint)
+        if data is None:
+            try:
+                with open(self.path(fingerprint), 'rb') as f:
+                    data = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return False
+            self.loaded[fingerprint] = data
+
+        instances = self.instantiate(component, data['components'])
+        if instances is None:
+            return False
+
+        for c, (path, cid, name, ports, wire_map) in zip(instances, data['components']):
+            # restore port widths as normalized during elaboration
+            in_keys, out_keys = ports
+            c.IN = [Wire(*k) for k in in_keys]
+            c.OUT = [Wire(*k) for k in out_keys]
+            c.cid = cid
+            c.wire_map = {k: MappedWire(*m) for k, m in wire_map.items()}
+
+        component.sim_all_components = instances
+        component.sim_base_components = [instances[i] for i in data['base']]
+        component.sim_edges = {ek: {'src': list(src), 'dest': list(dest), 'signal': None}
+                               for ek, src, dest in data['edges']}
+        nodes = {}
+        for (nid, ci, is_pair, is_input, is_output,
+             indegree, outdegree, in_edge_keys, out_edge_keys) in data['nodes']:
+            u = component.SimNode(nid, instances[ci])
+            u.is_pair_node = is_pair
+            u.is_input_node = is_input
+            u.is_output_node = is_output
+            u.indegree = indegree
+            u.outdegree = outdegree
+            u.in_edge_keys = list(in_edge_keys)
+            u.out_edge_keys = list(out_edge_keys)
+            nodes[nid] = u
+        component.sim_nodes = nodes
+        component.sim_n = len(nodes)
+        component.sim_graph = {
+            'nodes': component.sim_nodes,
+            'edges': component.sim_edges,
+        }
+        component.sim_topo_ordering = [nodes[nid] for nid in data['order']]
+        return True
+
+    ################
+    def instantiate(self, component, entries):
+        '''
+        Return component instances matching the cached component paths, taken
+        from the already built component tree if the top-level component is
+        initialized, or cloned from PARTS otherwise.  Return None if the
+        hierarchy does not match the cached one.
+        '''
+        by_path = {(): component}
+        instances = []
+        for path, cid, name, ports, wire_map in entries:
+            if path:
+                parent = by_path[path[:-1]]
+                if component.is_initialized:
+                    c = parent.internal_components[path[-1]]
+                else:
+                    if parent.internal_components is None:
+                        parent.internal_components = []
+                        parent.apply_fast_model()
+                    c = parent.PARTS[path[-1]].shallow_clone()
+                    c.parent_component = parent
+                    parent.internal_components.append(c)
+                by_path[path] = c
+            c = by_path[path]
+            if _class_name(c) != name:
+                return None
+            if not path:
+                c.parent_component = None
+            instances.append(c)
+        return instances
+
+##############################################
+def enable_graph_cache(directory=None):
+    '''
+    Store elaborated simulation graphs under the given directory (by default
+    $COMPBUILDER_CACHE_DIR) and reuse them in subsequent elaborations.  The
+    directory must only be writable by trusted users, as cache entries are
+    unpickled.  Raise ValueError if no directory is given or configured.
+    '''
+    if directory is None:
+        directory = os.environ.get('COMPBUILDER_CACHE_DIR')
+    if not directory:
+        raise ValueError('No graph cache directory given and COMPBUILDER_CACHE_DIR is not set')
+    SimulationMixin.sim_graph_cache = SimGraphCache(directory)
+
+##############################################
+def disable_graph_cache():
+    SimulationMixin.sim_graph_cache = None
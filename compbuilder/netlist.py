@@ -0,0 +1,112 @@
+'''
+Helpers shared by the passes over the flattened netlist and its bitwise
+formulas (compbuilder.truthtable, compbuilder.optimize and
+compbuilder.techmap): packed input patterns, compiled formulas, pin to net
+bit resolution, and rebuilding and re-levelling a rewritten netlist.
+'''
+
+##############################################
+def input_pattern(i, count):
+    '''
+    Return the packed column of input bit i over count (a power of two,
+    larger than 2^i) consecutive assignments.
+
+    >>> bin(input_pattern(0, 8)), bin(input_pattern(1, 8))
+    ('0b10101010', '0b11001100')
+    '''
+    block = 1 << i
+    return ((1 << count) - 1) // ((1 << block) + 1) << block
+
+##############################################
+# compiled bitwise formulas by source
+_formula_cache = {}
+
+def compile_formula(formula):
+    '''
+    Return the code object of a bitwise formula (see compbuilder.codegen),
+    compiling it on first use.
+    '''
+    code = _formula_cache.get(formula)
+    if code is None:
+        code = _formula_cache[formula] = compile(formula, '<bitwise>', 'eval')
+    return code
+
+##############################################
+def net_bits(part, wire):
+    '''
+    Return (net, first bit, bit mask) of the part of a net attached to a pin.
+    '''
+    net, nslice = part.wiring[wire.get_key()]
+    start, stop, _ = nslice.indices(net.width)
+    return net, start, ((1 << (stop - start)) - 1) << start
+
+##############################################
+def is_stateful(part):
+    '''
+    Return whether a primitive carries state, i.e., latches or is clocked.
+    '''
+    return bool(part.LATCH) or part.is_clocked_component
+
+##############################################
+def rebuild_netlist(comp, primitives):
+    '''
+    Make primitives the primitives of the flattened component comp: drop the
+    connections of all others, recompute the pre-/post-requisite nets, drop
+    the nets no longer connected to anything but keep the port nets, and
+    re-level the netlist.
+    '''
+    port_nets = {comp.wiring[w.get_key()][0] for w in comp.IN + comp.OUT}
+    kept = set(primitives)
+    kept.add(comp)
+
+    netlist = []
+    for net in comp.netlist:
+        net.sources = [s for s in net.sources if s.component in kept]
+        net.targets = [s for s in net.targets if s.component in kept]
+        net.triggered = {(p, name) for p, name in net.triggered if p in kept}
+        net.prelist = set()
+        net.postlist = set()
+        net.level = None
+        if net.sources or net.targets or net in port_nets:
+            netlist.append(net)
+    for p in primitives:
+        p.compile_trigger()
+        triggers = [w.get_key() for w in p.TRIGGER]
+        for wout in p.OUT:
+            out_net = p.wiring[wout.get_key()][0]
+            for win in p.IN:
+                if win.get_key() not in triggers:
+                    continue
+                in_net = p.wiring[win.get_key()][0]
+                out_net.prelist.add(in_net)
+                in_net.postlist.add(out_net)
+
+    comp.netlist = netlist
+    comp.primitives = primitives
+    relevel(comp)
+
+    # engines built on the previous netlist
+    for name in ('batch_engine', 'fault_simulator', 'levelized_netlist'):
+        if getattr(comp, name, None) is not None:
+            setattr(comp, name, None)
+
+##############################################
+def relevel(comp):
+    '''
+    Re-run the topological levelling of a flattened netlist whose nets all
+    carry signals already, and re-sort and re-number it.
+    '''
+    # topsort_nets() starts from the nets having a signal, which must only
+    # be those without drivers
+    driven = [net for net in comp.netlist
+              if any(s.component is not comp for s in net.sources)]
+    signals = [net.signal for net in driven]
+    for net in driven:
+        net.signal = None
+    try:
+        comp.topsort_nets()
+    finally:
+        for net, signal in zip(driven, signals):
+            net.signal = signal
+    comp.netlist.sort()
+    comp.index_nets()
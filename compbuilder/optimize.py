@@ -0,0 +1,206 @@
+'''
+Constant propagation and dead-logic elimination on the flattened netlist.
+
+Designs feed constant wires (w.T, w.F, w(16).constant(...)) into general
+purpose parts, which leaves primitives whose outputs never change, gates
+reduced by a constant input to a simpler function of the others, and
+whole cones of logic, such as the unselected branches of muxes, whose
+outputs reach nothing.  reduce_netlist() rewrites the netlist of a
+flattened component so that none of them costs a full evaluation any more:
+
+  * a primitive declaring a bitwise formula (see compbuilder.codegen) is
+    folded when its outputs are constant for every value of its
+    non-constant input bits, e.g., a Nand with one input tied to 0; its
+    output net bits become constants and folding continues downstream.
+    Output bits that are constant on their own, e.g., the high bits of a
+    multi-bit And with a constant operand, are propagated as well
+  * a one-bit gate with some constant inputs is replaced by the gate of
+    compbuilder.techmap computing the same function of the remaining
+    inputs, e.g., Nand(x, 1) by Not(x) and Or(x, 0) by a Buffer of x
+  * a primitive whose outputs reach neither a top-level output nor a
+    clocked or latching primitive is removed
+
+The reduced netlist is re-levelled in place, so flatten's update() and
+update_full() as well as the bit-parallel engine (eval_batch(),
+fault_coverage(), truth tables) all evaluate it.  Only the flattened
+netlist is reduced: the SimulationMixin graph of eval(), run() and the
+compiled simulator is built from the component hierarchy rather than from
+primitives and is left as it is.
+
+    comp = Adder4()
+    comp.flatten()
+    comp.reduce_netlist()
+    # NetlistReduction(primitives_before=100, primitives_after=..., ...)
+'''
+from collections import namedtuple
+
+from compbuilder import Component
+from compbuilder.codegen import get_bitwise_formula
+from compbuilder.netlist import input_pattern, compile_formula, net_bits, is_stateful, rebuild_netlist
+from compbuilder.techmap import match_gate, wire_gate, eligible
+from compbuilder import flatten
+
+NetlistReduction = namedtuple('NetlistReduction',
+        ['primitives_before', 'primitives_after', 'nets_before', 'nets_after',
+         'folded', 'dead', 'simplified'])
+
+##############################################
+def _fold(part, known):
+    '''
+    Return {output wire name: (constant bit mask, value)} of the output bits
+    of the part that are constant given the known constant net bits,
+    {net: (mask, value)}, or None if the part cannot be folded at all.
+    '''
+    formula = get_bitwise_formula(part)
+    if formula is None or is_stateful(part):
+        return None
+    widths = {w.width for w in part.IN + part.OUT}
+    if len(widths) != 1:
+        return None
+    width = widths.pop()
+
+    pins = []
+    for w in part.IN:
+        net, start, mask = net_bits(part, w)
+        known_mask, known_value = known.get(net, (0, 0))
+        pins.append((w.name, start, known_mask >> start, known_value >> start))
+
+    outputs = {w.name: (0, 0) for w in part.OUT}
+    for b in range(width):
+        # enumerate the unknown input bits as alternating packed patterns
+        unknown = [name for name, _, m, _ in pins if not (m >> b) & 1]
+        count = 1 << len(unknown)
+        M = (1 << count) - 1
+        env = {name: input_pattern(i, count) for i, name in enumerate(unknown)}
+        for name, _, m, v in pins:
+            if (m >> b) & 1:
+                env[name] = M if (v >> b) & 1 else 0
+        for w in part.OUT:
+            value = eval(compile_formula(formula[w.name]), {}, env) & M
+            if value == M or value == 0:
+                mask, constant = outputs[w.name]
+                outputs[w.name] = (mask | 1 << b, constant | (value & 1) << b)
+    return outputs
+
+##############################################
+def _simplify(part, known):
+    '''
+    Return (matched gate, leaves) computing the output of a one-bit gate
+    from its non-constant input bits, or None if none of its inputs is
+    constant.
+    '''
+    if not eligible(part):
+        return None
+    pins = []
+    for w in part.IN:
+        net, start, _ = net_bits(part, w)
+        known_mask, known_value = known.get(net, (0, 0))
+        constant = (known_value >> start) & 1 if (known_mask >> start) & 1 else None
+        pins.append((w.name, (net, start), constant))
+    if all(constant is None for _, _, constant in pins):
+        return None
+
+    leaves = list(dict.fromkeys(leaf for _, leaf, constant in pins if constant is None))
+    count = 1 << len(leaves)
+    M = (1 << count) - 1
+    env = {}
+    for name, leaf, constant in pins:
+        if constant is None:
+            env[name] = input_pattern(leaves.index(leaf), count)
+        else:
+            env[name] = M if constant else 0
+    table = eval(compile_formula(get_bitwise_formula(part)['out']), {}, env) & M
+    return match_gate(table, len(leaves)), leaves
+
+##############################################
+def reduce_netlist(self):
+    '''
+    Fold constant primitives, simplify gates with constant inputs and
+    remove dead logic from the flattened netlist of this component.  Return
+    a NetlistReduction with the primitive and net counts before and after,
+    the numbers of folded and dead primitives removed, and the number of
+    gates replaced by simpler ones.
+    '''
+    self.flatten()
+    primitives_before = len(self.primitives)
+    nets_before = len(self.netlist)
+    in_nets = {self.wiring[w.get_key()][0] for w in self.IN}
+    out_nets = {self.wiring[w.get_key()][0] for w in self.OUT}
+
+    readers = {}
+    for p in self.primitives:
+        for w in p.IN:
+            readers.setdefault(p.wiring[w.get_key()][0], []).append(p)
+
+    # constant net bits: undriven nets to start with, then the outputs of
+    # folded primitives
+    known = {}
+    for net in self.netlist:
+        if net not in in_nets and not any(s.component is not self for s in net.sources):
+            known[net] = ((1 << net.width) - 1, net.signal.value)
+
+    folded = set()
+    pending = list(self.primitives)
+    queued = set(pending)
+    while pending:
+        p = pending.pop()
+        queued.discard(p)
+        outputs = _fold(p, known)
+        if outputs is None:
+            continue
+        if all(outputs[w.name][0] == (1 << w.width) - 1 for w in p.OUT):
+            folded.add(p)
+        for w in p.OUT:
+            net, start, _ = net_bits(p, w)
+            mask, value = outputs[w.name]
+            mask <<= start
+            value <<= start
+            known_mask, known_value = known.get(net, (0, 0))
+            if not mask & ~known_mask:
+                continue
+            known[net] = (known_mask | mask, (known_value & ~mask) | value)
+            for signal in (net.signal, net.transient_signal):
+                signal.value = (signal.value & ~mask) | value
+            for q in readers.get(net, []):
+                if q not in folded and q not in queued:
+                    pending.append(q)
+                    queued.add(q)
+
+    # gates with constant inputs left: replace them by simpler ones
+    replaced = {}
+    for p in self.primitives:
+        if p in folded:
+            continue
+        simplified = _simplify(p, known)
+        if simplified is not None:
+            gate, leaves = simplified
+            replaced[p] = wire_gate(gate, p, leaves)
+    primitives = [replaced.get(p, p) for p in self.primitives if p not in folded]
+
+    # live logic: everything feeding a top-level output or a stateful part
+    live = {p for p in primitives if is_stateful(p)}
+    stack = list(out_nets)
+    stack += [p.wiring[w.get_key()][0] for p in live for w in p.IN]
+    live_nets = set(stack)
+    while stack:
+        net = stack.pop()
+        for s in net.sources:
+            p = s.component
+            if p is self or p in folded or p in replaced or p in live:
+                continue
+            live.add(p)
+            for w in p.IN:
+                in_net = p.wiring[w.get_key()][0]
+                if in_net not in live_nets:
+                    live_nets.add(in_net)
+                    stack.append(in_net)
+
+    primitives = [p for p in primitives if p in live]
+    rebuild_netlist(self, primitives)
+
+    return NetlistReduction(primitives_before, len(primitives), nets_before, len(self.netlist),
+                            len(folded), primitives_before - len(folded) - len(primitives),
+                            sum(1 for p in replaced.values() if p in live))
+
+##############################################
+setattr(Component,'reduce_netlist',reduce_netlist)
@@ -0,0 +1,76 @@
+'''
+Running independent stimulus sequences of a component class on several
+cores.
+
+Simulation state lives on component instances, so every sequence is run on
+its own instance inside a worker process.  The design is elaborated once in
+the calling process and the sorted simulation graph is handed to the
+workers through a graph cache directory (see compbuilder.graphcache); each
+worker then only re-instantiates the component tree for every sequence.
+
+    from compbuilder.parallel import run_sequences
+    results = run_sequences(RAM64, [
+        {'In': [...], 'address': [...], 'load': [...]},
+        ...
+    ])
+    results[0]['out']   # output column of the first sequence
+
+The component class must be importable by the workers, i.e., defined at
+module level, and the stimulus columns must be picklable (no generators).
+Fast models registered with compbuilder.behavioral are only seen by workers
+started with the fork method.
+'''
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from compbuilder.graphcache import SimGraphCache
+
+# graph cache of the current worker process
+_worker_cache = None
+
+##############################################
+def _init_worker(directory):
+    global _worker_cache
+    _worker_cache = SimGraphCache(directory)
+
+##############################################
+def _elaborate(component_class, cache):
+    comp = component_class()
+    if not cache.load(comp):
+        comp.elaborate()
+        cache.save(comp)
+    return comp
+
+##############################################
+def _run_chunk(component_class, sequences, cycles):
+    results = []
+    for stimulus in sequences:
+        comp = _elaborate(component_class, _worker_cache)
+        results.append(comp.run(stimulus, cycles))
+    return results
+
+##############################################
+def run_sequences(component_class, sequences, cycles=None, max_workers=None,
+                  chunksize=1, cache_dir=None):
+    '''
+    Run each stimulus sequence (a stimulus dict as taken by Component.run)
+    on a fresh instance of component_class in a pool of max_workers
+    processes.  Sequences are sent to the workers in chunks of chunksize.
+    Return the output column dicts in the order of the sequences.
+
+    The elaborated graph is stored under cache_dir, or in a temporary
+    directory removed afterwards.
+    '''
+    sequences = list(sequences)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = cache_dir or tmp
+        _elaborate(component_class, SimGraphCache(directory))
+
+        chunks = [sequences[i:i+chunksize]
+                  for i in range(0, len(sequences), chunksize)]
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(directory,)) as executor:
+            futures = [executor.submit(_run_chunk, component_class, chunk, cycles)
+                       for chunk in chunks]
+            return [result for future in futures for result in future.result()]
@@ -0,0 +1,238 @@
+'''
+Per-component-class profiling of simulation.
+
+SimProfiler times every call of the primitive methods that the simulators
+dispatch to -- process() and prepare_process() for SimulationMixin.simulate
+(interpreted, incremental, compiled and run()) and trigger() for
+flatten.update -- and aggregates them by primitive class and by the chain
+of hierarchical parents the primitive sits in.
+
+Profiling is enabled by shadowing those methods with timing wrappers on the
+primitive instances themselves and disabled by removing the wrappers, so
+the simulators carry no profiling code and nothing is paid when no
+profiler is active.  Primitives inlined by compbuilder.codegen through
+their bitwise formulas are not called, and hence not timed.
+
+    with SimProfiler(comp) as profiler:
+        for inputs in stimulus:
+            comp.eval(**inputs)
+    profiler.by_class()              # {'Nand': (calls, seconds), ...}
+    profiler.stats().sort_stats('cumulative').print_stats(10)
+    profiler.dump_stats('sim.prof')  # for snakeviz and friends
+    profiler.write_folded('sim.folded')  # for flamegraph.pl
+'''
+import pstats
+import sys
+import time
+
+from compbuilder.exceptions import ComponentError
+
+##############################################
+def _class_key(cls):
+    '''
+    Return a pstats function key (file, line, name) for a component class.
+    '''
+    module = sys.modules.get(cls.__module__)
+    filename = getattr(module, '__file__', None) or '~'
+    return (filename, 0, cls.__name__)
+
+##############################################
+def _method_key(cls, name):
+    code = getattr(getattr(cls, name, None), '__code__', None)
+    if code is None:
+        return (_class_key(cls)[0], 0, f'{cls.__name__}.{name}')
+    return (code.co_filename, code.co_firstlineno, f'{cls.__name__}.{name}')
+
+##############################################
+class _StatsSource:
+    # minimal profiler interface understood by pstats.Stats
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+##############################################
+class SimProfiler:
+    '''
+    Profiler of the primitives of one top-level component.
+
+    Attributes:
+      records -- {stack: [calls, nanoseconds]} where stack is a tuple of
+                 component classes from the top-level component down to the
+                 primitive's class, followed by the method name
+    '''
+    def __init__(self, component):
+        self.component = component
+        self.records = {}
+        self.installed = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    ################
+    def primitives(self):
+        '''
+        Return (component, method names) for every primitive the simulators
+        may call.
+        '''
+        comp = self.component
+        comp.elaborate()
+        targets = {}
+        for c in comp.sim_base_components:
+            names = ['process']
+            if c.is_clocked_component:
+                names.append('prepare_process')
+            targets[id(c)] = (c, names)
+        for c in getattr(comp, 'primitives', []):
+            c_names = targets.setdefault(id(c), (c, []))[1]
+            c_names.append('trigger')
+        return list(targets.values())
+
+    def stack(self, component):
+        classes = []
+        c = component
+        while c is not None:
+            classes.append(type(c))
+            c = c.parent_component
+        return tuple(reversed(classes))
+
+    def enable(self):
+        '''
+        Install the timing wrappers.  Raise ComponentError if a method is
+        already shadowed on a primitive, e.g. by a ToggleCounter, as the
+        wrappers could then not be removed independently.
+        '''
+        if self.installed:
+            return
+        clock = time.perf_counter_ns
+        targets = self.primitives()
+        for component, names in targets:
+            for name in names:
+                if name in component.__dict__:
+                    raise ComponentError(message=f'{component}.{name} is already wrapped; disable the other tool first')
+        for component, names in targets:
+            stack = self.stack(component)
+            for name in names:
+                original = getattr(component, name)
+                record = self.records.setdefault(stack + (name,), [0, 0])
+
+                def timed(*args, _original=original, _record=record, **kwargs):
+                    start = clock()
+                    try:
+                        return _original(*args, **kwargs)
+                    finally:
+                        _record[1] += clock() - start
+                        _record[0] += 1
+
+                setattr(component, name, timed)
+                self.installed.append((component, name, timed))
+
+    def disable(self):
+        for component, name, wrapper in self.installed:
+            if component.__dict__.get(name) is wrapper:
+                del component.__dict__[name]
+        self.installed = []
+
+    def reset(self):
+        for record in self.records.values():
+            record[0] = record[1] = 0
+
+    ################
+    def by_class(self):
+        '''
+        Return {primitive class name: (calls, seconds)} for the primitives
+        called at least once.
+        '''
+        totals = {}
+        for stack, (calls, ns) in self.records.items():
+            if not calls:
+                continue
+            total = totals.setdefault(stack[-2].__name__, [0, 0])
+            total[0] += calls
+            total[1] += ns
+        return {name: (calls, ns / 1e9) for name, (calls, ns) in totals.items()}
+
+    def by_parent(self, depth=1):
+        '''
+        Return {path: (calls, seconds)} where path is a tuple of the class
+        names of the depth outermost components below the top-level one
+        containing the primitives, as in SimNode.get_top_level_components().
+        '''
+        totals = {}
+        for stack, (calls, ns) in self.records.items():
+            if not calls:
+                continue
+            path = tuple(cls.__name__ for cls in stack[1:-1][:depth])
+            total = totals.setdefault(path, [0, 0])
+            total[0] += calls
+            total[1] += ns
+        return {path: (calls, ns / 1e9) for path, (calls, ns) in totals.items()}
+
+    ################
+    def stats(self):
+        '''
+        Return a pstats.Stats with one entry per primitive method and per
+        hierarchical parent class; parents have the cumulative time of the
+        primitives below them.
+        '''
+        stats = {}
+
+        def entry(key):
+            return stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+
+        def add_caller(key, caller, calls, seconds, own):
+            c = entry(key)[4].setdefault(caller, [0, 0, 0.0, 0.0])
+            c[0] += calls
+            c[1] += calls
+            c[2] += own
+            c[3] += seconds
+
+        for stack, (calls, ns) in self.records.items():
+            if not calls:
+                continue
+            seconds = ns / 1e9
+            keys = [_class_key(cls) for cls in stack[:-2]]
+            keys.append(_method_key(stack[-2], stack[-1]))
+            for i, key in enumerate(keys):
+                e = entry(key)
+                leaf = i == len(keys) - 1
+                if leaf:
+                    e[0] += calls
+                    e[1] += calls
+                    e[2] += seconds
+                e[3] += seconds
+                if i > 0:
+                    add_caller(key, keys[i-1], calls if leaf else 0, seconds,
+                               seconds if leaf else 0.0)
+
+        return pstats.Stats(_StatsSource({
+            key: (cc, nc, tt, ct, {caller: tuple(v) for caller, v in callers.items()})
+            for key, (cc, nc, tt, ct, callers) in stats.items()
+        }))
+
+    def dump_stats(self, filename):
+        self.stats().dump_stats(filename)
+
+    def folded(self):
+        '''
+        Return the records as folded stacks ("A;B;C value" lines, with
+        values in microseconds) for flame graph tools.
+        '''
+        lines = []
+        for stack, (calls, ns) in sorted(self.records.items(),
+                                         key=lambda item: [str(x) for x in item[0]]):
+            if not calls:
+                continue
+            frames = [cls.__name__ for cls in stack[:-2]]
+            frames.append(f'{stack[-2].__name__}.{stack[-1]}')
+            lines.append(f'{";".join(frames)} {ns // 1000}')
+        return '\n'.join(lines) + '\n'
+
+    def write_folded(self, filename):
+        with open(filename, 'w') as f:
+            f.write(self.folded())
@@ -0,0 +1,324 @@
+'''
+Technology mapping of flattened Nand networks into wide primitives.
+
+Designs built from Nand gates flatten into netlists of one-bit Nands, so
+every Not, And, Or or Xor costs several primitive calls per evaluation.
+map_netlist() covers the netlist of a flattened component with fanout-free
+cones of at most max_inputs input bits and replaces every cone of more than
+one primitive by a single primitive computing the same function:
+
+  * Buffer and Not
+  * And, Or, Nand, Nor, Xor and Xnor of 2 to max_inputs inputs (And, And3,
+    And4, ...)
+  * Mux (a, b, sel)
+  * a lookup table of the cone's truth table (Lut3, Lut4, ...) otherwise
+
+Cones only contain combinational primitives with one-bit pins that declare
+a bitwise formula (see compbuilder.codegen), and only absorb nets read by a
+single primitive that are not top-level ports, so no logic is duplicated.
+The generated primitives declare bitwise formulas as well, so the mapped
+netlist runs on flatten's update()/update_full() and on the bit-parallel
+engine alike.
+
+    comp = Adder4()
+    comp.flatten()
+    comp.map_netlist(verify=100)
+    # NetlistMapping(primitives_before=100, primitives_after=12, ...)
+
+With verify, every generated primitive is checked exhaustively against the
+truth table of its cone, and the mapped component is co-simulated against
+a fresh unmapped instance for verify random input vectors; a mismatch
+raises ComponentError.
+'''
+from collections import namedtuple, Counter
+from random import Random
+
+from compbuilder import Component, Signal, Wire
+from compbuilder.exceptions import ComponentError
+from compbuilder.visual import VisualMixin
+from compbuilder.codegen import get_bitwise_formula
+from compbuilder.netlist import input_pattern, compile_formula, net_bits, is_stateful, rebuild_netlist
+from compbuilder.behavioral import Mismatch
+from compbuilder import flatten
+
+NetlistMapping = namedtuple('NetlistMapping',
+        ['primitives_before', 'primitives_after', 'cones', 'gates'])
+
+##############################################
+class MappedPrimitive(VisualMixin, Component):
+    '''
+    Base class of the primitives generated by technology mapping.  Instances
+    are wired directly into a flattened netlist.
+    '''
+    PARTS = []
+    LATCH = []
+
+##############################################
+_gate_classes = {}
+
+def _gate_class(name, inputs, formula, table=None):
+    '''
+    Return the one-bit primitive class with the given input pin names
+    computing formula, or looking its output up in the truth table when
+    given, creating it on first use.
+    '''
+    key = (name, tuple(inputs), formula)
+    if key in _gate_classes:
+        return _gate_classes[key]
+
+    if table is None:
+        expr = formula
+    else:
+        index = ' | '.join(f'{n} << {i}' if i else n for i, n in enumerate(inputs))
+        expr = f'{table} >> ({index})'
+    lines = [f'def process(self, {", ".join(inputs)}):']
+    lines += [f'    {n} = {n}.value' for n in inputs]
+    lines.append(f'    return {{"out": Signal(({expr}) & 1)}}')
+    namespace = {'Signal': Signal}
+    exec(compile('\n'.join(lines) + '\n', f'<{name}>', 'exec'), namespace)
+    process = namespace['process']
+    process.bitwise = {'out': formula}
+
+    class MappedGate(MappedPrimitive):
+        IN = [Wire(n, 1) for n in inputs]
+        OUT = [Wire('out', 1)]
+        TRIGGER = IN
+        TABLE = table
+
+    MappedGate.process = process
+    MappedGate.process_interact = process
+    MappedGate.__name__ = MappedGate.__qualname__ = name
+    _gate_classes[key] = MappedGate
+    return MappedGate
+
+##############################################
+def _pin_names(k):
+    return [chr(ord('a') + i) for i in range(k)]
+
+def _parity(k):
+    return sum(1 << v for v in range(1 << k) if bin(v).count('1') & 1)
+
+def match_gate(table, k):
+    '''
+    Return (primitive class, leaf index for each input pin) for a truth
+    table over k leaves, where bit v of table is the output for leaf values
+    given by the bits of v.
+    '''
+    full = (1 << (1 << k)) - 1
+    names = _pin_names(k)
+    order = list(range(k))
+    if k == 1:
+        if table == 0b10:
+            return _gate_class('Buffer', ['In'], 'In'), order
+        if table == 0b01:
+            return _gate_class('Not', ['In'], '~In'), order
+
+    suffix = '' if k == 2 else str(k)
+    gates = [
+        ('And', 'Nand', 1 << (full.bit_length() - 1), ' & '),
+        ('Or', 'Nor', full ^ 1, ' | '),
+        ('Xor', 'Xnor', _parity(k), ' ^ '),
+    ]
+    for name, inverted, pattern, op in gates:
+        if table == pattern:
+            return _gate_class(f'{name}{suffix}', names, op.join(names)), order
+        if table == full ^ pattern:
+            return _gate_class(f'{inverted}{suffix}', names, f'~({op.join(names)})'), order
+
+    if k == 3:
+        mux = _gate_class('Mux', ['a', 'b', 'sel'], '(a & ~sel) | (b & sel)')
+        for sel in range(3):
+            for a in range(3):
+                if a == sel:
+                    continue
+                b = 3 - a - sel
+                pattern = sum(1 << v for v in range(8)
+                              if (v >> (b if (v >> sel) & 1 else a)) & 1)
+                if table == pattern:
+                    return mux, [a, b, sel]
+
+    # sum of products over the smaller of the on- and off-sets
+    ones = [v for v in range(1 << k) if (table >> v) & 1]
+    zeros = [v for v in range(1 << k) if not (table >> v) & 1]
+    terms = ones if len(ones) <= len(zeros) else zeros
+    products = ' | '.join('(' + ' & '.join(n if (v >> i) & 1 else f'~{n}'
+                                           for i, n in enumerate(names)) + ')'
+                          for v in terms) or '0'
+    formula = products if terms is ones else f'~({products})'
+    return _gate_class(f'Lut{k}', names, formula, table), order
+
+##############################################
+def wire_gate(gate, root, leaves):
+    '''
+    Instantiate a primitive class matched by match_gate() in place of the
+    primitive root of a flattened netlist: its input pins are connected to
+    the leaves, (net, bit) pairs, and its output to the output net of root.
+    Return the new primitive, which still has to be made part of the
+    netlist with rebuild_netlist().
+    '''
+    cls, order = gate
+    part = cls()
+    part.name = root.name
+    part.parent_component = root.parent_component
+    part.wiring = {}
+    for w, i in zip(cls.IN, order):
+        net, bit = leaves[i]
+        part.wiring[w.get_key()] = (net, slice(bit, bit + 1))
+        net.add_connection(part, w, 'in', slice(bit, bit + 1))
+    net, nslice = root.wiring[root.OUT[0].get_key()]
+    part.wiring[cls.OUT[0].get_key()] = (net, nslice)
+    net.add_connection(part, cls.OUT[0], 'out', nslice)
+    return part
+
+##############################################
+def eligible(part):
+    '''
+    Return whether a primitive can be mapped: a combinational part with a
+    bitwise formula, one output and one-bit pins.
+    '''
+    return (get_bitwise_formula(part) is not None and not is_stateful(part)
+            and len(part.OUT) == 1 and all(w.width == 1 for w in part.IN + part.OUT))
+
+def _leaf(part, wire):
+    net, start, _ = net_bits(part, wire)
+    return (net, start)
+
+##############################################
+def _cone_table(cone, leaves):
+    '''
+    Return the truth table of a cone (its root first) over its leaves.
+    '''
+    count = 1 << len(leaves)
+    M = (1 << count) - 1
+    values = {leaf: input_pattern(i, count) for i, leaf in enumerate(leaves)}
+    for part in reversed(cone):   # drivers come after their readers
+        env = {w.name: values[_leaf(part, w)] for w in part.IN}
+        formula = get_bitwise_formula(part)['out']
+        values[_leaf(part, part.OUT[0])] = eval(compile_formula(formula), {}, env) & M
+    return values[_leaf(cone[0], cone[0].OUT[0])]
+
+##############################################
+def _check_gate(gate, table, k):
+    '''
+    Check the process() and bitwise formula of a mapped primitive class, with
+    input pins permuted to the cone leaves, against the cone's truth table.
+    '''
+    cls, order = gate
+    count = 1 << k
+    M = (1 << count) - 1
+    env = {w.name: input_pattern(order[i], count) for i, w in enumerate(cls.IN)}
+    code = compile(cls.process.bitwise['out'], '<bitwise>', 'eval')
+    if eval(code, {}, env) & M != table:
+        return False
+    part = cls()
+    for v in range(count):
+        inputs = {w.name: Signal((v >> order[i]) & 1) for i, w in enumerate(cls.IN)}
+        if part.process(**inputs)['out'].value != (table >> v) & 1:
+            return False
+    return True
+
+##############################################
+def map_netlist(self, max_inputs=4, verify=0, seed=None):
+    '''
+    Map the flattened netlist of this component onto wide primitives and
+    lookup tables of at most max_inputs inputs.  With verify, check every
+    generated primitive and co-simulate verify random input vectors against
+    an unmapped instance.  Return a NetlistMapping with the primitive counts
+    before and after, the number of cones mapped and a Counter of the
+    generated primitives by gate name.
+    '''
+    self.flatten()
+    primitives_before = len(self.primitives)
+    port_nets = {self.wiring[w.get_key()][0] for w in self.IN + self.OUT}
+
+    readers = {}
+    for p in self.primitives:
+        for w in p.IN:
+            net, start, _ = net_bits(p, w)
+            for bit in range(start, start + w.width):
+                readers.setdefault((net, bit), set()).add(p)
+    drivers = {_leaf(p, p.OUT[0]): p for p in self.primitives if eligible(p)}
+
+    def absorbable(leaf):
+        # driven by an eligible primitive and read by a single eligible one
+        p = drivers.get(leaf)
+        if p is None or leaf[0] in port_nets:
+            return None
+        r = readers.get(leaf, ())
+        if len(r) != 1 or not eligible(next(iter(r))):
+            return None
+        return p
+
+    roots = [p for p in self.primitives
+             if eligible(p) and absorbable(_leaf(p, p.OUT[0])) is None]
+    replaced = {}
+    gates = Counter()
+    while roots:
+        root = roots.pop()
+        cone = [root]
+        leaves = list(dict.fromkeys(_leaf(root, w) for w in root.IN))
+        grown = True
+        while grown:
+            grown = False
+            for leaf in leaves:
+                p = absorbable(leaf)
+                if p is None:
+                    continue
+                merged = [x for x in leaves if x != leaf]
+                merged = list(dict.fromkeys(merged + [_leaf(p, w) for w in p.IN]))
+                if len(merged) <= max_inputs:
+                    cone.append(p)
+                    leaves = merged
+                    grown = True
+                    break
+        # drivers left outside the cone start cones of their own
+        for leaf in leaves:
+            p = absorbable(leaf)
+            if p is not None:
+                roots.append(p)
+        if len(cone) == 1:
+            continue
+
+        table = _cone_table(cone, leaves)
+        cls, order = gate = match_gate(table, len(leaves))
+        if verify and not _check_gate(gate, table, len(leaves)):
+            raise ComponentError(message=f'Mapping of {root} onto {cls.__name__} is wrong')
+        replaced[root] = wire_gate(gate, root, leaves)
+        for p in cone[1:]:
+            replaced[p] = None
+        gates[cls.__name__] += 1
+
+    primitives = [replaced.get(p, p) for p in self.primitives]
+    primitives = [p for p in primitives if p is not None]
+    rebuild_netlist(self, primitives)
+    self.update_full()
+
+    if verify:
+        mismatch = _cosimulate(self, verify, seed)
+        if mismatch is not None:
+            raise ComponentError(message=f'Mapped {self.get_gate_name()} differs from the '
+                                         f'original: {mismatch}')
+
+    return NetlistMapping(primitives_before, len(primitives), sum(gates.values()), gates)
+
+##############################################
+def _cosimulate(comp, cycles, seed):
+    '''
+    Return the first Mismatch between update() of comp and of a fresh
+    instance of its class on random inputs, or None.
+    '''
+    reference = type(comp)()
+    reference.flatten()
+    rng = Random(seed)
+    for cycle in range(cycles):
+        inputs = {wire.name: Signal(rng.getrandbits(wire.width), wire.width)
+                  for wire in comp.IN}
+        expected = {name: s.value for name, s in reference.update(**inputs).items()}
+        actual = {name: s.value for name, s in comp.update(**inputs).items()}
+        if expected != actual:
+            return Mismatch(cycle, {name: s.value for name, s in inputs.items()},
+                            expected, actual)
+    return None
+
+##############################################
+setattr(Component,'map_netlist',map_netlist)
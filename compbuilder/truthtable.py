@@ -0,0 +1,168 @@
+'''
+Exhaustive truth tables and equivalence checking of combinational
+components with the bit-parallel engine (see compbuilder.bitparallel).
+
+All 2^n assignments of the n input bits are enumerated as packed columns:
+assignment v sets input bit i to bit i of v, with the input wires laid out
+from the first IN wire upwards.  The low input bits form fixed alternating
+patterns within a pass and the high ones are constant per pass, so a table
+is evaluated in 2^(n - chunk_bits) passes over the netlist.
+
+    table = truth_table(FullAdder)
+    table.columns['s']         # one int of 2^n bits per output bit
+    table.lookup(a=1, b=1, carry_in=0)
+    same, counterexample = equivalent(StudentALU, ReferenceALU)
+'''
+from compbuilder.exceptions import ComponentError
+from compbuilder.bitparallel import BitParallelEngine
+from compbuilder.netlist import input_pattern
+
+##############################################
+def _instance(component):
+    return component() if isinstance(component, type) else component
+
+##############################################
+def _engine(component):
+    comp = _instance(component)
+    if getattr(comp, 'batch_engine', None) is None:
+        comp.batch_engine = BitParallelEngine(comp)
+    return comp.batch_engine
+
+##############################################
+def _passes(engine, max_inputs, chunk_bits):
+    '''
+    Generate (pass index, assignments per pass, packed outputs) over all
+    input assignments of the engine's component.
+    '''
+    widths = [w.width for w in engine.comp.IN]
+    n = sum(widths)
+    if n > max_inputs:
+        raise ComponentError(message=f'{engine.comp.get_gate_name()} has {n} input bits; '
+                                     f'exhaustive enumeration is limited to {max_inputs}')
+    # passes cover whole bytes so that truth_table() can concatenate them
+    chunk = min(n, max(chunk_bits, 3))
+    count = 1 << chunk
+    M = (1 << count) - 1
+    patterns = [input_pattern(i, count) for i in range(chunk)]
+
+    for p in range(1 << (n - chunk)):
+        packed = []
+        g = 0
+        for width in widths:
+            bits = []
+            for b in range(width):
+                if g < chunk:
+                    bits.append(patterns[g])
+                else:
+                    bits.append(M if (p >> (g - chunk)) & 1 else 0)
+                g += 1
+            packed.append(bits)
+        yield p, count, engine.evaluate_packed(packed, count)
+
+##############################################
+class TruthTable:
+    '''
+    Truth table of a combinational component.
+
+    Attributes:
+      inputs   -- list of (wire name, width) in assignment bit order
+      outputs  -- list of (wire name, width)
+      columns  -- {output wire name: list of ints, one per output bit, whose
+                  bit v is the output bit for input assignment v}
+    '''
+    def __init__(self, inputs, outputs, columns):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.columns = columns
+
+    def __len__(self):
+        return 1 << sum(width for _, width in self.inputs)
+
+    def __eq__(self, other):
+        return (isinstance(other, TruthTable) and self.inputs == other.inputs
+                and self.outputs == other.outputs and self.columns == other.columns)
+
+    def assignment(self, v):
+        '''
+        Return the input values of assignment v as a dict.
+        '''
+        values = {}
+        for name, width in self.inputs:
+            values[name] = v & ((1 << width) - 1)
+            v >>= width
+        return values
+
+    def index(self, **inputs):
+        v = 0
+        shift = 0
+        for name, width in self.inputs:
+            v |= (inputs[name] & ((1 << width) - 1)) << shift
+            shift += width
+        return v
+
+    def lookup(self, **inputs):
+        '''
+        Return the output values for the given int input values.
+        '''
+        v = self.index(**inputs)
+        return {name: sum(((column >> v) & 1) << b
+                          for b, column in enumerate(self.columns[name]))
+                for name, _ in self.outputs}
+
+##############################################
+def truth_table(component, max_inputs=24, chunk_bits=16):
+    '''
+    Return the TruthTable of a combinational component (class or instance)
+    with at most max_inputs input bits, evaluating 2^chunk_bits assignments
+    per pass.
+    '''
+    engine = _engine(component)
+    comp = engine.comp
+    chunks = {w.name: [[] for _ in range(w.width)] for w in comp.OUT}
+    for p, count, results in _passes(engine, max_inputs, chunk_bits):
+        nbytes = (count + 7) // 8
+        for w, bits in zip(comp.OUT, results):
+            for b, column in enumerate(bits):
+                chunks[w.name][b].append(column.to_bytes(nbytes, 'little'))
+
+    # concatenate pass results as bytes rather than shifting growing ints
+    columns = {name: [int.from_bytes(b''.join(parts), 'little') for parts in bits]
+               for name, bits in chunks.items()}
+    return TruthTable([(w.name, w.width) for w in comp.IN],
+                      [(w.name, w.width) for w in comp.OUT],
+                      columns)
+
+##############################################
+def equivalent(a, b, max_inputs=24, chunk_bits=16):
+    '''
+    Check two combinational components (classes or instances) with the same
+    ports for equivalence over all input assignments.  Return a tuple
+    (True, None), or (False, counterexample) where counterexample is a dict
+    with the 'inputs' of the first differing assignment and the outputs of
+    a ('expected') and b ('actual') for it.
+    '''
+    engine_a, engine_b = _engine(a), _engine(b)
+    ports_a = [[w.get_key() for w in engine_a.comp.IN], [w.get_key() for w in engine_a.comp.OUT]]
+    ports_b = [[w.get_key() for w in engine_b.comp.IN], [w.get_key() for w in engine_b.comp.OUT]]
+    if ports_a != ports_b:
+        raise ComponentError(message=f'Cannot compare {engine_a.comp.get_gate_name()} and '
+                                     f'{engine_b.comp.get_gate_name()}: ports differ')
+
+    passes = zip(_passes(engine_a, max_inputs, chunk_bits),
+                 _passes(engine_b, max_inputs, chunk_bits))
+    for (p, count, results_a), (_, _, results_b) in passes:
+        diff = 0
+        for bits_a, bits_b in zip(results_a, results_b):
+            for column_a, column_b in zip(bits_a, bits_b):
+                diff |= column_a ^ column_b
+        if diff:
+            j = (diff & -diff).bit_length() - 1
+            v = (p * count) + j
+            table = TruthTable([(w.name, w.width) for w in engine_a.comp.IN], [], {})
+            outputs = lambda results: {
+                w.name: sum(((column >> j) & 1) << k for k, column in enumerate(bits))
+                for w, bits in zip(engine_a.comp.OUT, results)}
+            return False, {'inputs': table.assignment(v),
+                           'expected': outputs(results_a),
+                           'actual': outputs(results_b)}
+    return True, None
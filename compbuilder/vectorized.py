@@ -0,0 +1,198 @@
+'''
+NumPy levelized evaluator for batched stimuli over the flattened netlist.
+
+The flattened design is compiled into arrays: every net bit gets a row of a
+(net bits x vectors) matrix, and every topological level holds, for each
+gate type present in the level, the row indices of the gate inputs and
+outputs.  Evaluating a level is then one gather, one bitwise formula and one
+scatter per gate type, regardless of the number of vectors.
+
+Gate behaviour comes from the process.bitwise formulas also used by
+compbuilder.codegen and compbuilder.bitparallel.  Rows are either bool
+(one vector per column) or bit-packed uint8 (eight vectors per column).
+
+NumPy is an optional dependency; it is only imported when an evaluator is
+built.
+
+    comp = Mux8Way16()
+    results = comp.eval_vectorized(a=np.array([...]), ..., packed=True)
+'''
+from compbuilder import Component
+from compbuilder.exceptions import ComponentError
+from compbuilder.codegen import get_bitwise_formula
+
+# widest top-level wire whose values fit in int64
+MAX_WIDTH = 63
+
+##############################################
+class LevelizedNetlist:
+    '''
+    Array form of a flattened combinational component.
+
+    Attributes:
+      rows        -- number of net-bit rows in the state matrix
+      gate_types  -- list of (gate name, {output pin: compiled formula}, input
+                     pin names, output pin names), indexed by gate-type code
+      levels      -- list of levels, each a list of (code, inputs, outputs)
+                     where inputs/outputs are int arrays of shape
+                     (pins, gates) holding row indices
+      const_rows  -- row indices of constant-one rows
+      input_rows  -- {wire name: row index array} for top-level inputs
+      output_rows -- {wire name: row index array} for top-level outputs
+    '''
+    def __init__(self, comp):
+        import numpy as np
+
+        for w in comp.IN + comp.OUT:
+            if w.width > MAX_WIDTH:
+                raise ComponentError(message=f'Wire {w.name} is {w.width} bits wide; vectorized evaluation supports at most {MAX_WIDTH} bits per wire')
+        comp.flatten()
+        self.comp = comp
+
+        base = {}
+        rows = 0
+        for net in comp.netlist:
+            base[net] = rows
+            rows += net.width
+        self.rows = rows
+
+        def pin_rows(part, wire):
+            net, nslice = part.wiring[wire.get_key()]
+            start, stop, _ = nslice.indices(net.width)
+            return list(range(base[net]+start, base[net]+stop))
+
+        # level of every primitive in the update_full() schedule, i.e., the
+        # first level at which it drives a net
+        level = {}
+        for i, primitives in enumerate(comp.primitive_levels):
+            for p in primitives:
+                level.setdefault(p, i)
+        order = sorted(comp.primitives, key=lambda p: level[p])
+        driver = {}
+        for p in order:
+            for w in p.OUT:
+                for r in pin_rows(p, w):
+                    driver[r] = p
+        for p in order:
+            if any(r in driver and level[driver[r]] >= level[p]
+                   for w in p.IN for r in pin_rows(p, w)):
+                raise ComponentError(message=f'Cannot levelize primitive {p} (loop or latch)')
+
+        codes = {}
+        self.gate_types = []
+        grouped = {}
+        for p in order:
+            formula = get_bitwise_formula(p)
+            if formula is None:
+                raise ComponentError(message=f'Primitive {p.get_gate_name()} does not declare a bitwise formula')
+            key = (type(p), tuple(sorted(formula.items())))
+            if key not in codes:
+                codes[key] = len(self.gate_types)
+                self.gate_types.append((
+                    p.get_gate_name(),
+                    {name: compile(expr, f'<{p.get_gate_name()}.{name}>', 'eval')
+                     for name, expr in formula.items()},
+                    [w.name for w in p.IN],
+                    [w.name for w in p.OUT],
+                ))
+            widths = {w.width for w in p.IN + p.OUT}
+            if len(widths) != 1:
+                raise ComponentError(message=f'Primitive {p.get_gate_name()} mixes pin widths; cannot evaluate bitwise')
+            ins = [pin_rows(p, w) for w in p.IN]
+            outs = [pin_rows(p, w) for w in p.OUT]
+            entry = grouped.setdefault((level[p], codes[key]), ([], []))
+            for b in range(widths.pop()):
+                entry[0].append([rs[b] for rs in ins])
+                entry[1].append([rs[b] for rs in outs])
+
+        levels = {}
+        for (lvl, code), (ins, outs) in sorted(grouped.items()):
+            levels.setdefault(lvl, []).append((
+                code,
+                np.array(ins, dtype=np.intp).reshape(len(ins), -1).T,
+                np.array(outs, dtype=np.intp).reshape(len(outs), -1).T,
+            ))
+        self.levels = list(levels.values())
+
+        const_rows = []
+        for net in comp.netlist:
+            if net.signal is not None and not any(s.component is not comp for s in net.sources):
+                const_rows.extend(base[net]+b for b in range(net.width)
+                                  if (net.signal.value >> b) & 1)
+        self.const_rows = np.array(const_rows, dtype=np.intp)
+        self.input_rows = {w.name: np.array(pin_rows(comp, w), dtype=np.intp)
+                           for w in comp.IN}
+        self.output_rows = {w.name: np.array(pin_rows(comp, w), dtype=np.intp)
+                            for w in comp.OUT}
+
+    def evaluate(self, state):
+        '''
+        Evaluate all levels in place on a state matrix whose input and
+        constant rows have already been filled in.
+        '''
+        for gates in self.levels:
+            for code, ins, outs in gates:
+                _, formulas, in_names, out_names = self.gate_types[code]
+                env = {name: state[ins[i]] for i, name in enumerate(in_names)}
+                for i, name in enumerate(out_names):
+                    state[outs[i]] = eval(formulas[name], {}, env)
+        return state
+
+    def run(self, packed=False, **inputs):
+        '''
+        Evaluate the netlist for arrays of integer input values, one array
+        per input wire, all of the same length.  When packed is set, eight
+        vectors are stored per matrix byte.  Return a dict of int64 arrays.
+        '''
+        import numpy as np
+
+        values = {}
+        for name in self.input_rows:
+            if name not in inputs:
+                raise ComponentError(message=f'Missing input vectors for {name}')
+            values[name] = np.asarray(inputs[name], dtype=np.int64).reshape(-1)
+        lengths = {len(v) for v in values.values()}
+        if len(lengths) > 1:
+            raise ComponentError(message='Input vectors must have identical length')
+        count = lengths.pop() if lengths else 1
+
+        def to_bits(v, width):
+            return ((v[None,:] >> np.arange(width)[:,None]) & 1).astype(bool)
+
+        if packed:
+            columns = (count + 7) // 8
+            state = np.zeros((self.rows, columns), dtype=np.uint8)
+            one = np.uint8(0xFF)
+            encode = lambda bits: np.packbits(bits, axis=1, bitorder='little')
+            decode = lambda rows: np.unpackbits(rows, axis=1, count=count,
+                                                bitorder='little')
+        else:
+            state = np.zeros((self.rows, count), dtype=bool)
+            one = True
+            encode = decode = lambda rows: rows
+
+        state[self.const_rows] = one
+        for name, rows in self.input_rows.items():
+            state[rows] = encode(to_bits(values[name], len(rows)))
+
+        self.evaluate(state)
+
+        outputs = {}
+        for name, rows in self.output_rows.items():
+            bits = decode(state[rows]).astype(np.int64)
+            outputs[name] = (bits << np.arange(len(rows))[:,None]).sum(axis=0)
+        return outputs
+
+##############################################
+def eval_vectorized(self, packed=False, **inputs):
+    '''
+    Evaluate this combinational component for arrays of input values using
+    the NumPy levelized evaluator.  Return a dict mapping each output wire
+    name to an int64 array.
+    '''
+    if getattr(self, 'levelized_netlist', None) is None:
+        self.levelized_netlist = LevelizedNetlist(self)
+    return self.levelized_netlist.run(packed=packed, **inputs)
+
+##############################################
+setattr(Component,'eval_vectorized',eval_vectorized)
@@ -15,6 +15,9 @@ class Nand(Component):
             return {'out': Signal(0)}
         else:
             return {'out': Signal(1)}
+    process.bitwise = {
+        'out': '~(a & b)',
+    }
 
 class DFF(Component):
     IN = [w.In]
@@ -0,0 +1,85 @@
+import json
+import unittest
+
+from compbuilder import Signal
+from compbuilder.activity import ToggleCounter
+from compbuilder.exceptions import ComponentError
+from compbuilder.profiling import SimProfiler
+import compbuilder.codegen
+import compbuilder.flatten
+from test.test_ram import RAM8
+from test.visual_gates import FullAdder
+
+class TestToggleCounter(unittest.TestCase):
+    def count_adder(self, comp, evaluate):
+        with ToggleCounter(comp) as counter:
+            for a, b, c in [(0,0,0), (1,0,0), (1,1,0), (0,0,0)]:
+                evaluate(a=Signal(a), b=Signal(b), carry_in=Signal(c))
+        return counter
+
+    def net_toggles(self, counter):
+        return {n['name'].split(':')[-1]: n['toggles']
+                for n in counter.report()['nets'] if ':' in n['name'] and
+                n['name'].split(':')[0] == 'FullAdder'}
+
+    def test_eval(self):
+        comp = FullAdder()
+        counter = self.count_adder(comp, comp.eval)
+        report = counter.report()
+        self.assertEqual(report['cycles'], 4)
+        # a: 0 1 1 0, b: 0 0 1 0, s = s1: 0 1 0 0, carry_out = c1: 0 0 1 0
+        self.assertEqual(self.net_toggles(counter),
+                         {'a': 2, 'b': 2, 's1': 2, 'c1': 2, 's': 2, 'carry_out': 2})
+        self.assertEqual(report['components'][0]['path'], 'FullAdder')
+        self.assertGreater(report['components'][0]['toggles'], 8)
+
+    def test_flatten_update(self):
+        comp = FullAdder()
+        comp.flatten()
+        counter = self.count_adder(comp, lambda **inputs: comp.update(**inputs))
+        self.assertEqual(counter.cycles, 4)
+        self.assertEqual(self.net_toggles(counter),
+                         {'a': 2, 'b': 2, 's1': 2, 'c1': 2, 's': 2, 'carry_out': 2})
+
+    def test_run_and_compiled(self):
+        stimulus = {'In': [5, 9, 7, 0], 'address': [1, 2, 1, 3], 'load': [1, 1, 0, 0]}
+        interpreted = RAM8()
+        with ToggleCounter(interpreted) as counter:
+            interpreted.run(stimulus)
+        compiled = RAM8()
+        compiled.compile_simulator(keep_edge_values=True)
+        with ToggleCounter(compiled) as compiled_counter:
+            compiled.run(stimulus)
+
+        # In toggles 0->5->9->7->0: 2 + 2 + 3 + 3 bits
+        nets = {n['name']: n for n in counter.report()['nets']}
+        self.assertEqual(nets['RAM8:In']['toggles'], 10)
+        self.assertAlmostEqual(nets['RAM8:In']['activity'], 10 / (4 * 16))
+        self.assertEqual(counter.report(), compiled_counter.report())
+
+    def test_with_profiler(self):
+        comp = FullAdder()
+        comp.flatten()
+        profiler = SimProfiler(comp)
+        profiler.enable()
+        self.assertRaises(ComponentError, ToggleCounter(comp).enable)
+        profiler.disable()
+        self.assertTrue(all('trigger' not in vars(p) for p in comp.primitives))
+
+        counter = ToggleCounter(comp)
+        counter.enable()
+        self.assertRaises(ComponentError, SimProfiler(comp).enable)
+        counter.disable()
+        self.assertNotIn('update', vars(comp))
+        self.assertTrue(all('trigger' not in vars(p) for p in comp.primitives))
+
+    def test_disable_and_json(self):
+        comp = FullAdder()
+        counter = self.count_adder(comp, comp.eval)
+        self.assertEqual(comp.simulation_hooks, {})
+        comp.eval(a=Signal(1), b=Signal(1), carry_in=Signal(1))
+        self.assertEqual(counter.cycles, 4)
+        self.assertEqual(json.loads(counter.to_json()), counter.report())
+
+if __name__ == '__main__':
+    unittest.main()
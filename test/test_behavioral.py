@@ -0,0 +1,70 @@
+import unittest
+from random import randint
+
+from compbuilder import Signal
+from compbuilder.exceptions import ComponentError
+from compbuilder.behavioral import (FastModel, register_fast_model,
+        unregister_fast_model, verify_fast_model, gate_level)
+import compbuilder.codegen
+from test.test_ram import RAM8, RAM64, Mux16
+
+class RAM8Model(FastModel):
+    clocked = True
+
+    def reset(self):
+        self.memory = [0] * 8
+
+    def evaluate(self, In, address, load):
+        return {'out': self.memory[address]}
+
+    def clock(self, In, address, load):
+        if load:
+            self.memory[address] = In
+
+class Mux16Model(FastModel):
+    def evaluate(self, a, b, sel):
+        return {'out': b if sel else a}
+
+class BrokenMux16Model(FastModel):
+    def evaluate(self, a, b, sel):
+        return {'out': a}
+
+class TestFastModels(unittest.TestCase):
+    def tearDown(self):
+        unregister_fast_model(RAM8)
+        unregister_fast_model(Mux16)
+
+    def test_combinational_model(self):
+        register_fast_model(Mux16, Mux16Model, verify=50)
+        mux = Mux16()
+        self.assertEqual(mux.eval(a=Signal(5,16), b=Signal(9,16), sel=Signal(1))['out'].get(), 9)
+        self.assertEqual(len(mux.internal_components), 1)
+
+    def test_mismatch_reported(self):
+        register_fast_model(Mux16, BrokenMux16Model)
+        mismatch = verify_fast_model(Mux16, cycles=50, seed=1)
+        self.assertIsNotNone(mismatch)
+        self.assertEqual(mismatch.inputs['sel'], 1)
+        self.assertEqual(mismatch.actual['out'], mismatch.inputs['a'])
+
+        with self.assertRaises(ComponentError):
+            register_fast_model(Mux16, BrokenMux16Model, verify=50, seed=1)
+        self.assertNotIn(Mux16, RAM8.fast_models)
+
+    def test_clocked_model_in_design(self):
+        register_fast_model(RAM8, RAM8Model, verify=100)
+        with gate_level():
+            reference = RAM64()
+            reference.compile_simulator()
+        fast = RAM64()
+        fast.compile_simulator()
+        self.assertLess(len(fast.sim_base_components), len(reference.sim_base_components) / 10)
+
+        for i in range(30):
+            inputs = dict(In=Signal(randint(0,65535),16),
+                          address=Signal(randint(0,63),6),
+                          load=Signal(randint(0,1)))
+            self.assertEqual(fast.eval(**inputs), reference.eval(**inputs))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from random import randint
+
+from compbuilder import Signal, w
+import compbuilder.bitparallel
+from compbuilder.exceptions import ComponentError
+from test.visual_gates import Xor, Mux4, Adder4, ClashPair, clash_reference
+
+T = Signal.T
+F = Signal.F
+
+class TestPacking(unittest.TestCase):
+    def test_roundtrip(self):
+        values = [randint(0,255) for _ in range(100)]
+        packed = compbuilder.bitparallel.pack(values, 8)
+        self.assertEqual(compbuilder.bitparallel.unpack(packed, 100), values)
+
+class TestEvalBatch(unittest.TestCase):
+    def test_xor(self):
+        result = Xor().eval_batch(a=[0,0,1,1], b=[0,1,0,1])
+        self.assertEqual(result, {'out': [0,1,1,0]})
+
+    def test_signals(self):
+        result = Xor().eval_batch(a=[F,T], b=[T,T])
+        self.assertEqual(result, {'out': [1,0]})
+
+    def test_mux4(self):
+        a = [randint(0,15) for _ in range(1024)]
+        b = [randint(0,15) for _ in range(1024)]
+        sel = [randint(0,1) for _ in range(1024)]
+        result = Mux4().eval_batch(a=a, b=b, sel=sel)
+        self.assertEqual(result['out'], [y if s else x for x,y,s in zip(a,b,sel)])
+
+    def test_adder_exhaustive(self):
+        a = [i >> 4 for i in range(256)]
+        b = [i & 15 for i in range(256)]
+        result = Adder4().eval_batch(a=a, b=b)
+        self.assertEqual(result['out'], [(x+y) & 15 for x,y in zip(a,b)])
+        self.assertEqual(result['carry'], [(x+y) >> 4 for x,y in zip(a,b)])
+
+    def test_matches_update(self):
+        adder = Adder4()
+        adder.flatten()
+        a = [randint(0,15) for _ in range(50)]
+        b = [randint(0,15) for _ in range(50)]
+        batch = Adder4().eval_batch(a=a, b=b)
+        for i in range(50):
+            out = adder.update(a=Signal(a[i],4), b=Signal(b[i],4))
+            self.assertEqual(out['out'].get(), batch['out'][i])
+
+    def test_length_mismatch(self):
+        self.assertRaises(ComponentError, lambda: Xor().eval_batch(a=[0,1], b=[0]))
+
+    def test_pin_names(self):
+        vectors = [[(i >> k) & 1 for i in range(16)] for k in range(4)]
+        result = ClashPair().eval_batch(**dict(zip('abcd', vectors)))
+        self.assertEqual(result['out'],
+                         [clash_reference(*v) for v in zip(*vectors)])
+
+    def test_not_visual(self):
+        from test.basic_gates import Xor as PlainXor
+        self.assertRaises(ComponentError,
+                          lambda: PlainXor().eval_batch(a=[0,1], b=[0,1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from random import randint
+
+from compbuilder import Signal, w
+from compbuilder.exceptions import ComponentError
+from compbuilder.checkpoint import load_snapshot
+import compbuilder.flatten
+from test.basic_gates import Component
+from test.test_dff import SeqComp3
+from test.test_ram import RAM8, RAM64wFastRAM8, gen_fast_ram_component
+from test.visual_gates import FullAdder
+
+FastRAM4K = gen_fast_ram_component(12)
+
+class BigRAM(Component):
+    IN = [w(16).In, w(12).address, w.load]
+    OUT = [w(16).out]
+
+    PARTS = [
+        FastRAM4K(In=w.In, address=w.address, load=w.load, out=w.out),
+    ]
+
+def random_inputs(address_bits):
+    return dict(In=Signal(randint(0,65535),16),
+                address=Signal(randint(0,(1 << address_bits)-1),address_bits),
+                load=Signal(randint(0,1)))
+
+class TestCheckpoint(unittest.TestCase):
+    def replay(self, comp, stimulus):
+        return [comp.eval(**inputs)['out'].get() for inputs in stimulus]
+
+    def check_rewind(self, comp, address_bits, cycles=40):
+        for i in range(cycles):
+            comp.eval(**random_inputs(address_bits))
+        checkpoint = comp.snapshot()
+        stimulus = [random_inputs(address_bits) for i in range(cycles)]
+        first = self.replay(comp, stimulus)
+        comp.restore(checkpoint)
+        self.assertEqual(self.replay(comp, stimulus), first)
+        return checkpoint, stimulus, first
+
+    def test_gate_level(self):
+        self.check_rewind(RAM8(), 3)
+
+    def test_fast_ram(self):
+        self.check_rewind(RAM64wFastRAM8(), 6, 200)
+
+    def test_sequential_step(self):
+        seq3 = SeqComp3()
+        seq3.step(In=1)
+        checkpoint = seq3.snapshot()
+        outputs = [seq3.step(In=x)['out'].get() for x in (0, 0, 1, 0)]
+        seq3.restore(checkpoint)
+        self.assertEqual([seq3.step(In=x)['out'].get() for x in (0, 0, 1, 0)], outputs)
+
+    def test_other_instance_and_disk(self):
+        checkpoint, stimulus, outputs = self.check_rewind(RAM64wFastRAM8(), 6, 100)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'ram.snap')
+            checkpoint.save(filename)
+            other = RAM64wFastRAM8()
+            other.restore(load_snapshot(filename))
+        self.assertEqual(self.replay(other, stimulus), outputs)
+
+        with self.assertRaises(ComponentError):
+            RAM8().restore(checkpoint)
+
+    def test_shared_pages(self):
+        ram = BigRAM()
+        ram.eval(In=Signal(5,16), address=Signal(7,12), load=Signal(1))
+        first = ram.snapshot()
+        ram.eval(In=Signal(9,16), address=Signal(4000,12), load=Signal(1))
+        ram.eval(In=Signal(9,16), address=Signal(4000,12), load=Signal(0))
+        second = ram.snapshot()
+        self.assertGreaterEqual(second.shared_pages(first), 2)
+        self.assertLess(second.shared_pages(first), len(second.pages))
+
+        ram.restore(first)
+        self.assertEqual(ram.eval(In=Signal(0,16), address=Signal(4000,12), load=Signal(0))['out'].get(), 0)
+        self.assertEqual(ram.eval(In=Signal(0,16), address=Signal(7,12), load=Signal(0))['out'].get(), 5)
+
+    def test_flattened_restore_keeps_caller_signals(self):
+        T, F = Signal.T, Signal.F
+        for update in ('update', 'update_full'):
+            adder = FullAdder()
+            adder.flatten()
+            getattr(adder, update)(a=F, b=F, carry_in=F)
+            checkpoint = adder.snapshot()
+            b = Signal(1)
+            getattr(adder, update)(a=T, b=b, carry_in=F)
+            adder.restore(checkpoint)
+            self.assertEqual((T.value, F.value, b.value), (1, 0, 1))
+            out = adder.update(a=T, b=T, carry_in=F)
+            self.assertEqual((out['s'].value, out['carry_out'].value), (0, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from random import randint
+
+from compbuilder import Signal
+import compbuilder.codegen
+from compbuilder.exceptions import ComponentError
+from compbuilder.tracing import trace
+from test.basic_gates import Xor, FullAdder, UnusedOUTWire
+from test.bus_gates import AndWith12
+from test.test_bits import Register16
+from test.test_dff import SeqComp3, FlipComp
+from test.test_ram import TestRAMBase, RAM64wFastRAM8, Mux8Way16
+
+T = Signal.T
+F = Signal.F
+
+class TestCompiledCombinational(unittest.TestCase):
+    def test_xor(self):
+        xor = Xor()
+        xor.compile_simulator()
+        self.assertEqual(xor.eval_single(a=F, b=F), F)
+        self.assertEqual(xor.eval_single(a=F, b=T), T)
+        self.assertEqual(xor.eval_single(a=T, b=F), T)
+        self.assertEqual(xor.eval_single(a=T, b=T), F)
+
+    def test_full_adder(self):
+        compiled = FullAdder()
+        compiled.compile_simulator()
+        reference = FullAdder()
+        for a in [F,T]:
+            for b in [F,T]:
+                for c in [F,T]:
+                    self.assertEqual(compiled.eval(a=a, b=b, carry_in=c),
+                                     reference.eval(a=a, b=b, carry_in=c))
+
+    def test_constant(self):
+        comp = AndWith12()
+        comp.compile_simulator()
+        self.assertEqual(comp.eval_single(In=Signal(255,8)), Signal(12,8))
+        self.assertEqual(comp.eval_single(In=Signal(4,8)), Signal(4,8))
+
+    def test_mux8way16(self):
+        compiled = Mux8Way16()
+        compiled.compile_simulator()
+        reference = Mux8Way16()
+        for i in range(20):
+            inputs = {name:Signal(randint(0,65535),16) for name in 'abcdefgh'}
+            inputs['sel'] = Signal(randint(0,7),3)
+            self.assertEqual(compiled.eval(**inputs), reference.eval(**inputs))
+
+    def test_pin_names(self):
+        from test.visual_gates import ClashPair, clash_reference
+        comp = ClashPair()
+        comp.compile_simulator()
+        for i in range(16):
+            v = [(i >> k) & 1 for k in range(4)]
+            out = comp.eval_single(**{name: Signal(x) for name, x in zip('abcd', v)})
+            self.assertEqual(out.get(), clash_reference(*v))
+
+    def test_missing_output(self):
+        self.assertRaises(ComponentError,
+                          lambda: UnusedOUTWire().compile_simulator())
+
+class TestCompiledSequential(unittest.TestCase):
+    def test_flip(self):
+        flip = FlipComp()
+        flip.compile_simulator()
+        for i in range(6):
+            self.assertEqual(flip.eval_single(), [F,T][i % 2])
+
+    def test_seq3(self):
+        seq3 = SeqComp3()
+        seq3.compile_simulator()
+        inputs = [T,F,F,T,F,F,F,F]
+        outputs = [F,T,T,F,T,T,F,T]
+        for x,y in zip(inputs,outputs):
+            self.assertEqual(seq3.eval_single(In=x), y)
+
+    def test_register16(self):
+        reg16 = Register16()
+        reg16.compile_simulator()
+        self.assertEqual(trace(reg16, {'In':[131,2134,32767,65535,355,34234,0,10,0], 'load':'111111111'}, ['out']),
+                         {'out':[0,131,2134,32767,65535,355,34234,0,10]})
+
+    def test_keep_edge_values(self):
+        reg16 = Register16()
+        reg16.compile_simulator(keep_edge_values=True)
+        reg16.eval(In=Signal(5,16), load=T)
+        bit = reg16.internal_components[0]
+        reg16.extract_component_trace(bit)
+        self.assertEqual(bit.trace_signals['In'], T)
+
+    def test_keep_edge_values_constant(self):
+        comp = AndWith12()
+        comp.compile_simulator(keep_edge_values=True)
+        self.assertEqual(comp.eval_single(In=Signal(255,8)), Signal(12,8))
+        self.assertEqual(comp.edge_values[(comp.cid, ('In', 8))], Signal(255,8))
+
+class TestCompiledFastRAM(TestRAMBase):
+    def test_ram_from_ram8_random(self):
+        ram64 = RAM64wFastRAM8()
+        ram64.compile_simulator()
+        self.do_test_random(ram64,500)
+
+if __name__ == '__main__':
+    unittest.main()
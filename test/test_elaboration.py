@@ -0,0 +1,120 @@
+import unittest
+
+from compbuilder import Signal, Component, w
+from compbuilder.exceptions import ComponentError
+from test.basic_gates import Nand, Not, And, DFF
+
+T = Signal.T
+F = Signal.F
+
+class Ring(Component):
+    IN = [w.In]
+    OUT = [w.out]
+
+    PARTS = [
+        And(a=w.In, b=w.out, out=w.x),
+        Not(In=w.x, out=w.out),
+    ]
+
+class RegisteredRing(Component):
+    IN = []
+    OUT = [w.out]
+
+    PARTS = [
+        DFF(In=w.x, out=w.out),
+        Not(In=w.out, out=w.x),
+    ]
+
+class TestLoopDetection(unittest.TestCase):
+    def test_combinational_loop(self):
+        with self.assertRaises(ComponentError) as cm:
+            Ring().eval(In=T)
+        message = str(cm.exception)
+        self.assertTrue(message.startswith('Loop found:'))
+        self.assertIn('Nand', message)
+
+    def test_loop_through_dff(self):
+        self.assertEqual(RegisteredRing().eval_single(), F)
+
+class NandChain(Component):
+    # deeper than the default recursion limit
+    IN = [w.In]
+    OUT = [w.out]
+
+    PARTS = [Nand(a=w.In, b=w.In, out=w.x1)]
+    PARTS += [Nand(a=getattr(w, f'x{i}'), b=getattr(w, f'x{i}'),
+                   out=getattr(w, f'x{i+1}'))
+              for i in range(1, 3000)]
+    PARTS += [Nand(a=w.x3000, b=w.x3000, out=w.out)]
+
+class TestDeepDesign(unittest.TestCase):
+    def test_deep_chain(self):
+        chain = NandChain()
+        self.assertEqual(chain.eval_single(In=T), F)
+        self.assertEqual(chain.eval_single(In=F), T)
+
+class TwoRings(Component):
+    IN = []
+    OUT = [w.a, w.b]
+
+    PARTS = [
+        RegisteredRing(out=w.a),
+        RegisteredRing(out=w.b),
+    ]
+
+class TestElaborationTemplate(unittest.TestCase):
+    def test_shared_wiring(self):
+        comp = TwoRings()
+        comp.initialize()
+        first, second = comp.internal_components
+        self.assertIsNot(first, second)
+        self.assertIs(first.edges, second.edges)
+        self.assertIs(first.IN, second.IN)
+        self.assertIsNot(first.internal_components[0],
+                         second.internal_components[0])
+        self.assertIs(first.nodes[1].in_dict, second.nodes[1].in_dict)
+        self.assertIs(first.nodes[1].component, first.internal_components[0])
+
+    def test_independent_state(self):
+        first, second = RegisteredRing(), RegisteredRing()
+        self.assertEqual(first.eval_single(), F)
+        self.assertEqual(first.eval_single(), T)
+        self.assertEqual(second.eval_single(), F)
+        self.assertIs(first.edges, second.edges)
+
+        comp = TwoRings()
+        self.assertEqual(comp.eval(), {'a': F, 'b': F})
+        self.assertEqual(comp.eval(), {'a': T, 'b': T})
+
+class NotPair(Component):
+    IN = [w(2).a]
+    OUT = [w(2).out]
+
+    PARTS = [
+        Not(In=w.a[0], out=w.out[0]),
+        Not(In=w.a[1], out=w.out[1]),
+    ]
+
+class NotQuad(Component):
+    IN = [w(4).x]
+    OUT = [w(4).y]
+
+    PARTS = [
+        NotPair(a=w.x[2:4], out=w.y[2:4]),
+        NotPair(a=w.x[0:2], out=w.y[0:2]),
+    ]
+
+class TestWireResolution(unittest.TestCase):
+    def test_nested_slices(self):
+        comp = NotQuad()
+        comp.elaborate()
+        inner = comp.internal_components[0].internal_components[1]
+        mapped = inner.wire_map[('In', 1)]
+        self.assertEqual(mapped.edge_key, (comp.cid, ('x', 4)))
+        self.assertEqual(mapped.offset, 3)
+        self.assertEqual(mapped.width, 1)
+        self.assertFalse(mapped.is_constant)
+        self.assertEqual(comp.eval(x=Signal(0b0110, 4))['y'].get(), 0b1001)
+
+if __name__ == '__main__':
+    unittest.main()
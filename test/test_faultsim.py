@@ -0,0 +1,53 @@
+import unittest
+from random import randint
+
+from compbuilder.exceptions import ComponentError
+from compbuilder.faultsim import Fault, FaultSimulator
+from test.visual_gates import Xor, Mux4, ClashPair
+
+class TestFaultCoverage(unittest.TestCase):
+    def test_exhaustive_xor(self):
+        report = Xor().fault_coverage(a=[0,0,1,1], b=[0,1,0,1])
+        self.assertEqual(len(report.faults), 2 * 11)
+        self.assertEqual(report.coverage, 1.0)
+        self.assertEqual(report.undetected, [])
+
+    def test_single_vector(self):
+        report = Xor().fault_coverage(a=[0], b=[0])
+        self.assertIn(Fault('Xor:out', 0, 1), report.detected)
+        self.assertIn(Fault('Xor:a', 0, 1), report.detected)
+        self.assertIn(Fault('Xor:out', 0, 0), report.undetected)
+        self.assertIn(Fault('Xor:na', 0, 0), report.undetected)
+
+    def test_first_detecting_vector(self):
+        report = Xor().fault_coverage(a=[0,1], b=[0,0])
+        self.assertEqual(report.detected[Fault('Xor:out', 0, 1)], 0)
+        self.assertEqual(report.detected[Fault('Xor:out', 0, 0)], 1)
+
+    def test_group_size(self):
+        inputs = dict(a=[randint(0,15) for _ in range(6)],
+                      b=[randint(0,15) for _ in range(6)],
+                      sel=[randint(0,1) for _ in range(6)])
+        wide = Mux4().fault_coverage(**inputs)
+        narrow = Mux4().fault_coverage(machines=5, **inputs)
+        self.assertEqual(wide.detected, narrow.detected)
+
+    def test_pin_names(self):
+        vectors = [[(i >> k) & 1 for i in range(16)] for k in range(4)]
+        report = ClashPair().fault_coverage(**dict(zip('abcd', vectors)))
+        self.assertIn(Fault('ClashPair:out', 0, 1), report.detected)
+        self.assertIn(Fault('ClashPair:out', 0, 0), report.detected)
+
+    def test_every_slot_injected(self):
+        simulator = FaultSimulator(Mux4())
+        source = simulator.generate_source()
+        for slot, k in simulator.slot_index.items():
+            self.assertEqual(source.count(f'{slot} = ('), 1)
+            self.assertIn(f'& _k[{k}]) | _f[{k}]', source)
+
+    def test_vector_lengths(self):
+        with self.assertRaises(ComponentError):
+            Xor().fault_coverage(a=[0, 1], b=[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from compbuilder import Component, Signal, w
+import compbuilder.graphcache
+from compbuilder.graphcache import (
+    enable_graph_cache, disable_graph_cache, structural_fingerprint)
+from compbuilder.tracing import trace
+from test.basic_gates import FullAdder
+from test.test_bits import Register16, Bit
+from test.test_dff import SeqComp3
+from test.test_ram import TestRAMBase, RAM64wFastRAM8
+
+T = Signal.T
+F = Signal.F
+
+def identity(self, a):
+    return {'out': a}
+
+def inverter(self, a):
+    return {'out': Signal(1 - a.get())}
+
+def make_gate(process, clocked=False):
+    # classes of identical names, told apart only by their behavior
+    class Gate(Component):
+        IN = [w.a]
+        OUT = [w.out]
+        PARTS = []
+
+        def __init__(self, **kwargs):
+            super(Gate, self).__init__(**kwargs)
+            self.is_clocked_component = clocked
+    Gate.process = process
+    return Gate
+
+class TestGraphCache(TestRAMBase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        enable_graph_cache(self.directory)
+
+    def tearDown(self):
+        disable_graph_cache()
+        shutil.rmtree(self.directory)
+
+    def cached_files(self):
+        return [f for f in os.listdir(self.directory) if f.endswith('.simgraph')]
+
+    def test_fingerprint(self):
+        self.assertEqual(structural_fingerprint(FullAdder()),
+                         structural_fingerprint(FullAdder()))
+        self.assertNotEqual(structural_fingerprint(FullAdder()),
+                            structural_fingerprint(Bit()))
+
+    def test_fingerprint_behavior(self):
+        fingerprints = {structural_fingerprint(make_gate(identity)()),
+                        structural_fingerprint(make_gate(inverter)()),
+                        structural_fingerprint(make_gate(identity, clocked=True)())}
+        self.assertEqual(len(fingerprints), 3)
+        self.assertEqual(structural_fingerprint(make_gate(identity)()),
+                         structural_fingerprint(make_gate(identity)()))
+
+    def test_directory_required(self):
+        directory = os.environ.pop('COMPBUILDER_CACHE_DIR', None)
+        try:
+            self.assertRaises(ValueError, enable_graph_cache)
+        finally:
+            if directory is not None:
+                os.environ['COMPBUILDER_CACHE_DIR'] = directory
+
+    def test_miss_then_hit(self):
+        first = FullAdder()
+        first.eval(a=T, b=T, carry_in=F)
+        self.assertEqual(len(self.cached_files()), 1)
+
+        second = FullAdder()
+        self.assertTrue(second.sim_graph_cache.load(second))
+        self.assertFalse(second.is_initialized)
+        for a in [F,T]:
+            for b in [F,T]:
+                for c in [F,T]:
+                    self.assertEqual(FullAdder().eval(a=a, b=b, carry_in=c),
+                                     first.eval(a=a, b=b, carry_in=c))
+
+    def test_initialize_after_hit(self):
+        SeqComp3().eval(In=T)
+        seq3 = SeqComp3()
+        inputs = [T,F,F,T,F,F,F,F]
+        outputs = [F,T,T,F,T,T,F,T]
+        for x,y in zip(inputs[:4],outputs[:4]):
+            self.assertEqual(seq3.eval_single(In=x), y)
+        self.assertFalse(seq3.is_initialized)
+        dff = seq3['DFF-1']
+        self.assertIn(dff, seq3.sim_all_components)
+        for x,y in zip(inputs[4:],outputs[4:]):
+            self.assertEqual(seq3.eval_single(In=x), y)
+
+    def test_sequential(self):
+        SeqComp3().eval(In=T)
+        seq3 = SeqComp3()
+        inputs = [T,F,F,T,F,F,F,F]
+        outputs = [F,T,T,F,T,T,F,T]
+        for x,y in zip(inputs,outputs):
+            self.assertEqual(seq3.eval_single(In=x), y)
+
+    def test_trace(self):
+        expected = {'out':[0,131,2134,32767,65535,355,34234,0,10]}
+        stimulus = {'In':[131,2134,32767,65535,355,34234,0,10,0], 'load':'111111111'}
+        self.assertEqual(trace(Register16(), stimulus, ['out']), expected)
+        self.assertEqual(trace(Register16(), stimulus, ['out']), expected)
+
+    def test_fast_ram(self):
+        RAM64wFastRAM8().eval(In=Signal(0,16), address=Signal(0,6), load=F)
+        self.do_test_random(RAM64wFastRAM8(), 300)
+
+if __name__ == '__main__':
+    unittest.main()
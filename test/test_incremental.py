@@ -0,0 +1,77 @@
+import unittest
+from random import randint
+
+from compbuilder import Signal
+from compbuilder.tracing import trace
+from test.basic_gates import FullAdder
+from test.test_bits import Register16
+from test.test_dff import SeqComp3, FlipComp
+from test.test_ram import TestRAMBase, RAM8, RAM64wFastRAM8, Mux8Way16
+
+T = Signal.T
+F = Signal.F
+
+class TestIncrementalCombinational(unittest.TestCase):
+    def test_full_adder(self):
+        incremental = FullAdder()
+        incremental.sim_incremental = True
+        reference = FullAdder()
+        for i in range(30):
+            a, b, c = [Signal(randint(0,1)) for _ in range(3)]
+            self.assertEqual(incremental.eval(a=a, b=b, carry_in=c),
+                             reference.eval(a=a, b=b, carry_in=c))
+
+    def test_skipped_nodes(self):
+        mux = Mux8Way16()
+        mux.sim_incremental = True
+        inputs = {name:Signal(randint(0,65535),16) for name in 'abcdefgh'}
+        inputs['sel'] = Signal(0,3)
+        mux.eval(**inputs)
+        self.assertEqual(mux.sim_stats['skipped'], 0)
+
+        # unchanged inputs evaluate nothing
+        self.assertEqual(mux.eval(**inputs)['out'], inputs['a'])
+        self.assertEqual(mux.sim_stats['evaluated'], 0)
+
+        # changing an unselected input only touches its own cone
+        inputs['h'] = Signal(inputs['h'].value ^ 1, 16)
+        self.assertEqual(mux.eval(**inputs)['out'], inputs['a'])
+        self.assertGreater(mux.sim_stats['skipped'], mux.sim_stats['evaluated'])
+
+        inputs['sel'] = Signal(7,3)
+        self.assertEqual(mux.eval(**inputs)['out'], inputs['h'])
+
+class TestIncrementalSequential(unittest.TestCase):
+    def test_flip(self):
+        flip = FlipComp()
+        flip.sim_incremental = True
+        for i in range(6):
+            self.assertEqual(flip.eval_single(), [F,T][i % 2])
+
+    def test_seq3(self):
+        seq3 = SeqComp3()
+        seq3.sim_incremental = True
+        inputs = [T,F,F,T,F,F,F,F]
+        outputs = [F,T,T,F,T,T,F,T]
+        for x,y in zip(inputs,outputs):
+            self.assertEqual(seq3.eval_single(In=x), y)
+
+    def test_register16(self):
+        reg16 = Register16()
+        reg16.sim_incremental = True
+        self.assertEqual(trace(reg16, {'In':[131,2134,32767,65535,355,34234,0,10,0], 'load':'111111111'}, ['out']),
+                         {'out':[0,131,2134,32767,65535,355,34234,0,10]})
+
+class TestIncrementalRAM(TestRAMBase):
+    def test_ram8(self):
+        ram8 = RAM8()
+        ram8.sim_incremental = True
+        self.do_test_random(ram8, 100, max_address=7)
+
+    def test_fast_ram(self):
+        ram64 = RAM64wFastRAM8()
+        ram64.sim_incremental = True
+        self.do_test_random(ram64, 500)
+
+if __name__ == '__main__':
+    unittest.main()
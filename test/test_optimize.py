@@ -0,0 +1,102 @@
+import unittest
+
+from compbuilder import Signal, w
+import compbuilder.optimize
+from test.visual_gates import VisualComponent as Component, Nand, Mux, Adder4, MuxFirst
+
+class And4(Component):
+    IN = [w(4).a, w(4).b]
+    OUT = [w(4).out]
+    PARTS = []
+
+    def process(self, a, b):
+        return {'out': Signal(a.value & b.value, 4)}
+    process.bitwise = {'out': 'a & b'}
+    process_interact = process
+
+class LowNibble(Component):
+    IN = [w(4).a, w.b]
+    OUT = [w(2).out, w.c]
+
+    PARTS = [
+        And4(a=w.a, b=w(4).constant(0b0011), out=w(4).masked),
+        Nand(a=w.masked[3], b=w.b, out=w.c),
+        Nand(a=w.masked[0], b=w.masked[1], out=w.out[0]),
+        Nand(a=w.masked[2], b=w.b, out=w.out[1]),
+    ]
+
+class NotByNand(Component):
+    IN = [w.a]
+    OUT = [w.out]
+
+    PARTS = [
+        Nand(a=w.a, b=w.T, out=w.out),
+    ]
+
+class TestReduceNetlist(unittest.TestCase):
+    def test_unselected_branch_removed(self):
+        comp = MuxFirst()
+        comp.flatten()
+        reduction = comp.reduce_netlist()
+        # two 9-Nand Xors and an 8-Nand Mux
+        self.assertEqual(reduction.primitives_before, 26)
+        # only the four Nands of the mux passing a through are left
+        self.assertEqual(reduction.primitives_after, 4)
+        self.assertEqual(reduction.folded, 4)
+        self.assertEqual(reduction.dead, 18)
+        # Nand(a, 1) and Nand(x, 1) of the mux are now Nots
+        self.assertEqual(reduction.simplified, 2)
+        self.assertEqual(sorted(p.get_gate_name() for p in comp.primitives),
+                         ['Nand', 'Nand', 'Not', 'Not'])
+        for a in (0, 1):
+            for b in (0, 1):
+                self.assertEqual(comp.update(a=Signal(a), b=Signal(b))['out'].get(), a)
+        self.assertEqual(comp.eval_batch(a=[0,1,0,1], b=[0,0,1,1]), {'out': [0,1,0,1]})
+
+    def test_constant_carry_in(self):
+        comp = Adder4()
+        comp.flatten()
+        reduction = comp.reduce_netlist()
+        self.assertLess(reduction.primitives_after, reduction.primitives_before)
+        self.assertGreater(reduction.folded, 0)
+
+        a = [i >> 4 for i in range(256)]
+        b = [i & 15 for i in range(256)]
+        result = comp.eval_batch(a=a, b=b)
+        self.assertEqual(result['out'], [(x+y) & 15 for x,y in zip(a,b)])
+        for x, y in zip(a, b):
+            out = comp.update_full(a=Signal(x,4), b=Signal(y,4))
+            self.assertEqual((out['carry'].get() << 4) | out['out'].get(), x + y)
+
+    def test_constant_input_simplified(self):
+        comp = NotByNand()
+        comp.flatten()
+        reduction = comp.reduce_netlist()
+        self.assertEqual((reduction.folded, reduction.simplified), (0, 1))
+        self.assertEqual([p.get_gate_name() for p in comp.primitives], ['Not'])
+        for a in (0, 1):
+            self.assertEqual(comp.update(a=Signal(a))['out'].get(), 1 - a)
+
+    def test_partially_constant_outputs(self):
+        comp = LowNibble()
+        comp.flatten()
+        reduction = comp.reduce_netlist()
+        # masked[2..3] are 0, so both Nands reading them fold to 1
+        self.assertEqual(reduction.folded, 2)
+        self.assertEqual(reduction.primitives_after, 2)
+        for a in range(16):
+            out = comp.update_full(a=Signal(a,4), b=Signal(1))
+            self.assertEqual(out['c'].get(), 1)
+            self.assertEqual(out['out'].get(), 0b10 | int(a & 3 != 3))
+
+    def test_idempotent(self):
+        comp = Adder4()
+        comp.flatten()
+        first = comp.reduce_netlist()
+        second = comp.reduce_netlist()
+        self.assertEqual(second.primitives_before, first.primitives_after)
+        self.assertEqual(second.primitives_after, first.primitives_after)
+        self.assertEqual(second.folded + second.dead + second.simplified, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+from random import randint
+
+from compbuilder.parallel import run_sequences
+from test.test_bits import Register16
+from test.test_dff import FlipComp
+
+class TestRunSequences(unittest.TestCase):
+    def test_register_sequences(self):
+        sequences = [{'In': [randint(0,65535) for _ in range(n)],
+                      'load': [randint(0,1) for _ in range(n)]}
+                     for n in [5, 12, 8, 20, 3]]
+        results = run_sequences(Register16, sequences, max_workers=2, chunksize=2)
+        self.assertEqual(len(results), len(sequences))
+        for stimulus, result in zip(sequences, results):
+            self.assertEqual(list(result['out']),
+                             list(Register16().run(stimulus)['out']))
+
+    def test_fresh_state_per_sequence(self):
+        results = run_sequences(FlipComp, [{}] * 3, cycles=3, max_workers=1)
+        self.assertEqual([list(r['out']) for r in results], [[0, 1, 0]] * 3)
+
+if __name__ == '__main__':
+    unittest.main()
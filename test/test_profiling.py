@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+import pstats
+
+from compbuilder import Signal
+from compbuilder.profiling import SimProfiler
+import compbuilder.codegen
+from test.test_dff import SeqComp3
+from test.test_ram import RAM8, Mux8Way16
+from test.visual_gates import Xor
+
+class TestSimProfiler(unittest.TestCase):
+    def eval_ram(self, comp, cycles=5):
+        for i in range(cycles):
+            comp.eval(In=Signal(i,16), address=Signal(i%8,3), load=Signal(1))
+
+    def test_by_class(self):
+        comp = SeqComp3()
+        with SimProfiler(comp) as profiler:
+            for i in range(4):
+                comp.eval(In=Signal(i%2))
+        by_class = profiler.by_class()
+        # one Nand in the Not, three DFFs with both halves called
+        self.assertEqual(by_class['Nand'][0], 4)
+        self.assertEqual(by_class['DFF'][0], 3 * 4 * 2)
+        self.assertEqual(profiler.by_parent()[('Not',)][0], 4)
+
+    def test_disabled(self):
+        comp = RAM8()
+        profiler = SimProfiler(comp)
+        profiler.enable()
+        self.eval_ram(comp, 1)
+        profiler.disable()
+        calls = sum(calls for calls, _ in profiler.by_class().values())
+        self.eval_ram(comp, 2)
+        self.assertEqual(sum(calls for calls, _ in profiler.by_class().values()), calls)
+        self.assertTrue(all('process' not in vars(c) for c in comp.sim_base_components))
+
+    def test_stats_and_folded(self):
+        comp = RAM8()
+        comp.compile_simulator()
+        with SimProfiler(comp) as profiler:
+            self.eval_ram(comp)
+        # Nands are inlined in compiled code; only the DFFs are called
+        self.assertEqual(set(profiler.by_class()), {'DFF'})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sim.prof')
+            profiler.dump_stats(path)
+            stats = pstats.Stats(path)
+            names = {key[2] for key in stats.stats}
+            self.assertIn('DFF.process', names)
+            self.assertIn('Register', names)
+
+            path = os.path.join(tmp, 'sim.folded')
+            profiler.write_folded(path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertTrue(all(line.startswith('RAM8;Register;Bit;DFF.') for line in lines))
+
+    def test_flatten_update(self):
+        comp = Xor()
+        comp.flatten()
+        with SimProfiler(comp) as profiler:
+            comp.update(a=Signal(1), b=Signal(0))
+        self.assertGreater(profiler.records[profiler.stack(comp.primitives[0]) + ('trigger',)][0], 0)
+
+if __name__ == '__main__':
+    unittest.main()
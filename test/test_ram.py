@@ -161,6 +161,7 @@ def gen_fast_ram_component(address_size):
         OUT = [w(16).out]
 
         PARTS = []
+        STATE_ATTRIBUTES = ('buffer',)
 
         def shallow_clone(self):
             return type(self)(self.buffer, **self.wire_assignments)
@@ -178,6 +179,7 @@ def gen_fast_ram_component(address_size):
         OUT = [w.latch_link]
 
         PARTS = []
+        STATE_ATTRIBUTES = ('buffer',)
 
         def shallow_clone(self):
             return type(self)(self.buffer, **self.wire_assignments)
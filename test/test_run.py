@@ -0,0 +1,110 @@
+import unittest
+from array import array
+from random import randint
+
+from compbuilder import Component, Signal, w
+from compbuilder.exceptions import ComponentError
+import compbuilder.codegen
+from test.basic_gates import FullAdder
+from test.test_bits import Register16
+from test.test_dff import SeqComp3, FlipComp
+from test.test_ram import RAM8
+
+class FormulaXor(Component):
+    IN = [w.a, w.b]
+    OUT = [w.out]
+    PARTS = []
+
+    def process(self, a, b):
+        raise AssertionError('bitwise primitives are not called through process()')
+    process.bitwise = {'out': 'a ^ b'}
+
+class FormulaXorWrapper(Component):
+    IN = [w.a, w.b]
+    OUT = [w.out]
+    PARTS = [FormulaXor(a=w.a, b=w.b, out=w.out)]
+
+def reference_run(comp, stimulus, cycles):
+    outputs = {wire.name:[] for wire in comp.OUT}
+    for t in range(cycles):
+        inputs = {wire.name:Signal(stimulus[wire.name][t], wire.width)
+                  for wire in comp.IN}
+        for name, signal in comp.eval(**inputs).items():
+            outputs[name].append(signal.value)
+    return outputs
+
+class TestRun(unittest.TestCase):
+    def test_full_adder(self):
+        stimulus = {name:[randint(0,1) for _ in range(40)]
+                    for name in ['a', 'b', 'carry_in']}
+        outputs = FullAdder().run(stimulus)
+        self.assertIsInstance(outputs['s'], array)
+        self.assertEqual({k:list(v) for k,v in outputs.items()},
+                         reference_run(FullAdder(), stimulus, 40))
+
+    def test_register(self):
+        stimulus = {'In': [randint(0,65535) for _ in range(50)],
+                    'load': [randint(0,1) for _ in range(50)]}
+        self.assertEqual(list(Register16().run(stimulus)['out']),
+                         reference_run(Register16(), stimulus, 50)['out'])
+
+    def test_ram_engines(self):
+        stimulus = {'In': [randint(0,65535) for _ in range(60)],
+                    'address': [randint(0,7) for _ in range(60)],
+                    'load': [randint(0,1) for _ in range(60)]}
+        expected = reference_run(RAM8(), stimulus, 60)['out']
+
+        compiled = RAM8()
+        compiled.compile_simulator()
+        incremental = RAM8()
+        incremental.sim_incremental = True
+        for comp in [RAM8(), compiled, incremental]:
+            self.assertEqual(list(comp.run(stimulus)['out']), expected)
+
+    def test_constant_and_generator_columns(self):
+        comp = SeqComp3()
+        outputs = comp.run({'In': 1}, cycles=4)
+        self.assertEqual(list(outputs['out']), [0, 1, 1, 0])
+
+        outputs = SeqComp3().run({'In': (t % 2 for t in range(6))}, cycles=6)
+        self.assertEqual(len(outputs['out']), 6)
+
+    def test_no_inputs(self):
+        self.assertEqual(list(FlipComp().run(cycles=4)['out']), [0, 1, 0, 1])
+        with self.assertRaises(ComponentError):
+            FlipComp().run()
+
+    def test_continues_across_calls(self):
+        comp = FlipComp()
+        comp.run(cycles=3)
+        self.assertEqual(list(comp.run(cycles=2)['out']), [1, 0])
+
+    def test_preallocated_output(self):
+        out = {'out': [None] * 3}
+        result = FlipComp().run(cycles=3, out=out)
+        self.assertIs(result, out)
+        self.assertEqual(out['out'], [0, 1, 0])
+
+    def test_short_generator(self):
+        with self.assertRaises(ComponentError):
+            SeqComp3().run({'In': iter([1, 0])}, cycles=3)
+
+    def test_bitwise_primitives(self):
+        outputs = FormulaXorWrapper().run({'a': [0,0,1,1], 'b': [0,1,0,1]})
+        self.assertEqual(list(outputs['out']), [0,1,1,0])
+
+    def test_dense_edge_values(self):
+        comp = FullAdder()
+        comp.eval(a=Signal(1), b=Signal(1), carry_in=Signal(0))
+        ids = comp.sim_edge_ids
+        self.assertEqual(sorted(ids.values()), list(range(len(ids))))
+        for _, reads, writes in comp.get_run_schedule():
+            for _, eid, _, _, _, _ in reads or []:
+                self.assertIn(eid, range(len(ids)))
+        ek = (comp.cid, ('carry_out', 1))
+        self.assertEqual(comp.edge_values[ek].value, 1)
+        self.assertEqual(comp.edge_values.get(ek).value, comp.edge_values.state[ids[ek]])
+        self.assertEqual(set(comp.edge_values), set(ids))
+
+if __name__ == '__main__':
+    unittest.main()
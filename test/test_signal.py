@@ -0,0 +1,42 @@
+import unittest
+
+from compbuilder import Signal
+
+class TestSignalSlice(unittest.TestCase):
+    def test_slice(self):
+        s = Signal(0xABCD, 16)
+        self.assertEqual(s.slice(slice(0,4)), Signal(0xD,4))
+        self.assertEqual(s.slice(slice(4,12)), Signal(0xBC,8))
+        self.assertEqual(s.slice(slice(12,16)), Signal(0xA,4))
+        self.assertEqual(s[15], Signal(1,1))
+        self.assertEqual(s[1], Signal(0,1))
+        self.assertEqual(s[8:16], Signal(0xAB,8))
+
+    def test_open_slice(self):
+        s = Signal(0xABCD, 16)
+        self.assertEqual(s[:8], Signal(0xCD,8))
+        self.assertEqual(s[8:], Signal(0xAB,8))
+
+    def test_set_slice(self):
+        s = Signal(0xABCD, 16)
+        s.set_slice(slice(4,8), Signal(0x5,4))
+        self.assertEqual(s, Signal(0xAB5D,16))
+        s.set_slice(slice(15,16), Signal(0,1))
+        self.assertEqual(s, Signal(0x2B5D,16))
+
+    def test_set_slice_truncates(self):
+        s = Signal(0, 8)
+        s.set_slice(slice(2,4), Signal(0xFF,8))
+        self.assertEqual(s, Signal(0b1100,8))
+
+    def test_set_slice_int(self):
+        s = Signal(0, 8)
+        s.set_slice(slice(4,8), 0xA)
+        self.assertEqual(s, Signal(0xA0,8))
+
+    def test_str(self):
+        self.assertEqual(str(Signal(5,4)), '0101')
+        self.assertEqual('{:X}'.format(Signal(0xBEEF,16)), 'BEEF')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from random import randint
+
+from compbuilder import Signal
+from compbuilder.activity import ToggleCounter
+from test.test_dff import SeqComp3, FlipComp
+from test.test_ram import RAM8, RAM64wFastRAM8
+
+class TestStep(unittest.TestCase):
+    def test_flip(self):
+        flip = FlipComp()
+        self.assertEqual(flip.step()['out'].get(), 0)
+        self.assertEqual(flip.step()['out'].get(), 1)
+        self.assertEqual(flip.step(3)['out'].get(), 0)
+        self.assertEqual(flip.step(4)['out'].get(), 0)
+
+    def test_matches_eval(self):
+        step = SeqComp3()
+        reference = SeqComp3()
+        for i in range(20):
+            x = randint(0,1)
+            n = randint(1,4)
+            for _ in range(n):
+                expected = reference.eval(In=Signal(x))
+            self.assertEqual(step.step(n, In=x), expected)
+
+    def test_held_inputs_skip_logic(self):
+        ram = RAM8()
+        ram.step(In=1234, address=5, load=1)
+        self.assertEqual(ram.sim_stats['skipped'], 0)
+        self.assertEqual(ram.step(10, load=0)['out'].get(), 1234)
+        # only the load and register cones of the first cycle are touched
+        self.assertLess(ram.sim_stats['evaluated'], ram.sim_stats['skipped'] / 10)
+
+    def test_fast_ram(self):
+        ram = RAM64wFastRAM8()
+        reference = RAM64wFastRAM8()
+        for i in range(200):
+            inputs = dict(In=Signal(randint(0,65535),16),
+                          address=Signal(randint(0,63),6),
+                          load=Signal(randint(0,1)))
+            self.assertEqual(ram.step(**inputs), reference.eval(**inputs))
+
+    def test_mixed_with_eval(self):
+        ram = RAM8()
+        ram.step(In=7, address=2, load=1)
+        ram.eval(In=Signal(9,16), address=Signal(3,3), load=Signal(1))
+        self.assertEqual(ram.step(2, In=0, address=2, load=0)['out'].get(), 7)
+        self.assertEqual(ram.step(address=3)['out'].get(), 9)
+
+    def test_toggle_counter(self):
+        stimulus = [(5, 1, 1, 2), (9, 2, 1, 1), (7, 1, 0, 3), (0, 3, 0, 2)]
+        stepped = RAM8()
+        with ToggleCounter(stepped) as counter:
+            for data, address, load, n in stimulus:
+                stepped.step(n, In=data, address=address, load=load)
+        evaluated = RAM8()
+        with ToggleCounter(evaluated) as reference:
+            for data, address, load, n in stimulus:
+                for _ in range(n):
+                    evaluated.eval(In=Signal(data,16), address=Signal(address,3),
+                                   load=Signal(load))
+        self.assertEqual(counter.cycles, 8)
+        self.assertGreater(len(counter.toggles), 0)
+        self.assertEqual(counter.report(), reference.report())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from unittest import mock
+
+from compbuilder import Signal, w
+from compbuilder.exceptions import ComponentError
+import compbuilder.techmap
+import compbuilder.optimize
+from test.visual_gates import VisualComponent as Component, Xor, Not
+from test.visual_gates import Mux4, Adder4
+
+class NotXor(Component):
+    IN = [w.a, w.b]
+    OUT = [w.out, w.x]
+
+    PARTS = [
+        Xor(a=w.a, b=w.b, out=w.x),
+        Not(In=w.x, out=w.out),
+    ]
+
+class TestMapNetlist(unittest.TestCase):
+    def gate_names(self, comp):
+        return sorted(p.get_gate_name() for p in comp.primitives)
+
+    def test_xor(self):
+        comp = Xor()
+        comp.flatten()
+        mapping = comp.map_netlist(verify=20)
+        self.assertEqual((mapping.primitives_before, mapping.primitives_after), (9, 1))
+        self.assertEqual(self.gate_names(comp), ['Xor'])
+        self.assertEqual(comp.eval_batch(a=[0,0,1,1], b=[0,1,0,1]), {'out': [0,1,1,0]})
+
+    def test_port_nets_kept(self):
+        comp = NotXor()
+        comp.flatten()
+        comp.map_netlist(verify=20)
+        # x is a top-level output, so the Not is mapped on its own
+        self.assertEqual(self.gate_names(comp), ['Nand', 'Xor'])
+        for a in (0, 1):
+            for b in (0, 1):
+                out = comp.update(a=Signal(a), b=Signal(b))
+                self.assertEqual((out['x'].get(), out['out'].get()), (a ^ b, 1 - (a ^ b)))
+
+    def test_mux(self):
+        comp = Mux4()
+        comp.flatten()
+        mapping = comp.map_netlist(max_inputs=3, verify=50, seed=1)
+        self.assertEqual(mapping.gates, {'Mux': 4})
+        self.assertEqual(mapping.primitives_after, 4)
+
+    def test_adder_luts(self):
+        comp = Adder4()
+        comp.flatten()
+        comp.reduce_netlist()
+        mapping = comp.map_netlist(max_inputs=4, verify=50, seed=1)
+        self.assertLess(mapping.primitives_after, mapping.primitives_before / 4)
+        self.assertTrue(any(name.startswith('Lut') for name in mapping.gates))
+
+        a = [i >> 4 for i in range(256)]
+        b = [i & 15 for i in range(256)]
+        result = comp.eval_batch(a=a, b=b)
+        self.assertEqual(result['out'], [(x+y) & 15 for x,y in zip(a,b)])
+        self.assertEqual(result['carry'], [(x+y) >> 4 for x,y in zip(a,b)])
+
+    def test_verify_rejects_wrong_gate(self):
+        broken = compbuilder.techmap._gate_class('Broken', ['a', 'b'], 'a & b')
+        key = ('Xor', ('a', 'b'), 'a ^ b')
+        with mock.patch.dict(compbuilder.techmap._gate_classes, {key: broken}):
+            comp = Xor()
+            comp.flatten()
+            with self.assertRaises(ComponentError):
+                comp.map_netlist(verify=20)
+
+if __name__ == '__main__':
+    unittest.main()
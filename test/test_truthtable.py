@@ -0,0 +1,71 @@
+import unittest
+
+from compbuilder import w
+from compbuilder.exceptions import ComponentError
+from compbuilder.truthtable import truth_table, equivalent
+from test.visual_gates import VisualComponent as Component, FullAdder, Xor, And, Or, Mux, Mux4, Adder4
+
+class BrokenMux(Component):
+    IN = [w.a, w.b, w.sel]
+    OUT = [w.out]
+
+    PARTS = [
+        And(a=w.b, b=w.sel, out=w.o1),
+        Or(a=w.a, b=w.o1, out=w.out),
+    ]
+
+class BrokenMux4(Component):
+    IN = [w(4).a, w(4).b, w.sel]
+    OUT = [w(4).out]
+
+    PARTS = [Mux(a=w.a[i], b=w.b[i], sel=w.sel, out=w.out[i]) for i in range(3)]
+    PARTS += [BrokenMux(a=w.a[3], b=w.b[3], sel=w.sel, out=w.out[3])]
+
+class TestTruthTable(unittest.TestCase):
+    def test_full_adder(self):
+        table = truth_table(FullAdder)
+        self.assertEqual(len(table), 8)
+        # assignment v = a | b << 1 | carry_in << 2
+        self.assertEqual(table.columns['s'], [0b10010110])
+        self.assertEqual(table.columns['carry_out'], [0b11101000])
+
+    def test_adder_lookup(self):
+        table = truth_table(Adder4(), chunk_bits=3)
+        for a in range(16):
+            for b in range(16):
+                self.assertEqual(table.lookup(a=a, b=b),
+                                 {'out': (a+b) & 15, 'carry': (a+b) >> 4})
+
+    def test_chunking(self):
+        self.assertEqual(truth_table(Mux4, chunk_bits=2), truth_table(Mux4))
+
+    def test_input_limit(self):
+        with self.assertRaises(ComponentError):
+            truth_table(Mux4, max_inputs=8)
+
+class TestEquivalence(unittest.TestCase):
+    def test_equivalent(self):
+        self.assertEqual(equivalent(Mux, Mux()), (True, None))
+
+    def test_counterexample(self):
+        same, counterexample = equivalent(Mux, BrokenMux)
+        self.assertFalse(same)
+        # lowest differing assignment: a=1, b=0, sel=1
+        self.assertEqual(counterexample['inputs'], {'a': 1, 'b': 0, 'sel': 1})
+        self.assertEqual(counterexample['expected'], {'out': 0})
+        self.assertEqual(counterexample['actual'], {'out': 1})
+
+    def test_counterexample_in_later_pass(self):
+        same, counterexample = equivalent(Mux4, Mux4, chunk_bits=3)
+        self.assertTrue(same)
+        same, counterexample = equivalent(Mux4, BrokenMux4, chunk_bits=3)
+        self.assertEqual(counterexample['inputs'], {'a': 8, 'b': 0, 'sel': 1})
+        self.assertEqual(counterexample['expected'], {'out': 0})
+        self.assertEqual(counterexample['actual'], {'out': 8})
+
+    def test_port_mismatch(self):
+        with self.assertRaises(ComponentError):
+            equivalent(Mux, Xor)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from random import randint
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from compbuilder import Signal, w
+import compbuilder.vectorized
+import compbuilder.optimize
+from compbuilder.exceptions import ComponentError
+from test.visual_gates import VisualComponent as Component, Xor, Mux4, Adder4, MuxFirst
+
+class Not64(Component):
+    IN = [w(64).In]
+    OUT = [w(64).out]
+    PARTS = []
+
+    def process(self, In):
+        return {'out': Signal(~In.value & (2**64-1), 64)}
+    process.bitwise = {'out': '~In'}
+    process_interact = process
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestEvalVectorized(unittest.TestCase):
+    def test_xor(self):
+        result = Xor().eval_vectorized(a=[0,0,1,1], b=[0,1,0,1])
+        self.assertEqual(list(result['out']), [0,1,1,0])
+
+    def test_adder_exhaustive(self):
+        a = np.arange(256) >> 4
+        b = np.arange(256) & 15
+        for packed in [False, True]:
+            result = Adder4().eval_vectorized(a=a, b=b, packed=packed)
+            self.assertTrue(np.array_equal(result['out'], (a+b) & 15))
+            self.assertTrue(np.array_equal(result['carry'], (a+b) >> 4))
+
+    def test_matches_batch(self):
+        a = [randint(0,15) for _ in range(1000)]
+        b = [randint(0,15) for _ in range(1000)]
+        sel = [randint(0,1) for _ in range(1000)]
+        expected = Mux4().eval_batch(a=a, b=b, sel=sel)
+        result = Mux4().eval_vectorized(a=a, b=b, sel=sel, packed=True)
+        self.assertEqual(list(result['out']), expected['out'])
+
+    def test_levels(self):
+        netlist = compbuilder.vectorized.LevelizedNetlist(Adder4())
+        self.assertEqual(sum(outs.shape[1] for level in netlist.levels
+                             for _, _, outs in level),
+                         len(netlist.comp.primitives))
+
+    def test_levels_follow_flatten(self):
+        comp = Adder4()
+        netlist = compbuilder.vectorized.LevelizedNetlist(comp)
+        first = {}
+        for i, primitives in enumerate(comp.primitive_levels):
+            for p in primitives:
+                first.setdefault(p, i)
+        self.assertEqual(len(netlist.levels), len(set(first.values())))
+
+    def test_reset_on_rebuild(self):
+        comp = MuxFirst()
+        comp.eval_vectorized(a=[0,1], b=[1,1])
+        comp.reduce_netlist()
+        self.assertIsNone(comp.levelized_netlist)
+        result = comp.eval_vectorized(a=[0,0,1,1], b=[0,1,0,1])
+        self.assertEqual(list(result['out']), [0,0,1,1])
+
+    def test_wide_wire(self):
+        self.assertRaises(ComponentError, lambda: Not64().eval_vectorized(In=[0]))
+
+    def test_length_mismatch(self):
+        self.assertRaises(ComponentError,
+                          lambda: Xor().eval_vectorized(a=[0,1], b=[0]))
+
+if __name__ == '__main__':
+    unittest.main()
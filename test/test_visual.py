@@ -83,6 +83,166 @@ class TestRelativeSlice(unittest.TestCase):
             b = random.randint(0,65535)
             self.assertEqual(and16.update(a=Signal(a,16),b=Signal(b,16))['out'],Signal(a&b,16))
 
+################################################
+class TestUpdateScheduler(unittest.TestCase):
+    def setUp(self):
+        self.adder = FullAdder()
+        self.adder.flatten()
+        self.reference = FullAdder()
+        self.reference.flatten()
+
+    def test_matches_update_full(self):
+        import random
+        for i in range(50):
+            inputs = {name:Signal(random.randint(0,1)) for name in ['a','b','carry_in']}
+            inputs = dict(random.sample(sorted(inputs.items()),random.randint(1,3)))
+            self.assertEqual(self.adder.update(**inputs),self.reference.update_full(**inputs))
+            # scheduler state is left clean for the next update
+            self.assertFalse(any(self.adder.net_dirty))
+            self.assertFalse(any(self.adder.net_buckets))
+
+    def test_net_ids(self):
+        self.assertEqual([net.id for net in self.adder.netlist],
+                         list(range(len(self.adder.netlist))))
+
+################################################
+class CountedHalfAdder(Component):
+    IN = [w.a, w.b]
+    OUT = [w.s, w.c]
+    PARTS = []
+
+    calls = 0
+
+    def process(self,a,b):
+        CountedHalfAdder.calls += 1
+        return {'s': Signal(a.value ^ b.value), 'c': Signal(a.value & b.value)}
+
+    process_interact = process
+
+class TwoHalfAdders(Component):
+    IN = [w.a, w.b]
+    OUT = [w.s, w.c]
+    PARTS = [
+        CountedHalfAdder(a=w.a,b=w.b,s=w.s1,c=w.c1),
+        CountedHalfAdder(a=w.s1,b=w.c1,s=w.s,c=w.c),
+    ]
+
+class TestPrimitiveSchedule(unittest.TestCase):
+    def setUp(self):
+        self.comp = TwoHalfAdders()
+        self.comp.flatten()
+
+    def test_update_full(self):
+        CountedHalfAdder.calls = 0
+        out = self.comp.update_full(a=T,b=T)
+        self.assertEqual((out['s'],out['c']), (T,F))
+        # each half adder drives two nets of one level but fires once
+        self.assertEqual(CountedHalfAdder.calls, 2)
+        self.assertEqual(self.comp.update_stats, {'evaluated': 2, 'avoided': 2})
+
+    def test_update(self):
+        self.comp.update(a=F,b=F)
+        CountedHalfAdder.calls = 0
+        out = self.comp.update(a=T)
+        self.assertEqual((out['s'],out['c']), (T,F))
+        self.assertEqual(CountedHalfAdder.calls, 2)
+        self.assertEqual(self.comp.update_stats, {'evaluated': 2, 'avoided': 2})
+
+################################################
+class EdgeLatch(Component):
+    IN = [w.In, w.clk]
+    OUT = [w.out]
+    PARTS = []
+    TRIGGER = [w.clk]
+    LATCH = [(w.out, w.clk)]
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.clk = 0
+        self.out = 0
+
+    def process_interact(self,In,clk):
+        if clk.value and not self.clk:
+            self.out = In.value
+        self.clk = clk.value
+        return {'out': Signal(self.out)}
+
+class InvertedClockLatch(Component):
+    IN = [w.In, w.clk]
+    OUT = [w.out]
+    PARTS = [
+        Not(In=w.clk,out=w.nclk),
+        EdgeLatch(In=w.In,clk=w.nclk,out=w.q),
+        Not(In=w.q,out=w.out),
+    ]
+
+class DataTriggeredLatch(EdgeLatch):
+    TRIGGER = [w.In, w.clk]
+
+class Toggle(Component):
+    IN = [w.clk]
+    OUT = [w.out]
+    PARTS = [
+        DataTriggeredLatch(In=w.d,clk=w.clk,out=w.out),
+        Not(In=w.out,out=w.d),
+    ]
+
+class TestLevelization(unittest.TestCase):
+    def check_levels(self, comp):
+        for net in comp.netlist:
+            if net.prelist:
+                self.assertEqual(net.level, max(p.level for p in net.prelist)+1, net)
+
+    def test_longest_path(self):
+        comp = FullAdder()
+        comp.flatten()
+        self.check_levels(comp)
+        self.assertEqual(comp.net_depth, max(net.level for net in comp.netlist))
+
+    def test_latch_after_trigger(self):
+        comp = InvertedClockLatch()
+        comp.flatten()
+        # clk -> nclk -> q -> out, the latch output following its clock
+        self.check_levels(comp)
+        self.assertEqual(comp.net_depth, 3)
+        comp.update_full(In=T,clk=T)
+        self.assertEqual(comp.update_full(clk=F)['out'], F)
+        comp.update_full(In=F,clk=T)
+        self.assertEqual(comp.update_full(clk=F)['out'], T)
+
+    def test_loop_through_latch(self):
+        # the loop out -> d -> out is broken at the latch output
+        comp = Toggle()
+        comp.flatten()
+        self.assertEqual([(net.name,net.level) for net in comp.netlist],
+                         [('Toggle:clk',0), ('Toggle:out',1), ('Toggle:d',2)])
+        outputs = [comp.update(clk=Signal(i%2))['out'].value for i in range(4)]
+        self.assertEqual(outputs, [0,1,1,0])
+
+    def test_frozen_schedule(self):
+        comp = InvertedClockLatch()
+        comp.flatten()
+        levels = comp.primitive_levels
+        self.assertIsInstance(levels, tuple)
+        self.assertTrue(all(isinstance(level, tuple) for level in levels))
+        # primitives of a level only read nets of lower levels
+        for level in levels:
+            outputs = {p.wiring[wire.get_key()][0] for p in level for wire in p.OUT}
+            for p in level:
+                for wire in p.TRIGGER:
+                    self.assertNotIn(p.wiring[wire.get_key()][0], outputs)
+
+################################################
+class TestCompiledTrigger(unittest.TestCase):
+    def test_no_wiring_lookups(self):
+        and16 = And16()
+        and16.flatten()
+        for p in and16.primitives:
+            self.assertIsNotNone(p.trigger_pins)
+            p.wiring = {}   # trigger() must only use the compiled pins
+        self.assertEqual(and16.update(a=Signal(0xF0F0,16),b=Signal(0xFF00,16))['out'],
+                         Signal(0xF000,16))
+
 ################################################
 class Buffer(Component):
   IN = [w.In]
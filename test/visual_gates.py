@@ -25,6 +25,9 @@ class Nand(NandLayoutMixin,VisualComponent):
             return {'out': Signal(0)}
         else:
             return {'out': Signal(1)}
+    process.bitwise = {
+        'out': '~(a & b)',
+    }
     process_interact = process
     process_interact.js = {
         'out' : 'function(w) { return (w.a==1) && (w.b==1) ? 0 : 1; }',
@@ -38,6 +41,9 @@ class Buffer(BufferLayoutMixin,VisualComponent):
 
     def process(self, In):
         return {'out': Signal(In.get())}
+    process.bitwise = {
+        'out': 'In',
+    }
     process_interact = process
     process_interact.js = {
         'out' : 'function(w) { return w.In; }',
@@ -188,3 +194,71 @@ class DFF(VisualComponent):
               return s.out;
             }''',
     }
+
+
+class Mux(VisualComponent):
+    IN = [w.a, w.b, w.sel]
+    OUT = [w.out]
+
+    PARTS = [
+        Not(In=w.sel, out=w.notsel),
+        And(a=w.a, b=w.notsel, out=w.o1),
+        And(a=w.sel, b=w.b, out=w.o2),
+        Or(a=w.o1, b=w.o2, out=w.out)
+    ]
+
+
+class Mux4(VisualComponent):
+    IN = [w(4).a, w(4).b, w.sel]
+    OUT = [w(4).out]
+
+    PARTS = [Mux(a=w.a[i], b=w.b[i], sel=w.sel, out=w.out[i]) for i in range(4)]
+
+
+class Adder4(VisualComponent):
+    IN = [w(4).a, w(4).b]
+    OUT = [w(4).out, w.carry]
+
+    PARTS = [
+        FullAdder(a=w.a[0], b=w.b[0], carry_in=w.F, s=w.out[0], carry_out=w.c0),
+        FullAdder(a=w.a[1], b=w.b[1], carry_in=w.c0, s=w.out[1], carry_out=w.c1),
+        FullAdder(a=w.a[2], b=w.b[2], carry_in=w.c1, s=w.out[2], carry_out=w.c2),
+        FullAdder(a=w.a[3], b=w.b[3], carry_in=w.c2, s=w.out[3], carry_out=w.carry),
+    ]
+
+
+class Clash(VisualComponent):
+    # pins named like the locals of the generated evaluators
+    IN = [w.M, w._in, w.kwargs, w._c]
+    OUT = [w.out]
+    PARTS = []
+
+    def process(self, M, _in, kwargs, _c):
+        return {'out': Signal((M.get() & (1-_in.get())) | (kwargs.get() & (1-_c.get())))}
+    process.bitwise = {'out': '(M & ~_in) | (kwargs & ~_c)'}
+    process_interact = process
+
+
+class ClashPair(VisualComponent):
+    IN = [w.a, w.b, w.c, w.d]
+    OUT = [w.out]
+
+    PARTS = [
+        Clash(M=w.a, _in=w.b, kwargs=w.c, _c=w.d, out=w.x),
+        Clash(M=w.x, _in=w.F, kwargs=w.F, _c=w.F, out=w.out),
+    ]
+
+
+def clash_reference(a, b, c, d):
+    return (a & (1-b)) | (c & (1-d))
+
+
+class MuxFirst(VisualComponent):
+    IN = [w.a, w.b]
+    OUT = [w.out]
+
+    PARTS = [
+        Xor(a=w.a, b=w.b, out=w.x),
+        Mux(a=w.a, b=w.x, sel=w.F, out=w.out),
+        Xor(a=w.x, b=w.b, out=w.unused),
+    ]